@@ -149,8 +149,8 @@ cloudinary.config(
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Điều hướng JWT / OAuth2 theo dạng token, mỗi yêu cầu chỉ chạy một luồng xác thực
+        'Recruitments.authentication.BearerTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',  # Mặc định yêu cầu đăng nhập
@@ -196,3 +196,34 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 ALLOWED_HOSTS = ['*']
+
+# Thông báo: số bản ghi mỗi lô bulk_create và ngưỡng số người nhận để chuyển sang ghi ở worker nền
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_DEFER_THRESHOLD = 50
+# Số người nhận của mỗi tác vụ ghi thông báo "việc làm mới phù hợp" khi một tin được duyệt
+NEW_JOB_NOTIFICATION_CHUNK = 5000
+
+# Thời hạn thuê (giây) của tác vụ nền đang chạy; quá hạn (worker bị dừng) thì worker khác nhận lại
+BACKGROUND_TASK_LEASE_SECONDS = 900
+
+# Thời gian (giây) giữ thông tin người dùng đã xác thực trong cache; bị vô hiệu sớm hơn khi MyUser/UserRole thay đổi
+USER_CACHE_TIMEOUT = 3600
+
+# Backend đồng bộ tin nhắn lên Firebase (outbox được gửi bởi lệnh drain_firebase_outbox).
+# Dùng 'Recruitments.firebase_sync.InMemoryFirebaseBackend' khi kiểm thử.
+FIREBASE_SYNC_BACKEND = 'Recruitments.firebase_sync.FirebaseAdminBackend'
+# Thời hạn thuê (giây) của sự kiện outbox đang gửi; quá hạn (worker bị dừng) thì worker khác nhận lại
+FIREBASE_OUTBOX_LEASE_SECONDS = 300
+
+# Tải CV trực tiếp lên kho lưu trữ: backend, thời hạn vé tải lên (giây) và thư mục của backend cục bộ
+CV_UPLOAD_BACKEND = 'Recruitments.storage.CloudinaryUploadBackend'
+CV_UPLOAD_TICKET_MAX_AGE = 3600
+CV_UPLOAD_ROOT = BASE_DIR / 'uploads'
+
+# Gợi ý việc làm: khoảng thời gian (giây) tối thiểu giữa hai lần làm mới tăng dần ma trận kỹ năng x bài đăng
+RECOMMENDATION_REFRESH_SECONDS = 30
+# Khoảng chồng lấn (giây) khi làm mới: đọc lại các bài đăng có updated_at sớm hơn mốc lần trước chừng này giây để
+# nhận các transaction commit muộn; nên lớn hơn thời gian chạy của transaction dài nhất ghi JobPosting
+RECOMMENDATION_REFRESH_OVERLAP_SECONDS = 60
+# Thời gian (giây) giữ bảng xếp hạng ứng viên của mỗi tin; bị vô hiệu sớm hơn khi có đơn mới hoặc tin thay đổi
+APPLICANT_RANKING_CACHE_TIMEOUT = 3600
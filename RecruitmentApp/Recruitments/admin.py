@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Role, UserRole, MyUser, JobSeekerProfile, RecruiterProfile, CV, JobPosting, Application, Message, Interview, \
-    Notification, Skill
+    Notification, Skill, Conversation, JobPostingSearchTerm, BackgroundTask, FirebaseOutbox, \
+    CandidateSearchTerm
 
 
 admin.site.register(Role)
@@ -15,4 +16,8 @@ admin.site.register(Message)
 admin.site.register(Interview)
 admin.site.register(Notification)
 admin.site.register(Skill)
-
+admin.site.register(Conversation)
+admin.site.register(JobPostingSearchTerm)
+admin.site.register(BackgroundTask)
+admin.site.register(FirebaseOutbox)
+admin.site.register(CandidateSearchTerm)
@@ -0,0 +1,146 @@
+import hashlib
+
+from django.core.cache import cache
+from django.utils import timezone
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from oauth2_provider.models import get_access_token_model
+from oauth2_provider.settings import oauth2_settings
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import caching
+
+OAUTH2_CACHE_PREFIX = 'auth:oauth2:'
+
+AccessToken = get_access_token_model()
+
+
+def get_tokens_for_user(user):
+    """
+    Tạo cặp access/refresh token. Vai trò không được ký vào token mà đọc từ cache người dùng
+    (xem caching.get_user) để luôn phản ánh thay đổi vai trò mới nhất.
+    """
+    refresh = RefreshToken.for_user(user)
+    return {'access': str(refresh.access_token), 'refresh': str(refresh)}
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Xác thực JWT, lấy người dùng (kèm vai trò hiện tại và các vai trò đã duyệt) từ cache có phiên bản
+    thay vì truy vấn MyUser và UserRole ở mỗi yêu cầu. Cache bị vô hiệu khi MyUser/UserRole thay đổi.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token không chứa thông tin định danh người dùng.")
+
+        user = caching.get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed("Không tìm thấy người dùng.", code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed("Tài khoản đã bị vô hiệu hóa.", code='user_inactive')
+        return user
+
+
+def oauth2_cache_key(token):
+    return OAUTH2_CACHE_PREFIX + hashlib.sha256(token.encode()).hexdigest()
+
+
+class CachedOAuth2Authentication(OAuth2Authentication):
+    """
+    Xác thực OAuth2 có bộ nhớ đệm: với token hợp lệ chỉ lưu định danh của token (id, user_id, ứng dụng, hạn,
+    phạm vi) trong cache với thời hạn không vượt quá thời gian sống còn lại của token và
+    ACCESS_TOKEN_EXPIRE_SECONDS. Người dùng được lấy qua caching.get_user nên không có mật khẩu trong cache
+    và luôn phản ánh thay đổi MyUser/UserRole. Mục cache bị xóa khi token bị thu hồi/cập nhật (xem signals).
+    """
+
+    def authenticate(self, request):
+        token = bearer_token(request)
+        key = oauth2_cache_key(token) if token else None
+        if key:
+            cached = cache.get(key)
+            if cached is not None:
+                if cached['expires'] > timezone.now():
+                    access_token = AccessToken(
+                        id=cached['id'],
+                        user_id=cached['user_id'],
+                        application_id=cached['application_id'],
+                        token=token,
+                        expires=cached['expires'],
+                        scope=cached['scope'],
+                    )
+                    return self.resolve_user(access_token), access_token
+                cache.delete(key)
+
+        result = super().authenticate(request)
+        if result is None or result[1].user_id is None:
+            return result
+
+        access_token = result[1]
+        timeout = min(
+            (access_token.expires - timezone.now()).total_seconds(),
+            oauth2_settings.ACCESS_TOKEN_EXPIRE_SECONDS
+        )
+        if key and timeout > 0:
+            cache.set(key, {
+                'id': access_token.id,
+                'user_id': access_token.user_id,
+                'application_id': access_token.application_id,
+                'expires': access_token.expires,
+                'scope': access_token.scope,
+            }, int(timeout))
+        return self.resolve_user(access_token), access_token
+
+    @staticmethod
+    def resolve_user(access_token):
+        """
+        Người dùng của token lấy từ cache người dùng (kèm vai trò đã duyệt), giống CachedJWTAuthentication.
+        """
+        user = caching.get_user(access_token.user_id)
+        if user is None:
+            raise AuthenticationFailed("Không tìm thấy người dùng.", code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed("Tài khoản đã bị vô hiệu hóa.", code='user_inactive')
+        access_token.user = user
+        return user
+
+
+def bearer_token(request):
+    header = get_authorization_header(request).split()
+    if len(header) != 2 or header[0].lower() != b'bearer':
+        return None
+    try:
+        return header[1].decode()
+    except UnicodeError:
+        return None
+
+
+class BearerTokenAuthentication(BaseAuthentication):
+    """
+    Điều hướng theo dạng token để mỗi yêu cầu chỉ chạy một luồng xác thực:
+    - JWT (ba đoạn phân tách bởi dấu chấm) -> CachedJWTAuthentication.
+    - Token mờ (opaque) của OAuth2 -> CachedOAuth2Authentication.
+    """
+
+    def __init__(self):
+        self.jwt_authentication = CachedJWTAuthentication()
+        self.oauth2_authentication = CachedOAuth2Authentication()
+
+    def authenticate(self, request):
+        token = bearer_token(request)
+        if token is None:
+            # OAuth2 còn cho phép truyền access_token qua query string
+            if 'access_token' in request.query_params:
+                return self.oauth2_authentication.authenticate(request)
+            return None
+        if token.count('.') == 2:
+            return self.jwt_authentication.authenticate(request)
+        return self.oauth2_authentication.authenticate(request)
+
+    def authenticate_header(self, request):
+        return self.oauth2_authentication.authenticate_header(request)
@@ -0,0 +1,87 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+from .models import MyUser, Role, UserRole
+
+
+def version_key(namespace, key):
+    return f"{namespace}:{key}:version"
+
+
+def get_version(namespace, key):
+    """
+    Phiên bản hiện tại của một nhóm khóa cache. Phiên bản khởi tạo theo thời gian để không trùng
+    với phiên bản cũ nếu khóa phiên bản bị đẩy khỏi cache.
+    """
+    cache.add(version_key(namespace, key), time.time_ns())
+    return cache.get(version_key(namespace, key))
+
+
+def bump_version(namespace, key):
+    """
+    Tăng phiên bản để mọi khóa của phiên bản cũ trở nên vô hiệu (không cần xóa từng khóa).
+    """
+    try:
+        cache.incr(version_key(namespace, key))
+    except ValueError:
+        cache.set(version_key(namespace, key), time.time_ns())
+
+
+def versioned_key(namespace, key):
+    return f"{namespace}:{key}:v{get_version(namespace, key)}"
+
+
+# Bộ nhớ đệm người dùng đã xác thực -------------------------------------------------------------
+
+USER_NAMESPACE = 'user'
+# Mật khẩu không được đưa vào cache; nếu cần (ví dụ đổi mật khẩu) sẽ được tải lại từ DB
+USER_CACHED_FIELDS = [field.attname for field in MyUser._meta.concrete_fields if field.attname != 'password']
+
+
+def user_snapshot(user):
+    """
+    Dữ liệu cache của người dùng: các trường của MyUser, vai trò hiện tại và các vai trò đã duyệt.
+    """
+    active_role = user.active_role
+    return {
+        'fields': {name: getattr(user, name) for name in USER_CACHED_FIELDS},
+        'active_role': (active_role.id, active_role.role_name) if active_role else None,
+        'approved_roles': list(
+            UserRole.objects.filter(my_user=user, is_approved=True).values_list('role__role_name', flat=True)
+        ),
+    }
+
+
+def user_from_snapshot(snapshot):
+    fields = snapshot['fields']
+    user = MyUser.from_db(router.db_for_read(MyUser), USER_CACHED_FIELDS, [fields[name] for name in USER_CACHED_FIELDS])
+    if snapshot['active_role']:
+        role_id, role_name = snapshot['active_role']
+        user.active_role = Role(id=role_id, role_name=role_name)
+    else:
+        user.active_role = None
+    user.approved_role_names = frozenset(snapshot['approved_roles'])
+    return user
+
+
+def get_user(user_id):
+    """
+    Lấy người dùng (kèm vai trò) từ cache theo khóa có phiên bản; nếu chưa có thì tải từ DB và ghi vào cache.
+    Trả về None nếu người dùng không tồn tại.
+    """
+    key = versioned_key(USER_NAMESPACE, user_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        user = MyUser.objects.select_related('active_role').filter(pk=user_id).first()
+        if user is None:
+            return None
+        snapshot = user_snapshot(user)
+        cache.set(key, snapshot, settings.USER_CACHE_TIMEOUT)
+    return user_from_snapshot(snapshot)
+
+
+def invalidate_user(user_id):
+    bump_version(USER_NAMESPACE, user_id)
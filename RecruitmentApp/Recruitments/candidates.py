@@ -0,0 +1,150 @@
+import io
+import math
+import re
+import zipfile
+import zlib
+from collections import Counter
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, When
+
+from .models import CV, CandidateSearchTerm, JobSeekerProfile
+from .search import MAX_QUERY_TERMS, tokenize
+from .storage import get_upload_backend
+
+# Số từ khóa tối đa được lưu cho mỗi CV (giữ các từ có trọng số cao nhất)
+MAX_CV_TERMS = 2000
+PROFILE_COUNT_CACHE_KEY = 'search:job_seeker_profile_count'
+PROFILE_COUNT_CACHE_TIMEOUT = 300
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+PDF_STREAM_RE = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.S)
+PDF_TEXT_BLOCK_RE = re.compile(rb'BT(.*?)ET', re.S)
+PDF_STRING_RE = re.compile(rb'\((?:\\.|[^\\()])*\)', re.S)
+PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+# Trích xuất văn bản --------------------------------------------------------------------------------
+
+def extract_docx(data):
+    """
+    Lấy văn bản của tệp DOCX từ word/document.xml, mỗi đoạn văn một dòng.
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        root = ElementTree.fromstring(archive.read('word/document.xml'))
+    return '\n'.join(
+        ''.join(node.text or '' for node in paragraph.iter(WORD_NAMESPACE + 't'))
+        for paragraph in root.iter(WORD_NAMESPACE + 'p')
+    )
+
+
+def extract_pdf(data):
+    """
+    Lấy văn bản của tệp PDF bằng pypdf nếu được cài đặt; nếu không, đọc trực tiếp các chuỗi
+    trong khối văn bản (BT ... ET) của các content stream (chỉ hỗ trợ font đơn giản).
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return extract_pdf_strings(data)
+    reader = PdfReader(io.BytesIO(data))
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+def extract_pdf_strings(data):
+    parts = []
+    for match in PDF_STREAM_RE.finditer(data):
+        stream = match.group(1)
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        for block in PDF_TEXT_BLOCK_RE.finditer(stream):
+            literals = PDF_STRING_RE.findall(block.group(1))
+            parts.append(b' '.join(unescape_pdf_string(literal[1:-1]) for literal in literals))
+    return '\n'.join(part.decode('latin-1') for part in parts)
+
+
+def unescape_pdf_string(literal):
+    return re.sub(rb'\\(.)', lambda match: PDF_ESCAPES.get(match.group(1), match.group(1)), literal)
+
+
+def extract_text(data, file_name=''):
+    """
+    Nhận diện định dạng theo nội dung (chữ ký tệp), sau đó theo phần mở rộng; trả về '' nếu không hỗ trợ.
+    """
+    name = (file_name or '').lower()
+    if data.startswith(b'%PDF') or name.endswith('.pdf'):
+        return extract_pdf(data)
+    if data.startswith(b'PK') or name.endswith('.docx'):
+        return extract_docx(data)
+    return ''
+
+
+# Chỉ mục ứng viên ----------------------------------------------------------------------------------
+
+def index_cv(cv, text):
+    """
+    Ghi lại các từ khóa của một CV với trọng số 1 + log(tần suất).
+    """
+    frequencies = Counter(tokenize(text)).most_common(MAX_CV_TERMS)
+    with transaction.atomic():
+        CandidateSearchTerm.objects.filter(cv=cv).delete()
+        CandidateSearchTerm.objects.bulk_create([
+            CandidateSearchTerm(term=term, cv=cv, job_seeker_profile_id=cv.job_seeker_profile_id,
+                                weight=1 + math.log(frequency))
+            for term, frequency in frequencies
+        ])
+
+
+def index_cv_task(cv_id):
+    """
+    Tác vụ nền: trích xuất văn bản CV và cập nhật chỉ mục; CV đã xóa (mềm) bị gỡ khỏi chỉ mục.
+    Luôn đọc trạng thái hiện tại của CV nên các tác vụ chạy trễ không ghi đè dữ liệu mới hơn.
+    """
+    cv = CV.objects.filter(pk=cv_id).first()
+    if cv is None or cv.is_deleted or not cv.file_path:
+        CandidateSearchTerm.objects.filter(cv_id=cv_id).delete()
+        return
+
+    data = get_upload_backend().read(cv.file_path)
+    index_cv(cv, extract_text(data, cv.file_name or getattr(cv.file_path, 'public_id', '')))
+
+
+def profile_count():
+    return cache.get_or_set(PROFILE_COUNT_CACHE_KEY, JobSeekerProfile.objects.count, PROFILE_COUNT_CACHE_TIMEOUT)
+
+
+def search_candidates(query):
+    """
+    Trả về queryset các dòng (job_seeker_profile_id, matched, score) của những hồ sơ có CV (chưa xóa)
+    chứa từ khóa, xếp theo số từ khóa khớp rồi theo điểm liên quan (trọng số * idf).
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return CandidateSearchTerm.objects.none()
+
+    rows = CandidateSearchTerm.objects.filter(term__in=terms, cv__is_deleted=False)
+    frequencies = dict(
+        rows.order_by().values('term').annotate(df=Count('job_seeker_profile_id', distinct=True))
+        .values_list('term', 'df')
+    )
+    if not frequencies:
+        return CandidateSearchTerm.objects.none()
+
+    total = max(profile_count(), 1)
+    idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+    score = Sum(Case(
+        *[When(term=term, then=F('weight') * value) for term, value in idf.items()],
+        default=0.0,
+        output_field=FloatField(),
+    ))
+
+    return (
+        rows.filter(term__in=list(idf))
+        .values('job_seeker_profile_id')
+        .annotate(matched=Count('term', distinct=True), score=score)
+        .order_by('-matched', '-score', 'job_seeker_profile_id')
+    )
@@ -0,0 +1,72 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import JobPosting
+
+
+class JobPostingFilterBackend(BaseFilterBackend):
+    """
+    Lọc tin tuyển dụng theo tham số truy vấn, toàn bộ điều kiện được đẩy xuống SQL.
+    - job_type: loại công việc (Full-time, Part-time, ...).
+    - location: địa điểm (không phân biệt hoa thường, khớp một phần).
+    - salary_min / salary_max: khoảng lương mong muốn, lấy các tin có khoảng lương giao với khoảng này.
+    - expiration_date_after / expiration_date_before: khoảng ngày hết hạn (ISO 8601).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        job_type = params.get('job_type')
+        if job_type:
+            if job_type not in dict(JobPosting.JOB_TYPE_CHOICES):
+                raise ValidationError({"job_type": "Loại công việc không hợp lệ."})
+            queryset = queryset.filter(job_type=job_type)
+
+        location = params.get('location')
+        if location:
+            queryset = queryset.filter(location__icontains=location)
+
+        salary_min = self.parse_number(params, 'salary_min')
+        if salary_min is not None:
+            queryset = queryset.filter(
+                Q(salary_max__gte=salary_min) | Q(salary_max__isnull=True, salary_min__isnull=False)
+            )
+
+        salary_max = self.parse_number(params, 'salary_max')
+        if salary_max is not None:
+            queryset = queryset.filter(
+                Q(salary_min__lte=salary_max) | Q(salary_min__isnull=True, salary_max__isnull=False)
+            )
+
+        expiration_after = self.parse_date(params, 'expiration_date_after')
+        if expiration_after is not None:
+            # Tin không có ngày hết hạn được coi là còn hạn
+            queryset = queryset.filter(Q(expiration_date__gte=expiration_after) | Q(expiration_date__isnull=True))
+
+        expiration_before = self.parse_date(params, 'expiration_date_before')
+        if expiration_before is not None:
+            queryset = queryset.filter(expiration_date__lte=expiration_before)
+
+        return queryset
+
+    @staticmethod
+    def parse_number(params, name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise ValidationError({name: "Giá trị phải là một số."})
+
+    @staticmethod
+    def parse_date(params, name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValidationError({name: "Ngày không hợp lệ, cần định dạng ISO 8601."})
+        return parsed
@@ -0,0 +1,425 @@
+import copy
+import hashlib
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Conversation, FirebaseOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 600
+
+
+class FirebaseAdminBackend:
+    """
+    Backend ghi lên Firebase Realtime Database thật thông qua firebase_admin.
+    """
+
+    def __init__(self):
+        from firebase_admin import db
+
+        from . import firebase_config  # noqa: F401 (khởi tạo ứng dụng Firebase)
+        self.db = db
+
+    def update(self, updates):
+        """
+        Cập nhật nhiều đường dẫn trong một yêu cầu; giá trị None sẽ xóa node tương ứng.
+        """
+        self.db.reference('/').update(updates)
+
+    def get(self, path):
+        return self.db.reference(path).get()
+
+    def get_page(self, path, start_key=None, limit=100, end_key=None):
+        """
+        Lấy tối đa `limit` node con của `path` theo thứ tự khóa, trong khoảng [start_key, end_key]
+        (bao gồm hai đầu). limit=None nghĩa là không giới hạn.
+        """
+        query = self.db.reference(path).order_by_key()
+        if start_key is not None:
+            query = query.start_at(str(start_key))
+        if end_key is not None:
+            query = query.end_at(str(end_key))
+        if limit is not None:
+            query = query.limit_to_first(limit)
+        return query.get() or {}
+
+    def get_keys(self, path):
+        """
+        Chỉ lấy khóa các node con của `path` (truy vấn shallow, không tải dữ liệu bên trong).
+        """
+        return list(self.db.reference(path).get(shallow=True) or {})
+
+
+class InMemoryFirebaseBackend:
+    """
+    Backend giả lập lưu dữ liệu trong bộ nhớ, dùng cho kiểm thử và môi trường phát triển.
+    Mỗi lần gọi update() được ghi lại trong `calls`.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    def update(self, updates):
+        self.calls.append(copy.deepcopy(updates))
+        for path, value in updates.items():
+            self._set(split_path(path), copy.deepcopy(value))
+
+    def get(self, path):
+        node = self.data
+        for part in split_path(path):
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return copy.deepcopy(node)
+
+    def get_page(self, path, start_key=None, limit=100, end_key=None):
+        children = self.get(path)
+        if not isinstance(children, dict):
+            return {}
+        keys = sorted(children, key=firebase_key_order)
+        if start_key is not None:
+            keys = [key for key in keys if firebase_key_order(key) >= firebase_key_order(str(start_key))]
+        if end_key is not None:
+            keys = [key for key in keys if firebase_key_order(key) <= firebase_key_order(str(end_key))]
+        return {key: children[key] for key in keys[:limit]}
+
+    def get_keys(self, path):
+        children = self.get(path)
+        return list(children) if isinstance(children, dict) else []
+
+    def _set(self, parts, value):
+        if value is None or value == {}:
+            self._delete(self.data, parts)
+            return
+        node = self.data
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        node[parts[-1]] = value
+
+    def _delete(self, node, parts):
+        if not isinstance(node, dict) or parts[0] not in node:
+            return
+        if len(parts) > 1:
+            self._delete(node[parts[0]], parts[1:])
+            if node[parts[0]] != {}:
+                return
+        del node[parts[0]]
+
+
+def split_path(path):
+    return [part for part in path.split('/') if part]
+
+
+def firebase_key_order(key):
+    # Firebase sắp xếp khóa là số nguyên trước (theo giá trị số), sau đó tới các khóa chuỗi
+    return (0, int(key), '') if key.lstrip('-').isdigit() else (1, 0, key)
+
+
+_backends = {}
+
+
+def get_backend():
+    """
+    Backend đồng bộ được cấu hình bởi FIREBASE_SYNC_BACKEND (mỗi lớp chỉ khởi tạo một lần).
+    """
+    path = settings.FIREBASE_SYNC_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+# Ghi sự kiện vào outbox ------------------------------------------------------------------------
+
+def conversation_key(user_id, other_id):
+    low, high = sorted((int(user_id), int(other_id)))
+    return f"{low}_{high}"
+
+
+def message_path(message_id, sender_id, recipient_id):
+    return f"conversations/{conversation_key(sender_id, recipient_id)}/messages/{message_id}"
+
+
+def summary_path(user_id, other_id):
+    return f"user_conversations/{user_id}/{conversation_key(user_id, other_id)}"
+
+
+def conversation_summary(conversation):
+    return {
+        "participant": conversation.participant_id,
+        "last_message_id": conversation.last_message_id,
+        "last_message_at": conversation.last_message_at.isoformat() if conversation.last_message_at else None,
+        "unread_count": conversation.unread_count,
+    }
+
+
+def summary_updates(user_id, other_id):
+    """
+    Cập nhật node user_conversations của cả hai phía từ bảng tóm tắt hội thoại (một truy vấn).
+    Phía không còn bản tóm tắt (hội thoại đã hết tin nhắn) sẽ bị xóa.
+    """
+    conversations = {
+        conversation.my_user_id: conversation
+        for conversation in Conversation.objects.filter(
+            Q(my_user_id=user_id, participant_id=other_id) | Q(my_user_id=other_id, participant_id=user_id)
+        )
+    }
+    updates = {}
+    for my_user_id, participant_id in ((user_id, other_id), (other_id, user_id)):
+        conversation = conversations.get(my_user_id)
+        updates[summary_path(my_user_id, participant_id)] = conversation_summary(conversation) if conversation else None
+    return updates
+
+
+def message_data(message):
+    return {
+        "sender": message.sender_id,
+        "recipient": message.recipient_id,
+        "content": message.content,
+        "created_at": message.created_at.isoformat(),
+        "is_read": message.is_read,
+        "read_at": message.read_at.isoformat() if message.read_at else None,
+    }
+
+
+FINGERPRINT_FIELDS = ('sender', 'recipient', 'content', 'is_read', 'read_at')
+
+
+def message_fingerprint(data):
+    """
+    Băm nội dung tin nhắn (dạng dữ liệu Firebase) để so sánh giữa DB và Firebase.
+    """
+    values = [data.get(field) for field in FINGERPRINT_FIELDS] if isinstance(data, dict) else [data]
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+
+
+def record(key, updates):
+    """
+    Ghi một sự kiện vào outbox; cần được gọi trong cùng transaction với thay đổi ở DB.
+    """
+    return FirebaseOutbox.objects.create(conversation_key=key, updates=updates)
+
+
+def record_message_saved(message):
+    """
+    Ghi tin nhắn và tóm tắt hội thoại của hai phía; gọi sau Conversation.record_message.
+    """
+    path = message_path(message.id, message.sender_id, message.recipient_id)
+    return record(conversation_key(message.sender_id, message.recipient_id), {
+        path: message_data(message),
+        **summary_updates(message.sender_id, message.recipient_id),
+    })
+
+
+def record_message_read(message):
+    path = message_path(message.id, message.sender_id, message.recipient_id)
+    return record(conversation_key(message.sender_id, message.recipient_id), {
+        f"{path}/is_read": True,
+        f"{path}/read_at": message.read_at.isoformat(),
+        **summary_updates(message.sender_id, message.recipient_id),
+    })
+
+
+def record_thread_read(sender_id, recipient_id, message_ids, read_at):
+    """
+    Một sự kiện cho cả lô tin nhắn vừa được đánh dấu đã đọc trong một hội thoại.
+    """
+    updates = {}
+    for message_id in message_ids:
+        path = message_path(message_id, sender_id, recipient_id)
+        updates[f"{path}/is_read"] = True
+        updates[f"{path}/read_at"] = read_at.isoformat()
+    updates.update(summary_updates(sender_id, recipient_id))
+    return record(conversation_key(sender_id, recipient_id), updates)
+
+
+def record_message_deleted(message_id, sender_id, recipient_id):
+    return record(conversation_key(sender_id, recipient_id), {
+        message_path(message_id, sender_id, recipient_id): None,
+        **summary_updates(sender_id, recipient_id),
+    })
+
+
+# Gửi sự kiện lên Firebase ----------------------------------------------------------------------
+
+# Khóa đánh dấu nút của cây tiền tố trong fold_updates có giá trị được ghi
+FOLD_VALUE = object()
+
+
+def fold_updates(update_list):
+    """
+    Gộp nhiều cập nhật nhiều đường dẫn (theo thứ tự) thành một, vì Firebase không cho phép
+    một lần update chứa cả đường dẫn cha và đường dẫn con.
+    - Ghi đè một node cha sẽ loại bỏ các cập nhật trước đó trên node con.
+    - Cập nhật node con của một node cha đã có được gộp vào giá trị của node cha.
+    Các đường dẫn được gộp trên một cây tiền tố (mỗi phần của đường dẫn là một nút), nên chi phí tỉ lệ
+    với tổng độ dài các đường dẫn thay vì bình phương số đường dẫn.
+    """
+    root = {}
+    for updates in update_list:
+        for path, value in updates.items():
+            parts = split_path(path)
+            node = root
+            for index, part in enumerate(parts):
+                if FOLD_VALUE in node:
+                    # Một node cha đã có giá trị: gộp cập nhật vào giá trị đó
+                    merge_value(node, parts[index:], value)
+                    break
+                node = node.setdefault(part, {})
+            else:
+                # Ghi đè node (và bỏ mọi cập nhật trước đó trên các node con)
+                node.clear()
+                node[FOLD_VALUE] = copy.deepcopy(value)
+
+    merged = {}
+    stack = [((), root)]
+    while stack:
+        parts, node = stack.pop()
+        if FOLD_VALUE in node:
+            merged['/'.join(parts)] = node[FOLD_VALUE]
+            continue
+        stack.extend((parts + (part,), child) for part, child in node.items())
+    return merged
+
+
+def merge_value(node, parts, value):
+    if not isinstance(node[FOLD_VALUE], dict):
+        node[FOLD_VALUE] = {}
+    target = node[FOLD_VALUE]
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    if value is None:
+        target.pop(parts[-1], None)
+    else:
+        target[parts[-1]] = copy.deepcopy(value)
+
+
+def claim_events(limit):
+    """
+    Nhận tối đa `limit` sự kiện đến hạn và đánh dấu 'running'. Một sự kiện chỉ được nhận khi mọi
+    sự kiện trước đó của cùng hội thoại đã được gửi hoặc cũng nằm trong lô này, để giữ thứ tự.
+    Sự kiện 'running' đã quá FIREBASE_OUTBOX_LEASE_SECONDS (worker nhận nó đã dừng giữa chừng) được
+    nhận lại như sự kiện đến hạn và tính là một lần thử; quá MAX_ATTEMPTS lần thì chuyển sang 'failed'.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.FIREBASE_OUTBOX_LEASE_SECONDS)
+    claimable = Q(status='pending', run_after__lte=now) | Q(status='running', claimed_at__lt=stale_before)
+    with transaction.atomic():
+        candidates = list(
+            FirebaseOutbox.objects.select_for_update(skip_locked=True).filter(claimable).order_by('id')[:limit]
+        )
+        if not candidates:
+            return []
+
+        expired = [event for event in candidates if event.status == 'running' and event.attempts + 1 >= MAX_ATTEMPTS]
+        if expired:
+            FirebaseOutbox.objects.filter(id__in=[event.id for event in expired]).update(
+                status='failed', attempts=F('attempts') + 1, last_error="Hết hạn thuê khi đang gửi.", updated_at=now
+            )
+            candidates = [event for event in candidates if event not in expired]
+
+        # Sự kiện 'running' quá hạn thuê không còn chặn: chúng nằm trong số sự kiện nhận được ở trên
+        # (trừ khi một worker khác đang giữ khóa để nhận lại), nên chỉ tính các sự kiện chờ gửi và
+        # các sự kiện đang được gửi trong thời hạn thuê.
+        candidate_ids = {event.id for event in candidates}
+        unsent = FirebaseOutbox.objects.filter(
+            Q(status='pending') | Q(status='running', claimed_at__gte=stale_before) | Q(id__in=candidate_ids),
+            conversation_key__in={event.conversation_key for event in candidates},
+            id__lte=max(candidate_ids, default=0),
+        ).order_by('id').values_list('conversation_key', 'id')
+
+        blocked = set()
+        accepted = set()
+        for key, event_id in unsent:
+            if key in blocked:
+                continue
+            if event_id in candidate_ids:
+                accepted.add(event_id)
+            else:
+                blocked.add(key)
+
+        events = [event for event in candidates if event.id in accepted]
+        if events:
+            reclaimed = [event.id for event in events if event.status == 'running']
+            if reclaimed:
+                FirebaseOutbox.objects.filter(id__in=reclaimed).update(attempts=F('attempts') + 1)
+            FirebaseOutbox.objects.filter(id__in=accepted).update(status='running', claimed_at=now, updated_at=now)
+            for event in events:
+                if event.status == 'running':
+                    event.attempts += 1
+                event.status = 'running'
+                event.claimed_at = now
+    return events
+
+
+def mark_failed(events, error):
+    """
+    Đặt lịch gửi lại với thời gian chờ tăng dần; quá MAX_ATTEMPTS lần thì chuyển sang 'failed'.
+    """
+    now = timezone.now()
+    for event in events:
+        event.attempts += 1
+        event.last_error = error
+        event.updated_at = now
+        if event.attempts >= MAX_ATTEMPTS:
+            event.status = 'failed'
+        else:
+            event.status = 'pending'
+            delay = min(RETRY_BASE_SECONDS * 2 ** (event.attempts - 1), RETRY_MAX_SECONDS)
+            event.run_after = now + timedelta(seconds=delay)
+    FirebaseOutbox.objects.bulk_update(events, ['status', 'attempts', 'run_after', 'last_error', 'updated_at'])
+
+
+def send_events(events, backend):
+    """
+    Gửi các sự kiện đã nhận bằng một lần update nhiều đường dẫn. Nếu lỗi, gửi lại riêng từng hội thoại
+    để một hội thoại lỗi không chặn các hội thoại khác. Trả về số sự kiện đã gửi thành công.
+    """
+    try:
+        backend.update(fold_updates([event.updates for event in events]))
+    except Exception:
+        logger.exception("Gửi lô %s sự kiện lên Firebase thất bại, thử lại theo từng hội thoại", len(events))
+    else:
+        FirebaseOutbox.objects.filter(id__in=[event.id for event in events]).delete()
+        return len(events)
+
+    groups = {}
+    for event in events:
+        groups.setdefault(event.conversation_key, []).append(event)
+
+    sent = 0
+    for key, group in groups.items():
+        try:
+            backend.update(fold_updates([event.updates for event in group]))
+        except Exception:
+            logger.exception("Gửi sự kiện Firebase của hội thoại %s thất bại", key)
+            mark_failed(group, traceback.format_exc())
+        else:
+            FirebaseOutbox.objects.filter(id__in=[event.id for event in group]).delete()
+            sent += len(group)
+    return sent
+
+
+def drain_outbox(limit=500, backend=None):
+    """
+    Nhận một lô sự kiện đến hạn và gửi lên Firebase. Trả về số sự kiện đã nhận.
+    """
+    events = claim_events(limit)
+    if events:
+        send_events(events, backend or get_backend())
+    return len(events)
@@ -0,0 +1,77 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from oauth2_provider.models import get_access_token_model, get_application_model
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from Recruitments.authentication import BearerTokenAuthentication, get_tokens_for_user
+from Recruitments.models import MyUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo chi phí xác thực mỗi yêu cầu với token JWT và token OAuth2: chuỗi xác thực cũ "
+        "(OAuth2Authentication rồi JWTAuthentication) so với BearerTokenAuthentication. "
+        "Dữ liệu được tạo trong một transaction và hủy bỏ khi kết thúc."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=1000, help="Số yêu cầu được đo cho mỗi trường hợp.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = MyUser.objects.create(username='benchmark-auth', email='benchmark-auth@example.com')
+            application = get_application_model().objects.create(
+                name='benchmark-auth', client_type='confidential', authorization_grant_type='password', user=user,
+            )
+            oauth2_token = get_access_token_model().objects.create(
+                user=user, application=application, token='benchmark-auth-opaque-token', scope='read write',
+                expires=timezone.now() + timedelta(hours=1),
+            )
+            tokens = {'JWT': get_tokens_for_user(user)['access'], 'OAuth2': oauth2_token.token}
+            chains = {
+                'OAuth2 -> JWT (cũ)': [OAuth2Authentication(), JWTAuthentication()],
+                'BearerToken': [BearerTokenAuthentication()],
+            }
+
+            for token_name, token in tokens.items():
+                for chain_name, authenticators in chains.items():
+                    cache.clear()
+                    timings, queries = self.measure(token, authenticators, options['repeat'])
+                    self.stdout.write(
+                        f"[{token_name}] {chain_name}: trung vị {statistics.median(timings):.1f} µs, "
+                        f"tối đa {max(timings):.1f} µs, {queries / options['repeat']:.2f} truy vấn/yêu cầu"
+                    )
+            transaction.set_rollback(True)
+
+    def measure(self, token, authenticators, repeat):
+        """
+        Mỗi lần đo chạy chuỗi xác thực như DRF (dừng ở bộ xác thực đầu tiên trả về kết quả).
+        Lần đầu (cache người dùng/token còn trống) không được tính.
+        """
+        factory = APIRequestFactory()
+
+        def authenticate():
+            request = Request(factory.get('/', HTTP_AUTHORIZATION=f"Bearer {token}"))
+            for authenticator in authenticators:
+                if authenticator.authenticate(request) is not None:
+                    return
+            raise RuntimeError("Token không được xác thực.")
+
+        authenticate()
+        timings = []
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                authenticate()
+                timings.append((time.perf_counter() - started) * 1000000)
+        return timings, len(context.captured_queries)
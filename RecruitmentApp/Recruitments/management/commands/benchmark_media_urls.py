@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from Recruitments.media import _build_url, media_url
+from Recruitments.models import CV, MyUser, RecruiterProfile
+from Recruitments.serializers import CVSerializer, MyUserSerializer, RecruiterProfileSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo chi phí tạo URL Cloudinary khi serialize một danh sách (mặc định 1000 dòng) người dùng, công ty và CV: "
+        "gọi .url cho từng dòng so với media_url và serializer dùng cache URL khi cache trống và khi cache đã có. "
+        "Không ghi vào cơ sở dữ liệu."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Số dòng mỗi danh sách.")
+        parser.add_argument('--repeat', type=int, default=20, help="Số lần đo mỗi trường hợp.")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        cases = [
+            ('MyUserSerializer', MyUserSerializer, 'avatar', [
+                MyUser(id=index, username=f"user-{index}",
+                       avatar=self.resource(MyUser, 'avatar', f"image/upload/v1700000000/avatars/avatar-{index}.jpg"))
+                for index in range(1, rows + 1)
+            ]),
+            ('RecruiterProfileSerializer', RecruiterProfileSerializer, 'company_logo', [
+                RecruiterProfile(my_user_id=index, company_name=f"Công ty {index}", company_logo=self.resource(
+                    RecruiterProfile, 'company_logo', f"image/upload/v1700000000/company_logos/logo-{index}.png"))
+                for index in range(1, rows + 1)
+            ]),
+            ('CVSerializer', CVSerializer, 'file_path', [
+                CV(id=index, file_name=f"cv-{index}.pdf",
+                   file_path=self.resource(CV, 'file_path', f"raw/upload/v1700000000/cvs/cv-{index}.pdf"))
+                for index in range(1, rows + 1)
+            ]),
+        ]
+
+        for name, serializer_class, field, instances in cases:
+            # Chi phí cũ: dựng URL (ký, chuỗi biến đổi) cho từng dòng
+            uncached = self.measure(lambda: [getattr(instance, field).url for instance in instances],
+                                    options['repeat'])
+            cached = self.measure(lambda: [media_url(getattr(instance, field)) for instance in instances],
+                                  options['repeat'])
+            cold = self.measure(lambda: serializer_class(instances, many=True).data, options['repeat'],
+                                setup=_build_url.cache_clear)
+            warm = self.measure(lambda: serializer_class(instances, many=True).data, options['repeat'])
+            self.stdout.write(
+                f"{name} ({rows} dòng): .url từng dòng {uncached:.1f} ms, media_url khi cache đã có {cached:.1f} ms, "
+                f"serialize khi cache trống {cold:.1f} ms, khi cache đã có {warm:.1f} ms (trung vị)"
+            )
+
+    @staticmethod
+    def resource(model, field, value):
+        # Giá trị như khi đọc từ cơ sở dữ liệu ("<loại>/<kiểu>/v<version>/<public_id>.<định dạng>")
+        return model._meta.get_field(field).to_python(value)
+
+    @staticmethod
+    def measure(run, repeat, setup=None):
+        timings = []
+        for _ in range(repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,151 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Recruitments.models import JobPosting, JobPostingSearchTerm, JobPostingText, JobPostingTextWord, MyUser, \
+    RecruiterProfile
+from Recruitments.search import add_words, build_term_weights, fuzzy_search_job_postings, search_job_postings, \
+    text_vocabulary
+from Recruitments.text import normalize_text
+
+TITLE_WORDS = [
+    'Kỹ sư', 'Lập trình viên', 'Chuyên viên', 'Trưởng nhóm', 'Thực tập sinh', 'Nhân viên', 'Quản lý', 'Kiến trúc sư',
+]
+TITLE_TOPICS = [
+    'phần mềm', 'Backend', 'Frontend', 'Python', 'Java', 'React', 'DevOps', 'dữ liệu', 'kiểm thử', 'bảo mật',
+    'Mobile', 'Android', 'iOS', 'hệ thống', 'mạng', 'AI', 'Machine Learning', 'kế toán', 'kinh doanh', 'marketing',
+    'nhân sự', 'thiết kế', 'UI/UX', 'Golang', 'PHP', 'NodeJS', 'Cloud', 'SAP', 'ERP', 'Blockchain',
+]
+TITLE_LEVELS = ['', 'Junior', 'Senior', 'Fresher', 'Lead', 'Middle']
+# Phần đuôi tiêu đề để số tiêu đề phân biệt gần với dữ liệu thật (vài chục nghìn trên vài trăm nghìn tin)
+TITLE_SUFFIXES = [
+    '', '', '', 'Remote', 'Hybrid', 'Part-time', 'Tiếng Anh', 'Tiếng Nhật N2', 'Tiếng Hàn', 'Không yêu cầu kinh nghiệm',
+    'Onsite Nhật Bản', 'Outsource', 'Product', 'Startup', 'Fintech', 'Ngân hàng', 'Thương mại điện tử', 'Game',
+    'Upto 2000$', 'Upto 3000$', 'Thưởng tháng 13', 'Đi làm ngay', 'Gấp', 'Tuyển nhiều',
+] + [f'Lương {salary} triệu' for salary in range(8, 48, 2)]
+LOCATIONS = [
+    'Hà Nội', 'Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ', 'Biên Hòa', 'Nha Trang', 'Huế', 'Vũng Tàu', 'Quy Nhơn',
+    'Bắc Ninh', 'Thái Nguyên', 'Hưng Yên', 'Vinh', 'Buôn Ma Thuột', 'Đà Lạt', 'Long Xuyên', 'Mỹ Tho', 'Nam Định',
+    'Hạ Long',
+]
+DESCRIPTION_WORDS = (
+    'phát triển xây dựng hệ thống ứng dụng khách hàng dự án sản phẩm môi trường làm việc chuyên nghiệp năng động '
+    'lương thưởng hấp dẫn bảo hiểm đào tạo kinh nghiệm kỹ năng giao tiếp tiếng anh teamwork agile scrum api '
+    'database mysql postgresql redis docker kubernetes aws azure microservices git linux testing automation '
+    'performance security design pattern clean code review deploy monitoring support mentoring'
+).split()
+
+TEXT_QUERIES = ['python', 'ky su phan mem', 'backend developer ha noi', 'senior java', 'kế toán', 'react native']
+FUZZY_QUERIES = ['pyton', 'ky su phan men', 'backedn', 'ha noi', 'lap trinh vien java', 'da nang']
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thời gian tìm kiếm tin tuyển dụng (toàn văn và tìm kiếm mờ) trên bộ dữ liệu tổng hợp. "
+        "Dữ liệu được tạo trong một transaction và hủy bỏ khi kết thúc (trừ khi dùng --keep)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--postings', type=int, default=100000, help="Số tin tuyển dụng tổng hợp.")
+        parser.add_argument('--mode', choices=['text', 'fuzzy', 'all'], default='all')
+        parser.add_argument('--repeat', type=int, default=5, help="Số lần chạy mỗi truy vấn.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help="Giữ lại dữ liệu tổng hợp.")
+        parser.add_argument('--no-seed', action='store_true',
+                            help="Không tạo dữ liệu, đo trên dữ liệu hiện có (ví dụ đã giữ lại bằng --keep).")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            if not options['no_seed']:
+                started = time.perf_counter()
+                self.seed(options['postings'])
+                self.stdout.write(f"Đã tạo {options['postings']} tin trong {time.perf_counter() - started:.1f}s.")
+
+            if options['mode'] in ('text', 'all'):
+                self.measure("toàn văn", TEXT_QUERIES, search_job_postings, options['repeat'])
+            if options['mode'] in ('fuzzy', 'all'):
+                self.measure("mờ", FUZZY_QUERIES, fuzzy_search_job_postings, options['repeat'])
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, count, batch_size=5000):
+        recruiters = []
+        for index in range(200):
+            user = MyUser.objects.create(username=f"benchmark-recruiter-{index}", email=f"benchmark-{index}@example.com")
+            recruiters.append(RecruiterProfile.objects.create(my_user=user, company_name=f"Công ty {index} JSC"))
+
+        texts = set()
+        for start in range(0, count, batch_size):
+            postings = [self.posting(start + offset, recruiters) for offset in range(min(batch_size, count - start))]
+            JobPosting.objects.bulk_create(postings)
+            terms = []
+            for posting in postings:
+                fields = {
+                    'title': posting.title,
+                    'company_name': posting.recruiter_profile.company_name,
+                    'location': posting.location,
+                    'description': posting.description,
+                }
+                terms.extend(
+                    JobPostingSearchTerm(term=term, job_posting=posting, weight=weight)
+                    for term, weight in build_term_weights(fields).items()
+                )
+                texts.add(('title', posting.title_normalized))
+                texts.add(('location', posting.location_normalized))
+            JobPostingSearchTerm.objects.bulk_create(terms)
+
+        # Chỉ mục tìm kiếm mờ theo văn bản phân biệt (sync_texts theo từng văn bản quá chậm khi tạo hàng loạt)
+        new_texts = texts - set(JobPostingText.objects.values_list('field', 'text'))
+        JobPostingText.objects.bulk_create([
+            JobPostingText(field=field, text=text, has_live_postings=True) for field, text in new_texts
+        ], batch_size=batch_size)
+        text_words = []
+        for pk, field, text in JobPostingText.objects.values_list('pk', 'field', 'text').iterator():
+            if (field, text) in new_texts:
+                text_words.extend(JobPostingTextWord(word=word, job_posting_text_id=pk) for word in text_vocabulary(text))
+        JobPostingTextWord.objects.bulk_create(text_words, batch_size=batch_size)
+        add_words({text_word.word for text_word in text_words})
+        self.stdout.write(f"{len(texts)} tiêu đề/địa điểm phân biệt.")
+
+    def posting(self, index, recruiters):
+        # bulk_create không gọi save() nên các cột dẫn xuất được điền trực tiếp
+        title = ' '.join(filter(None, [
+            self.random.choice(TITLE_LEVELS), self.random.choice(TITLE_WORDS), self.random.choice(TITLE_TOPICS),
+            self.random.choice(TITLE_SUFFIXES),
+        ]))
+        location = self.random.choice(LOCATIONS)
+        return JobPosting(
+            recruiter_profile=self.random.choice(recruiters),
+            title=title,
+            title_normalized=normalize_text(title),
+            slug=f"benchmark-{index}",
+            description=' '.join(self.random.choices(DESCRIPTION_WORDS, k=20)),
+            location=location,
+            location_normalized=normalize_text(location),
+            job_type='Full-time',
+            status='approved',
+        )
+
+    def measure(self, label, queries, search, repeat):
+        """
+        Mỗi lần đo gồm truy vấn xếp hạng, đếm tổng số kết quả và tải trang đầu (20 tin) như view search.
+        """
+        for query in queries:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                ranked = search(query)
+                total = len(ranked)
+                page = list(ranked[:20])
+                ids = [row['job_posting_id'] if isinstance(row, dict) else row[0] for row in page]
+                JobPosting.objects.in_bulk(ids)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"[{label}] {query!r}: {total} kết quả, trung vị {statistics.median(timings):.1f} ms, "
+                f"tối đa {max(timings):.1f} ms"
+            )
@@ -0,0 +1,53 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Recruitments.models import JobPosting, JobPostingSlugCounter, MyUser, RecruiterProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thời gian cấp slug cho tin tuyển dụng khi đã có nhiều slug cùng tiền tố ('s', 's-1', 's-2'...). "
+        "Dữ liệu được tạo trong một transaction và hủy bỏ khi kết thúc."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--postings', type=int, default=100000, help="Số slug cùng tiền tố đã có.")
+        parser.add_argument('--repeat', type=int, default=20, help="Số lần cấp slug được đo.")
+        parser.add_argument('--base', default='s')
+
+    def handle(self, *args, **options):
+        base = options['base']
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.seed(base, options['postings'])
+            self.stdout.write(f"Đã tạo {options['postings']} slug trong {time.perf_counter() - started:.1f}s.")
+
+            # Lần đầu khởi tạo bộ đếm từ các slug hiện có (duyệt theo tiền tố một lần)
+            JobPostingSlugCounter.objects.filter(base=base).delete()
+            started = time.perf_counter()
+            slug = JobPosting.allocate_slug(base)
+            self.stdout.write(f"Khởi tạo bộ đếm: {slug!r} trong {(time.perf_counter() - started) * 1000:.1f} ms")
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                slug = JobPosting.allocate_slug(base)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"Cấp slug: {slug!r}, trung vị {statistics.median(timings):.2f} ms, tối đa {max(timings):.2f} ms"
+            )
+            transaction.set_rollback(True)
+
+    def seed(self, base, count, batch_size=5000):
+        user = MyUser.objects.create(username='benchmark-slug', email='benchmark-slug@example.com')
+        recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty benchmark')
+        slugs = [base] + [f"{base}-{index}" for index in range(1, count)]
+        for start in range(0, count, batch_size):
+            JobPosting.objects.bulk_create([
+                JobPosting(recruiter_profile=recruiter, title=base, slug=slug, description='Mô tả', location='Hà Nội',
+                           job_type='Full-time', status='approved')
+                for slug in slugs[start:start + batch_size]
+            ])
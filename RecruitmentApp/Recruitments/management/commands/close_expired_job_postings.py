@@ -0,0 +1,30 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from Recruitments.models import JobPosting
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Đóng hàng loạt các tin tuyển dụng đã quá ngày hết hạn."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Chạy lặp lại sau mỗi N giây (0: chạy một lần rồi thoát).")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            closed = JobPosting.close_expired(batch_size=options['batch_size'])
+            elapsed_ms = (time.monotonic() - started) * 1000
+
+            logger.info("job_postings.expired_closed count=%d duration_ms=%.1f", closed, elapsed_ms)
+            self.stdout.write(f"job_postings.expired_closed count={closed} duration_ms={elapsed_ms:.1f}")
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Recruitments.firebase_sync import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Worker gửi các sự kiện tin nhắn trong outbox lên Firebase theo lô."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help="Thời gian chờ (giây) khi outbox trống.")
+        parser.add_argument('--once', action='store_true', help="Gửi hết outbox hiện tại rồi thoát.")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = drain_outbox(limit=options['batch_size'])
+            if processed:
+                self.stdout.write(f"Đã xử lý {processed} sự kiện Firebase.")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,118 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from Recruitments.firebase_sync import conversation_key, conversation_summary, firebase_key_order, get_backend, \
+    message_path, summary_path
+from Recruitments.models import Conversation
+
+SOURCE_PATH = 'messages'
+CHECKPOINT_PATH = '_migrations/conversation_layout/last_key'
+
+
+class Command(BaseCommand):
+    help = (
+        "Chuyển tin nhắn trên Firebase từ node phẳng 'messages/{id}' sang "
+        "'conversations/{pair_key}/messages/{id}' và 'user_conversations/{user_id}/{pair_key}'. "
+        "Đọc node cũ theo từng trang khóa, ghi mỗi trang bằng một lần update kèm điểm dừng để có thể chạy tiếp. "
+        "Tóm tắt hội thoại lấy từ bảng Conversation (chạy rebuild_conversations trước nếu cần)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Số tin nhắn đọc mỗi trang.")
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ đếm, không ghi gì lên Firebase.")
+        parser.add_argument('--check', action='store_true',
+                            help="Chỉ kiểm tra tính nhất quán giữa node cũ và cấu trúc mới.")
+        parser.add_argument('--restart', action='store_true', help="Bỏ qua điểm dừng đã lưu, chạy lại từ đầu.")
+
+    def handle(self, *args, **options):
+        self.backend = get_backend()
+        if options['check']:
+            self.check_parity(options['batch_size'])
+        else:
+            self.migrate(options['batch_size'], options['dry_run'], options['restart'])
+
+    def pages(self, batch_size, start_key=None):
+        """
+        Duyệt node cũ theo thứ tự khóa; start_key là khóa cuối cùng đã xử lý (không bao gồm).
+        Mỗi trang trả về (khóa cuối của trang, danh sách (khóa, tin nhắn)).
+        """
+        while True:
+            # start_at bao gồm chính khóa bắt đầu nên lấy dư một phần tử
+            page = self.backend.get_page(SOURCE_PATH, start_key=start_key, limit=batch_size + 1)
+            keys = sorted(page, key=firebase_key_order)
+            if start_key is not None:
+                keys = [key for key in keys if key != str(start_key)]
+            keys = keys[:batch_size]
+            if not keys:
+                return
+            yield keys[-1], [(key, page[key]) for key in keys if isinstance(page[key], dict)]
+            start_key = keys[-1]
+
+    def migrate(self, batch_size, dry_run, restart):
+        start_key = None if restart else self.backend.get(CHECKPOINT_PATH)
+        if start_key is not None:
+            self.stdout.write(f"Tiếp tục sau khóa {start_key}.")
+
+        migrated = 0
+        for last_key, page in self.pages(batch_size, start_key):
+            updates = {}
+            pairs = set()
+            for key, data in page:
+                updates[message_path(key, data['sender'], data['recipient'])] = data
+                pairs.add((data['sender'], data['recipient']))
+            updates.update(self.summary_updates(pairs))
+
+            migrated += len(page)
+            if dry_run:
+                continue
+            # Điểm dừng được ghi cùng lần update với dữ liệu của trang
+            updates[CHECKPOINT_PATH] = last_key
+            self.backend.update(updates)
+            self.stdout.write(f"Đã chuyển {migrated} tin nhắn (tới khóa {last_key}).")
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"[dry-run] Sẽ chuyển {migrated} tin nhắn."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Hoàn tất, đã chuyển {migrated} tin nhắn."))
+
+    def summary_updates(self, pairs):
+        if not pairs:
+            return {}
+        condition = Q()
+        for sender_id, recipient_id in pairs:
+            condition |= Q(my_user_id=sender_id, participant_id=recipient_id)
+            condition |= Q(my_user_id=recipient_id, participant_id=sender_id)
+        return {
+            summary_path(conversation.my_user_id, conversation.participant_id): conversation_summary(conversation)
+            for conversation in Conversation.objects.filter(condition)
+        }
+
+    def check_parity(self, batch_size):
+        """
+        So sánh từng trang của node cũ với cấu trúc mới: mỗi cặp hội thoại trong trang được đọc
+        bằng một truy vấn theo khoảng khóa.
+        """
+        checked = missing = different = 0
+        for _, page in self.pages(batch_size):
+            by_pair = {}
+            for key, data in page:
+                by_pair.setdefault(conversation_key(data['sender'], data['recipient']), {})[key] = data
+
+            for pair, messages in by_pair.items():
+                keys = sorted(messages, key=firebase_key_order)
+                migrated = self.backend.get_page(f"conversations/{pair}/messages", start_key=keys[0],
+                                                 end_key=keys[-1], limit=None)
+                for key in keys:
+                    checked += 1
+                    if key not in migrated:
+                        missing += 1
+                        self.stdout.write(f"Thiếu tin nhắn {key} trong conversations/{pair}.")
+                    elif migrated[key] != messages[key]:
+                        different += 1
+                        self.stdout.write(f"Tin nhắn {key} trong conversations/{pair} khác node cũ.")
+
+        summary = f"Đã kiểm tra {checked} tin nhắn: thiếu {missing}, khác {different}."
+        if missing or different:
+            self.stdout.write(self.style.ERROR(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
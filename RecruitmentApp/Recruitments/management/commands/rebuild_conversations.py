@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from Recruitments.models import Conversation, Message
+
+
+class Command(BaseCommand):
+    help = "Xây dựng lại bảng tóm tắt hội thoại từ bảng tin nhắn."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Gom nhóm theo từng chiều (người gửi -> người nhận) ngay trong SQL
+        pairs = {}
+        directions = Message.objects.order_by().values('sender_id', 'recipient_id').annotate(
+            last_id=Max('id'),
+            unread=Count('id', filter=Q(is_read=False)),
+        )
+        for row in directions.iterator():
+            sender_id, recipient_id = row['sender_id'], row['recipient_id']
+            for my_user_id, participant_id in ((sender_id, recipient_id), (recipient_id, sender_id)):
+                entry = pairs.setdefault((my_user_id, participant_id), {'last_id': 0, 'unread': 0})
+                entry['last_id'] = max(entry['last_id'], row['last_id'])
+            # Tin chưa đọc chỉ tính cho phía người nhận
+            pairs[(recipient_id, sender_id)]['unread'] += row['unread']
+
+        keys = list(pairs)
+        with transaction.atomic():
+            Conversation.objects.all().delete()
+            for start in range(0, len(keys), batch_size):
+                chunk = keys[start:start + batch_size]
+                last_ids = {pairs[key]['last_id'] for key in chunk}
+                created = dict(Message.objects.filter(id__in=last_ids).values_list('id', 'created_at'))
+                Conversation.objects.bulk_create([
+                    Conversation(
+                        my_user_id=my_user_id,
+                        participant_id=participant_id,
+                        last_message_id=pairs[(my_user_id, participant_id)]['last_id'],
+                        last_message_at=created[pairs[(my_user_id, participant_id)]['last_id']],
+                        unread_count=pairs[(my_user_id, participant_id)]['unread'],
+                    )
+                    for my_user_id, participant_id in chunk
+                ])
+
+        self.stdout.write(self.style.SUCCESS(f"Đã xây dựng lại {len(keys)} bản tóm tắt hội thoại."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from Recruitments.models import JobPosting, Skill
+from Recruitments.search import index_job_posting, index_skill
+from Recruitments.text import normalize_text
+
+
+class Command(BaseCommand):
+    help = "Xây dựng lại chỉ mục tìm kiếm cho toàn bộ tin tuyển dụng và kỹ năng."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = 0
+        postings = JobPosting.objects.select_related('recruiter_profile').order_by()
+        for job_posting in postings.iterator(chunk_size=options['chunk_size']):
+            # Cập nhật cột không dấu mà không chạy lại logic save() (slug, hết hạn)
+            job_posting.title_normalized = normalize_text(job_posting.title)
+            job_posting.location_normalized = normalize_text(job_posting.location)
+            JobPosting.objects.filter(pk=job_posting.pk).update(
+                title_normalized=job_posting.title_normalized,
+                location_normalized=job_posting.location_normalized,
+            )
+            index_job_posting(job_posting)
+            count += 1
+
+        skill_count = 0
+        for skill in Skill.objects.order_by().iterator(chunk_size=options['chunk_size']):
+            Skill.objects.filter(pk=skill.pk).update(name_normalized=normalize_text(skill.name))
+            index_skill(skill)
+            skill_count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Đã lập chỉ mục {count} tin tuyển dụng và {skill_count} kỹ năng."))
@@ -0,0 +1,169 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from Recruitments.firebase_sync import conversation_key, firebase_key_order, get_backend, message_data, \
+    message_fingerprint, message_path, record, summary_updates
+from Recruitments.models import Conversation, Message
+
+MESSAGE_FIELDS = ('id', 'sender_id', 'recipient_id', 'content', 'created_at', 'is_read', 'read_at')
+
+
+class Command(BaseCommand):
+    help = (
+        "Đối soát tin nhắn giữa DB và Firebase: duyệt song song hai nguồn theo id trong từng hội thoại, "
+        "so sánh mã băm (sender, recipient, content, is_read, read_at) và sửa sai lệch theo lô qua outbox. "
+        "Các hội thoại chỉ còn trên Firebase (không có dòng Conversation) cũng được đối soát và dọn dẹp. "
+        "Bộ nhớ sử dụng chỉ phụ thuộc vào kích thước lô."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Số tin nhắn đọc mỗi lần từ mỗi nguồn và số bản sửa mỗi lô.")
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ báo cáo, không sửa.")
+
+    def handle(self, *args, **options):
+        self.backend = get_backend()
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        self.stats = {'checked': 0, 'missing': 0, 'extra': 0, 'different': 0, 'orphaned': 0}
+
+        for user_id, other_id in self.pairs():
+            self.reconcile_pair(user_id, other_id)
+
+        for user_id, other_id in self.orphaned_pairs():
+            self.stats['orphaned'] += 1
+            self.reconcile_pair(user_id, other_id)
+            if not self.dry_run:
+                # Không còn dòng Conversation: xóa (hoặc dựng lại) node user_conversations của cả hai phía
+                record(conversation_key(user_id, other_id), summary_updates(user_id, other_id))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Đã kiểm tra {checked} tin nhắn: thiếu trên Firebase {missing}, thừa trên Firebase {extra}, "
+            "khác nội dung {different}; hội thoại chỉ có trên Firebase {orphaned}.".format(**self.stats)
+        ))
+
+    def pairs(self):
+        """
+        Duyệt các cặp hội thoại theo keyset (id), mỗi cặp có hai dòng Conversation nên chỉ lấy một phía.
+        """
+        last_id = 0
+        while True:
+            chunk = list(
+                Conversation.objects.filter(id__gt=last_id, my_user_id__lt=F('participant_id'))
+                .order_by('id').values_list('id', 'my_user_id', 'participant_id')[:self.batch_size]
+            )
+            if not chunk:
+                return
+            for _, user_id, other_id in chunk:
+                yield user_id, other_id
+            last_id = chunk[-1][0]
+
+    def orphaned_pairs(self):
+        """
+        Các cặp có node conversations/<a>_<b> trên Firebase nhưng không có dòng Conversation trong DB
+        (ví dụ tin nhắn đã bị xóa hết mà sự kiện xóa không tới được Firebase). Chỉ tải danh sách khóa
+        (truy vấn shallow) rồi kiểm tra DB theo lô.
+        """
+        keys = sorted(self.backend.get_keys('conversations'), key=firebase_key_order)
+        for start in range(0, len(keys), self.batch_size):
+            chunk = []
+            for key in keys[start:start + self.batch_size]:
+                low, _, high = key.partition('_')
+                if not (low.isdigit() and high.isdigit()):
+                    self.stderr.write(f"Bỏ qua khóa hội thoại không hợp lệ: {key!r}")
+                    continue
+                chunk.append((int(low), int(high)))
+            existing = set(
+                Conversation.objects.filter(
+                    my_user_id__in={low for low, _ in chunk}, participant_id__in={high for _, high in chunk}
+                ).values_list('my_user_id', 'participant_id')
+            )
+            for pair in chunk:
+                if pair not in existing:
+                    yield pair
+
+    def db_messages(self, user_id, other_id):
+        # Phân trang keyset theo id thay vì một con trỏ lớn để bộ nhớ không phụ thuộc số tin nhắn
+        last_id = 0
+        while True:
+            chunk = list(
+                Message.between(user_id, other_id).filter(id__gt=last_id).only(*MESSAGE_FIELDS)
+                .order_by('id')[:self.batch_size]
+            )
+            if not chunk:
+                return
+            for message in chunk:
+                yield message.id, message_data(message)
+            last_id = chunk[-1].id
+
+    def firebase_messages(self, pair):
+        path = f"conversations/{pair}/messages"
+        start_key = None
+        while True:
+            page = self.backend.get_page(path, start_key=start_key, limit=self.batch_size + 1)
+            keys = sorted(page, key=firebase_key_order)
+            if start_key is not None:
+                keys = [key for key in keys if key != start_key]
+            keys = keys[:self.batch_size]
+            if not keys:
+                return
+            for key in keys:
+                if key.isdigit():
+                    yield int(key), page[key]
+            start_key = keys[-1]
+
+    def reconcile_pair(self, user_id, other_id):
+        """
+        Trộn hai luồng đã sắp xếp theo id (kiểu merge join) và gom các id cần sửa.
+        """
+        pair = conversation_key(user_id, other_id)
+        db_stream = self.db_messages(user_id, other_id)
+        firebase_stream = self.firebase_messages(pair)
+        db_item = next(db_stream, None)
+        firebase_item = next(firebase_stream, None)
+        to_repair = []
+
+        while db_item is not None or firebase_item is not None:
+            if firebase_item is None or (db_item is not None and db_item[0] < firebase_item[0]):
+                self.stats['missing'] += 1
+                to_repair.append(db_item[0])
+                db_item = next(db_stream, None)
+            elif db_item is None or firebase_item[0] < db_item[0]:
+                self.stats['extra'] += 1
+                to_repair.append(firebase_item[0])
+                firebase_item = next(firebase_stream, None)
+            else:
+                if message_fingerprint(db_item[1]) != message_fingerprint(firebase_item[1]):
+                    self.stats['different'] += 1
+                    to_repair.append(db_item[0])
+                db_item = next(db_stream, None)
+                firebase_item = next(firebase_stream, None)
+            self.stats['checked'] += 1
+
+            if len(to_repair) >= self.batch_size:
+                self.repair(pair, user_id, other_id, to_repair)
+                to_repair = []
+
+        if to_repair:
+            self.repair(pair, user_id, other_id, to_repair)
+
+    def repair(self, pair, user_id, other_id, message_ids):
+        """
+        Đọc lại trạng thái mới nhất trong DB rồi ghi một sự kiện outbox cho cả lô. Vì outbox giữ thứ tự
+        theo hội thoại, bản sửa không ghi đè lên các thay đổi mới hơn đang chờ gửi.
+        """
+        if self.dry_run:
+            return
+        with transaction.atomic():
+            current = {
+                message.id: message
+                for message in Message.between(user_id, other_id).filter(id__in=message_ids).only(*MESSAGE_FIELDS)
+            }
+            updates = {
+                message_path(message_id, user_id, other_id):
+                    message_data(current[message_id]) if message_id in current else None
+                for message_id in message_ids
+            }
+            record(pair, updates)
+        self.stdout.write(f"Đã ghi {len(message_ids)} bản sửa cho hội thoại {pair}.")
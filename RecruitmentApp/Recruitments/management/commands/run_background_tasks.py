@@ -0,0 +1,47 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from Recruitments.tasks import run_pending_tasks
+
+
+def work(batch_size, interval, once, stdout=None):
+    while True:
+        processed = run_pending_tasks(limit=batch_size)
+        if processed:
+            if stdout:
+                stdout.write(f"Đã xử lý {processed} tác vụ nền.")
+            continue
+        if once:
+            break
+        time.sleep(interval)
+
+
+class Command(BaseCommand):
+    help = "Worker xử lý hàng đợi tác vụ nền (BackgroundTask)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help="Số tác vụ nhận mỗi lần; thuê được gia hạn trước khi chạy từng tác vụ.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Thời gian chờ (giây) khi hàng đợi trống.")
+        parser.add_argument('--once', action='store_true', help="Xử lý hết hàng đợi hiện tại rồi thoát.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Số tiến trình worker chạy song song (tác vụ được nhận bằng skip_locked).")
+
+    def handle(self, *args, **options):
+        arguments = (options['batch_size'], options['interval'], options['once'])
+        if options['workers'] <= 1:
+            work(*arguments, stdout=self.stdout)
+            return
+
+        # Đóng kết nối DB trước khi fork để mỗi tiến trình con mở kết nối riêng
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=work, args=arguments) for _ in range(options['workers'])]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
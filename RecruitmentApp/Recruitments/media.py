@@ -0,0 +1,26 @@
+from functools import lru_cache
+
+from cloudinary import CloudinaryResource
+
+# Số URL giữ trong bộ nhớ của mỗi tiến trình
+URL_CACHE_SIZE = 10000
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def _build_url(public_id, version, format, resource_type, type, url_options):
+    resource = CloudinaryResource(public_id=public_id, version=version, format=format,
+                                  resource_type=resource_type, type=type)
+    return resource.build_url(**dict(url_options))
+
+
+def media_url(resource):
+    """
+    URL của một giá trị CloudinaryField, được cache theo (public_id, version, định dạng, loại tài nguyên).
+    Khi tệp được tải lại, version thay đổi nên URL cũ không bị dùng lại.
+    """
+    if not resource:
+        return None
+    if not isinstance(resource, CloudinaryResource):
+        return getattr(resource, 'url', None)
+    return _build_url(resource.public_id, resource.version, resource.format, resource.resource_type,
+                      resource.type, tuple(sorted(resource.url_options.items())))
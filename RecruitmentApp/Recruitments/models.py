@@ -1,11 +1,17 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q
+from django.db.models.functions import Greatest, Length
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.utils import timezone
 from django.utils.text import slugify
+import re
 import uuid
 from cloudinary.models import CloudinaryField
 
+from .media import media_url
+from .text import normalize_text
+
 
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -45,7 +51,7 @@ class MyUser(AbstractUser):
 
     @property
     def avatar_url(self):
-        return self.avatar.url if self.avatar else settings.STATIC_URL + 'images/default_avatar.png'
+        return media_url(self.avatar) or settings.STATIC_URL + 'images/default_avatar.png'
 
     class Meta:
         verbose_name = "Người dùng"
@@ -65,7 +71,10 @@ class UserRole(models.Model):
         unique_together = ('my_user', 'role')
         verbose_name = "Vai trò người dùng"
         verbose_name_plural = "Các vai trò người dùng"
-        ordering = ['my_user__username']
+        # Sắp xếp theo cột của chính bảng (được chỉ mục unique hỗ trợ) thay vì JOIN sang MyUser
+        ordering = ['my_user_id', 'role_id']
+        # Hàng đợi duyệt theo vai trò, giữ thứ tự mặc định: các cột so sánh bằng đứng trước cột sắp xếp
+        indexes = [models.Index(fields=['role', 'is_approved', 'my_user'])]
 
     def __str__(self):
         status = '(Đã phê duyệt)' if self.is_approved else ''
@@ -74,16 +83,35 @@ class UserRole(models.Model):
 
 class Skill(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    name_normalized = models.CharField(max_length=100, blank=True, editable=False, db_index=True)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Lưu tên không dấu và cập nhật chỉ mục trigram của kỹ năng.
+        """
+        self.name_normalized = normalize_text(self.name)
+        super().save(*args, **kwargs)
+
+        from .search import index_skill
+        index_skill(self)
+
     class Meta:
         verbose_name = "Kỹ năng"
         verbose_name_plural = "Các kỹ năng"
         ordering = ['name']
 
 
+JOB_TYPE_CHOICES = [
+    ('Full-time', 'Toàn thời gian'),
+    ('Part-time', 'Bán thời gian'),
+    ('Freelance', 'Freelance'),
+    ('Internship', 'Thực tập')
+]
+
+
 class JobSeekerProfile(BaseModel):
     my_user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
                                 related_name='ntv_profile')
@@ -95,14 +123,22 @@ class JobSeekerProfile(BaseModel):
     date_of_birth = models.DateField(null=True, blank=True)
     GENDER_CHOICES = [('M', 'Nam'), ('F', 'Nữ'), ('O', 'Khác')]
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True, null=True)
+    # Mong muốn về việc làm, dùng để gửi thông báo việc làm mới phù hợp (để trống: không giới hạn)
+    preferred_location = models.CharField(max_length=255, blank=True, null=True)
+    preferred_location_normalized = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    preferred_job_type = models.CharField(max_length=20, choices=JOB_TYPE_CHOICES, blank=True, null=True)
 
     def __str__(self):
         return f"Hồ sơ NTV của {self.my_user.username}"
 
+    def save(self, *args, **kwargs):
+        self.preferred_location_normalized = normalize_text(self.preferred_location or '')
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Hồ sơ người tìm việc"
         verbose_name_plural = "Các hồ sơ người tìm việc"
-        ordering = ['my_user__username']
+        ordering = ['my_user_id']
 
 
 class RecruiterProfile(BaseModel):
@@ -118,6 +154,26 @@ class RecruiterProfile(BaseModel):
     def __str__(self):
         return f"{self.company_name} ({self.my_user.username})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Ghi nhớ tên công ty lúc tải để chỉ lập lại chỉ mục các tin khi tên thực sự thay đổi
+        instance._loaded_company_name = instance.__dict__.get('company_name')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Tên công ty nằm trong chỉ mục tìm kiếm của các tin; khi đổi tên, đưa việc lập lại chỉ mục
+        các tin của nhà tuyển dụng vào hàng đợi tác vụ nền.
+        """
+        super().save(*args, **kwargs)
+        loaded_company_name = getattr(self, '_loaded_company_name', None)
+        if loaded_company_name is not None and self.company_name != loaded_company_name:
+            from .search import index_recruiter_job_postings_task
+            from .tasks import enqueue
+            enqueue(index_recruiter_job_postings_task, recruiter_profile_id=self.pk)
+        self._loaded_company_name = self.company_name
+
     class Meta:
         verbose_name = "Hồ sơ Nhà tuyển dụng"
         verbose_name_plural = "Hồ sơ Nhà tuyển dụng"
@@ -128,6 +184,8 @@ class CV(BaseModel):
     job_seeker_profile = models.ForeignKey(JobSeekerProfile, on_delete=models.CASCADE, related_name='cvs')
     file_name = models.CharField(max_length=255, blank=True, null=True)
     file_path = CloudinaryField(resource_type='raw', folder='cvs')
+    # public_id trong vé tải lên trực tiếp; unique để mỗi vé chỉ tạo được một CV kể cả khi hoàn tất đồng thời
+    upload_key = models.CharField(max_length=255, unique=True, null=True, blank=True, editable=False)
     version_name = models.CharField(max_length=100, blank=True, null=True)
     is_default = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
@@ -139,29 +197,86 @@ class CV(BaseModel):
         self.is_deleted = True
         self.save()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Ghi nhớ tệp và trạng thái xóa lúc tải để chỉ lập lại chỉ mục ứng viên khi chúng thay đổi
+        instance._loaded_index_state = instance.index_state()
+        return instance
+
+    def index_state(self):
+        file_path = self.__dict__.get('file_path')
+        return str(getattr(file_path, 'public_id', file_path) or ''), self.__dict__.get('is_deleted')
+
+    def save(self, *args, **kwargs):
+        """
+        Khi CV được thêm, thay tệp hoặc bị xóa mềm, đưa việc trích xuất văn bản và cập nhật
+        chỉ mục ứng viên vào hàng đợi tác vụ nền (không chạy trên luồng xử lý request).
+        """
+        super().save(*args, **kwargs)
+        state = self.index_state()
+        if state != getattr(self, '_loaded_index_state', None):
+            from .candidates import index_cv_task
+            from .tasks import enqueue
+            enqueue(index_cv_task, cv_id=self.pk)
+        self._loaded_index_state = state
+
     class Meta:
         verbose_name = "CV"
         verbose_name_plural = "Các CV"
         ordering = ['file_name']
+        indexes = [models.Index(fields=['job_seeker_profile', 'file_name'])]
+
+
+class CandidateSearchTerm(models.Model):
+    """
+    Chỉ mục đảo của nội dung CV: từ khóa -> CV (và hồ sơ NTV sở hữu), kèm trọng số của từ trong CV.
+    """
+    term = models.CharField(max_length=64)
+    cv = models.ForeignKey(CV, on_delete=models.CASCADE, related_name='search_terms')
+    job_seeker_profile = models.ForeignKey(JobSeekerProfile, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.FloatField()
+
+    def __str__(self):
+        return f"{self.term} -> CV {self.cv_id}"
+
+    class Meta:
+        verbose_name = "Từ khóa CV"
+        verbose_name_plural = "Các từ khóa CV"
+        unique_together = ('term', 'cv')
+
+
+class JobPostingSlugCounter(models.Model):
+    """
+    Bộ đếm hậu tố slug của tin tuyển dụng theo từng base: next_suffix là hậu tố sẽ cấp tiếp theo
+    (0 nghĩa là chính '<base>').
+    """
+    base = models.CharField(max_length=240, unique=True)
+    next_suffix = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.base}: {self.next_suffix}"
+
+    class Meta:
+        verbose_name = "Bộ đếm slug tin tuyển dụng"
+        verbose_name_plural = "Các bộ đếm slug tin tuyển dụng"
 
 
 class JobPosting(BaseModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     recruiter_profile = models.ForeignKey(RecruiterProfile, on_delete=models.CASCADE, related_name='job_postings')
     title = models.CharField(max_length=255)
+    title_normalized = models.CharField(max_length=255, blank=True, editable=False)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField()
     location = models.CharField(max_length=255)
+    location_normalized = models.CharField(max_length=255, blank=True, editable=False)
     salary_min = models.FloatField(null=True, blank=True)
     salary_max = models.FloatField(null=True, blank=True)
     experience_required = models.CharField(max_length=100, blank=True, null=True)
+    required_skills = models.ManyToManyField(Skill, blank=True, related_name='job_postings')
 
-    JOB_TYPE_CHOICES = [
-        ('Full-time', 'Toàn thời gian'),
-        ('Part-time', 'Bán thời gian'),
-        ('Freelance', 'Freelance'),
-        ('Internship', 'Thực tập')
-    ]
+    JOB_TYPE_CHOICES = JOB_TYPE_CHOICES
     job_type = models.CharField(max_length=20, choices=JOB_TYPE_CHOICES)
     is_active = models.BooleanField(default=True)
     expiration_date = models.DateTimeField(null=True, blank=True)  # Ngày hết hạn
@@ -182,6 +297,32 @@ class JobPosting(BaseModel):
         self.is_active = False
         self.save()
 
+    @classmethod
+    def close_expired(cls, batch_size=1000):
+        """
+        Đóng hàng loạt các tin đã quá hạn bằng các câu UPDATE theo lô, không tải đối tượng model.
+        Trả về số tin đã đóng.
+        """
+        now = timezone.now()
+        total = 0
+        while True:
+            ids = list(
+                cls.objects.filter(is_active=True, expiration_date__lt=now)
+                .order_by().values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                total += cls.objects.filter(pk__in=ids, is_active=True).update(
+                    status='closed',
+                    is_active=False,
+                    updated_at=timezone.now()
+                )
+                # update() không qua save() nên tự gỡ các tin vừa đóng khỏi chỉ mục tìm kiếm
+                from .search import unindex_job_postings
+                unindex_job_postings(ids)
+        return total
+
     def approve_job(self):
         """Phê duyệt tin tuyển dụng, thay đổi trạng thái thành 'approved'"""
         self.status = 'approved'
@@ -192,27 +333,101 @@ class JobPosting(BaseModel):
         self.status = 'draft'
         self.save()
 
+    SLUG_MAX_ATTEMPTS = 5
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Ghi nhớ title lúc tải để chỉ tạo lại slug khi title thực sự thay đổi
+        instance._loaded_title = instance.__dict__.get('title')
+        # Văn bản tìm kiếm mờ lúc tải, để cập nhật văn bản cũ khi tiêu đề/địa điểm hoặc trạng thái thay đổi
+        instance._loaded_texts = {
+            ('title', instance.__dict__.get('title_normalized')),
+            ('location', instance.__dict__.get('location_normalized')),
+        }
+        return instance
+
+    @classmethod
+    def allocate_slug(cls, title, exclude_pk=None):
+        """
+        Cấp slug cho title từ bộ đếm hậu tố của '<base>' (JobPostingSlugCounter, khóa dòng khi cấp):
+        '<base>', '<base>-1', '<base>-2'... nên không phải duyệt các slug cùng tiền tố. Bộ đếm của một base
+        được khởi tạo một lần từ các slug hiện có. Slug trùng với slug của base khác (ví dụ title 'A 1'
+        sinh ra 'a-1') bị ràng buộc unique chặn lại và save() cấp số tiếp theo.
+        """
+        base_slug = slugify(normalize_text(title)).replace('_', '-')[:240] or 'tin-tuyen-dung'
+        with transaction.atomic():
+            counter = JobPostingSlugCounter.objects.select_for_update().filter(base=base_slug).first()
+            if counter is None:
+                try:
+                    with transaction.atomic():
+                        counter = JobPostingSlugCounter.objects.create(
+                            base=base_slug, next_suffix=cls.next_slug_suffix(base_slug, exclude_pk)
+                        )
+                except IntegrityError:
+                    # Tiến trình khác vừa tạo bộ đếm của base này
+                    counter = JobPostingSlugCounter.objects.select_for_update().get(base=base_slug)
+            suffix = counter.next_suffix
+            JobPostingSlugCounter.objects.filter(pk=counter.pk).update(next_suffix=F('next_suffix') + 1)
+        return base_slug if suffix == 0 else f"{base_slug}-{suffix}"
+
+    @classmethod
+    def next_slug_suffix(cls, base_slug, exclude_pk=None):
+        """
+        Hậu tố kế tiếp theo các slug '<base>' / '<base>-<số>' đang có (0 nếu chưa có slug nào).
+        Chỉ chạy khi khởi tạo bộ đếm của một base.
+        """
+        last_slug = (
+            cls.objects
+            .filter(Q(slug=base_slug) | Q(slug__startswith=f"{base_slug}-"),
+                    slug__regex=rf'^{re.escape(base_slug)}(-[0-9]+)?$')
+            .exclude(pk=exclude_pk)
+            .order_by(Length('slug').desc(), '-slug')
+            .values_list('slug', flat=True)
+            .first()
+        )
+        if last_slug is None:
+            return 0
+        if last_slug == base_slug:
+            return 1
+        return int(last_slug[len(base_slug) + 1:]) + 1
+
     def save(self, *args, **kwargs):
         """
         Tạo slug tự động khi title thay đổi và kiểm tra nếu trạng thái hết hạn.
         """
-        # Tạo slug mới nếu chưa có hoặc nếu title đã thay đổi
-        if not self.slug or self.title != self.slug:
-            base_slug = slugify(self.title)
-            base_slug = base_slug.replace('_', '-')  # Loại bỏ dấu gạch dưới nếu có
-            slug = base_slug
-            count = 1
-            while JobPosting.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{count}"
-                count += 1
-            self.slug = slug
-
-        # Kiểm tra nếu bài đăng đã hết hạn và tự động đóng bài đăng nếu hết hạn
-        if self.expiration_date and self.expiration_date < timezone.now():
-            self.close_job()
+        # Tạo slug mới nếu chưa có hoặc nếu title đã thay đổi so với lúc tải
+        loaded_title = getattr(self, '_loaded_title', None)
+        regenerate_slug = not self.slug or (loaded_title is not None and self.title != loaded_title)
+        if regenerate_slug:
+            self.slug = self.allocate_slug(self.title, exclude_pk=self.pk)
 
-        # Lưu các thay đổi
-        super().save(*args, **kwargs)
+        # Cột không dấu phục vụ tìm kiếm
+        self.title_normalized = normalize_text(self.title)
+        self.location_normalized = normalize_text(self.location)
+
+        # Kiểm tra nếu bài đăng đã hết hạn và tự động đóng bài đăng nếu hết hạn (không gọi lồng save())
+        if self.expiration_date and self.expiration_date < timezone.now():
+            self.status = 'closed'
+            self.is_active = False
+
+        # Lưu các thay đổi; nếu slug vừa cấp bị trùng do ghi đồng thời, cấp lại và thử lại
+        for attempt in range(self.SLUG_MAX_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                break
+            except IntegrityError:
+                slug_taken = JobPosting.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if not regenerate_slug or not slug_taken or attempt == self.SLUG_MAX_ATTEMPTS - 1:
+                    raise
+                self.slug = self.allocate_slug(self.title, exclude_pk=self.pk)
+        self._loaded_title = self.title
+
+        # Cập nhật chỉ mục tìm kiếm của bài đăng
+        from .search import index_job_posting
+        index_job_posting(self)
+        self._loaded_texts = {('title', self.title_normalized), ('location', self.location_normalized)}
 
     def __str__(self):
         return f"{self.title} tại {self.recruiter_profile.company_name}"
@@ -221,6 +436,105 @@ class JobPosting(BaseModel):
         verbose_name = "Bài đăng tuyển dụng"
         verbose_name_plural = "Các bài đăng tuyển dụng"
         ordering = ['created_at']
+        # Danh sách tin đang hiển thị (mới nhất trước): các cột so sánh bằng đứng trước cột sắp xếp
+        indexes = [
+            models.Index(fields=['status', 'is_active', '-created_at']),
+            models.Index(fields=['is_active', 'expiration_date']),
+            models.Index(fields=['recruiter_profile', '-created_at']),
+            # Tìm các tin đang hiển thị có một tiêu đề/địa điểm cho trước (tìm kiếm mờ)
+            models.Index(fields=['title_normalized', 'status']),
+            models.Index(fields=['location_normalized', 'status']),
+        ]
+
+
+class JobPostingSearchTerm(models.Model):
+    """
+    Một dòng của chỉ mục đảo (inverted index): từ khóa -> bài đăng, kèm trọng số của từ trong bài.
+    """
+    term = models.CharField(max_length=64)
+    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.FloatField()
+
+    def __str__(self):
+        return f"{self.term} -> {self.job_posting_id}"
+
+    class Meta:
+        verbose_name = "Từ khóa tìm kiếm"
+        verbose_name_plural = "Các từ khóa tìm kiếm"
+        unique_together = ('term', 'job_posting')
+        # Đọc các bài đăng có trọng số cao nhất của một từ khóa mà không phải sắp xếp
+        indexes = [models.Index(fields=['term', '-weight'])]
+
+
+class JobPostingText(models.Model):
+    """
+    Một tiêu đề hoặc địa điểm không dấu phân biệt của các tin tuyển dụng, đơn vị của tìm kiếm mờ.
+    Nhiều tin dùng chung một tiêu đề/địa điểm nên chỉ mục theo văn bản nhỏ hơn nhiều so với theo từng tin.
+    Văn bản không đổi sau khi tạo; has_live_postings cho biết còn tin đang hiển thị dùng văn bản này
+    (chỉ khi đó văn bản có dòng trong JobPostingTextWord).
+    """
+    FIELD_CHOICES = [
+        ('title', 'Tiêu đề'),
+        ('location', 'Địa điểm'),
+    ]
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    text = models.CharField(max_length=255)
+    has_live_postings = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.get_field_display()}: {self.text}"
+
+    class Meta:
+        verbose_name = "Văn bản tìm kiếm mờ"
+        verbose_name_plural = "Các văn bản tìm kiếm mờ"
+        unique_together = ('field', 'text')
+
+
+class JobPostingTextWord(models.Model):
+    """
+    Chỉ mục đảo từ -> văn bản tìm kiếm mờ, chỉ gồm các văn bản đang được tin hiển thị sử dụng.
+    """
+    word = models.CharField(max_length=64)
+    job_posting_text = models.ForeignKey(JobPostingText, on_delete=models.CASCADE, related_name='words')
+
+    def __str__(self):
+        return f"{self.word} -> {self.job_posting_text_id}"
+
+    class Meta:
+        verbose_name = "Từ của văn bản tìm kiếm mờ"
+        verbose_name_plural = "Các từ của văn bản tìm kiếm mờ"
+        unique_together = ('word', 'job_posting_text')
+
+
+class JobPostingWordTrigram(models.Model):
+    """
+    Chỉ mục trigram của từ điển các từ từng xuất hiện trong tiêu đề/địa điểm (mỗi từ một lần), dùng để tìm
+    các từ gần giống một từ của truy vấn. word_size (số trigram của từ) được lưu kèm để tính độ tương đồng
+    ngay trên chỉ mục.
+    """
+    trigram = models.CharField(max_length=3)
+    word = models.CharField(max_length=64)
+    word_size = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "Trigram từ điển tìm kiếm mờ"
+        verbose_name_plural = "Các trigram từ điển tìm kiếm mờ"
+        unique_together = ('trigram', 'word')
+        # Chỉ mục bao phủ cho truy vấn gom nhóm theo từ của tìm kiếm mờ
+        indexes = [models.Index(fields=['trigram', 'word', 'word_size'])]
+
+
+class SkillTrigram(models.Model):
+    """
+    Chỉ mục trigram trên tên kỹ năng không dấu.
+    """
+    trigram = models.CharField(max_length=3)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        verbose_name = "Trigram kỹ năng"
+        verbose_name_plural = "Các trigram kỹ năng"
+        unique_together = ('trigram', 'skill')
 
 
 class Application(BaseModel):
@@ -242,7 +556,11 @@ class Application(BaseModel):
         unique_together = ('my_user', 'job_posting')
         verbose_name = "Đơn ứng tuyển"
         verbose_name_plural = "Các đơn ứng tuyển "
-        ordering = ['my_user__username']
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['my_user', '-created_at']),
+            models.Index(fields=['job_posting', '-created_at']),
+        ]
 
     def __str__(self):
         return f"{self.my_user.username} ứng tuyển vào {self.job_posting.title}"
@@ -262,6 +580,10 @@ class Message(BaseModel):
         verbose_name = "Tin nhắn"
         verbose_name_plural = "Các tin nhắn"
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['sender', 'recipient', 'created_at']),
+            models.Index(fields=['recipient', 'is_read', 'created_at']),
+        ]
 
     def mark_as_read(self):
         """
@@ -279,6 +601,117 @@ class Message(BaseModel):
             raise ValueError("Recipient must be set.")
         super().save(*args, **kwargs)
 
+    @classmethod
+    def between(cls, user_id, other_id):
+        """
+        Trả về tất cả tin nhắn giữa hai người dùng (theo cả hai chiều).
+        """
+        return cls.objects.filter(
+            Q(sender_id=user_id, recipient_id=other_id) | Q(sender_id=other_id, recipient_id=user_id)
+        )
+
+    @classmethod
+    def directions(cls, user_id, other_id):
+        """
+        Tin nhắn giữa hai người dùng tách theo chiều gửi, mỗi chiều một truy vấn. Mỗi truy vấn đọc theo
+        thứ tự của chỉ mục (sender, recipient, created_at) nên lấy N tin mới nhất không phải sắp xếp
+        toàn bộ luồng như khi gộp hai chiều bằng OR.
+        """
+        return (
+            cls.objects.filter(sender_id=user_id, recipient_id=other_id),
+            cls.objects.filter(sender_id=other_id, recipient_id=user_id),
+        )
+
+    @classmethod
+    def latest_between(cls, user_id, other_id):
+        """
+        Tin nhắn mới nhất giữa hai người dùng (None nếu không còn tin nào).
+        """
+        latest = [
+            message for message in (
+                direction.order_by('-created_at', '-id').first() for direction in cls.directions(user_id, other_id)
+            ) if message is not None
+        ]
+        return max(latest, key=lambda message: (message.created_at, message.id), default=None)
+
+
+class Conversation(BaseModel):
+    """
+    Bản tóm tắt cuộc hội thoại của một người dùng với một người đối diện.
+    Mỗi cặp người dùng có hai dòng (mỗi phía một dòng), được cập nhật mỗi khi tin nhắn thay đổi.
+    """
+    my_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations')
+    participant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Hội thoại của {self.my_user_id} với {self.participant_id}"
+
+    class Meta:
+        verbose_name = "Cuộc hội thoại"
+        verbose_name_plural = "Các cuộc hội thoại"
+        unique_together = ('my_user', 'participant')
+        indexes = [models.Index(fields=['my_user', '-last_message_at'])]
+        ordering = ['-last_message_at']
+
+    @classmethod
+    def record_message(cls, message):
+        """
+        Cập nhật tóm tắt hội thoại của cả người gửi và người nhận khi có tin nhắn mới.
+        Phía người nhận được tăng số tin chưa đọc.
+        """
+        sides = ((message.sender_id, message.recipient_id, 0), (message.recipient_id, message.sender_id, 1))
+        with transaction.atomic():
+            for my_user_id, participant_id, unread in sides:
+                conversation, created = cls.objects.get_or_create(
+                    my_user_id=my_user_id,
+                    participant_id=participant_id,
+                    defaults={'last_message': message, 'last_message_at': message.created_at,
+                              'unread_count': unread}
+                )
+                if not created:
+                    cls.objects.filter(pk=conversation.pk).update(
+                        last_message=message,
+                        last_message_at=message.created_at,
+                        unread_count=F('unread_count') + unread,
+                        updated_at=timezone.now()
+                    )
+
+    @classmethod
+    def record_read(cls, my_user_id, participant_id, count=1):
+        """
+        Giảm số tin chưa đọc trong hội thoại của my_user_id (người nhận) với participant_id (người gửi)
+        sau khi `count` tin nhắn được đánh dấu đã đọc.
+        """
+        cls.objects.filter(my_user_id=my_user_id, participant_id=participant_id).update(
+            unread_count=Greatest(F('unread_count') - count, 0),
+            updated_at=timezone.now()
+        )
+
+    @classmethod
+    def record_delete(cls, message, was_unread=False):
+        """
+        Tính lại tin nhắn cuối của cả hai phía sau khi một tin nhắn bị xóa.
+        Nếu cuộc hội thoại không còn tin nhắn nào, xóa bản tóm tắt.
+        """
+        latest = Message.latest_between(message.sender_id, message.recipient_id)
+        pair = Q(my_user_id=message.sender_id, participant_id=message.recipient_id) | \
+            Q(my_user_id=message.recipient_id, participant_id=message.sender_id)
+        with transaction.atomic():
+            if latest is None:
+                cls.objects.filter(pair).delete()
+                return
+            cls.objects.filter(pair).update(
+                last_message=latest,
+                last_message_at=latest.created_at,
+                updated_at=timezone.now()
+            )
+            if was_unread:
+                cls.record_read(message.recipient_id, message.sender_id)
+
+
 class Interview(BaseModel):
     application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='interviews')
     scheduled_time = models.DateTimeField()
@@ -330,5 +763,137 @@ class Notification(BaseModel):
     class Meta:
         verbose_name = "Thông báo"
         verbose_name_plural = "Các thông báo"
+        # Hộp thư lọc theo is_read (mới nhất trước) và đếm số chưa đọc: các cột so sánh bằng đứng trước cột sắp xếp
+        indexes = [models.Index(fields=['recipient', 'is_read', 'created_at'])]
+
+
+class NotificationCounter(models.Model):
+    """
+    Bộ đếm số thông báo chưa đọc của mỗi người dùng, được cập nhật tăng/giảm thay vì COUNT(*) mỗi lần đọc.
+    """
+    my_user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='notification_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.my_user_id}: {self.unread_count} thông báo chưa đọc"
+
+    class Meta:
+        verbose_name = "Bộ đếm thông báo"
+        verbose_name_plural = "Các bộ đếm thông báo"
+
+    @classmethod
+    def count_unread(cls, user_ids):
+        return dict(
+            Notification.objects.filter(recipient_id__in=user_ids, is_read=False).order_by()
+            .values('recipient_id').annotate(total=models.Count('id')).values_list('recipient_id', 'total')
+        )
+
+    @classmethod
+    def increment(cls, counts):
+        """
+        Tăng bộ đếm theo {user_id: số thông báo mới}. Gọi sau khi các thông báo đã được ghi.
+        Người dùng chưa có bộ đếm sẽ được khởi tạo bằng cách đếm lại một lần (số đếm đã gồm thông báo mới).
+        Nếu tiến trình khác vừa tạo bộ đếm của người dùng (IntegrityError) thì chuyển sang tăng bằng F().
+        """
+        with transaction.atomic():
+            existing = set(cls.objects.filter(my_user_id__in=counts).values_list('my_user_id', flat=True))
+            missing = [user_id for user_id in counts if user_id not in existing]
+            if missing:
+                totals = cls.count_unread(missing)
+                try:
+                    with transaction.atomic():
+                        cls.objects.bulk_create(
+                            [cls(my_user_id=user_id, unread_count=totals.get(user_id, 0)) for user_id in missing]
+                        )
+                except IntegrityError:
+                    # Tạo từng bộ đếm để biết bộ đếm nào đã có
+                    for user_id in missing:
+                        try:
+                            with transaction.atomic():
+                                cls.objects.create(my_user_id=user_id, unread_count=totals.get(user_id, 0))
+                        except IntegrityError:
+                            existing.add(user_id)
+
+            # Gom những người dùng có cùng mức tăng để cập nhật bằng một câu UPDATE
+            by_amount = {}
+            for user_id in existing:
+                by_amount.setdefault(counts[user_id], []).append(user_id)
+            for amount, user_ids in by_amount.items():
+                cls.objects.filter(my_user_id__in=user_ids).update(unread_count=F('unread_count') + amount)
+
+    @classmethod
+    def decrement(cls, user_id, amount):
+        cls.objects.filter(my_user_id=user_id).update(unread_count=Greatest(F('unread_count') - amount, 0))
+
+    @classmethod
+    def unread_for(cls, user_id):
+        """
+        Số thông báo chưa đọc của người dùng; chỉ đếm lại khi chưa có bộ đếm. Nếu tiến trình khác tạo bộ đếm
+        trước, get_or_create trả về giá trị đã lưu (có thể đã được tăng) thay vì số vừa đếm.
+        """
+        unread_count = cls.objects.filter(my_user_id=user_id).values_list('unread_count', flat=True).first()
+        if unread_count is None:
+            counter, _ = cls.objects.get_or_create(
+                my_user_id=user_id, defaults={'unread_count': cls.count_unread([user_id]).get(user_id, 0)}
+            )
+            unread_count = counter.unread_count
+        return unread_count
+
+
+class FirebaseOutbox(BaseModel):
+    """
+    Hộp thư đi (transactional outbox) cho Firebase Realtime Database: mỗi thay đổi tin nhắn được ghi
+    thành một sự kiện trong cùng transaction với thay đổi ở DB, sau đó lệnh drain_firebase_outbox
+    gửi lên Firebase theo lô. Các sự kiện của cùng một hội thoại được gửi đúng theo thứ tự id.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Chờ gửi'),
+        ('running', 'Đang gửi'),
+        ('failed', 'Thất bại'),
+    ]
+    conversation_key = models.CharField(max_length=64)  # Khóa cặp người dùng, dùng để giữ thứ tự
+    updates = models.JSONField(default=dict)  # Cập nhật nhiều đường dẫn: {path: value}, None nghĩa là xóa
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # Thời điểm worker nhận; quá hạn thuê thì nhận lại được
+    last_error = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.conversation_key} #{self.id} ({self.get_status_display()})"
 
+    class Meta:
+        verbose_name = "Sự kiện đồng bộ Firebase"
+        verbose_name_plural = "Các sự kiện đồng bộ Firebase"
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['conversation_key', 'status']),
+        ]
+
+
+class BackgroundTask(BaseModel):
+    """
+    Hàng đợi tác vụ nền lưu trong cơ sở dữ liệu, được xử lý bởi lệnh run_background_tasks.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Chờ xử lý'),
+        ('running', 'Đang xử lý'),
+        ('done', 'Hoàn thành'),
+        ('failed', 'Thất bại'),
+    ]
+    name = models.CharField(max_length=255)  # Đường dẫn đầy đủ tới hàm xử lý
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # Thời điểm worker nhận; quá hạn thuê thì nhận lại được
+    last_error = models.TextField(blank=True, null=True)
 
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Tác vụ nền"
+        verbose_name_plural = "Các tác vụ nền"
+        indexes = [models.Index(fields=['status', 'run_after'])]
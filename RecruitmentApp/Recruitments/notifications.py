@@ -0,0 +1,92 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+
+from .models import JobPosting, Notification, NotificationCounter
+from .recommendations import matching_job_seekers
+from .tasks import enqueue
+
+
+def notify(recipients, message, type, sender=None, related_url=None, batch_size=None, defer=None):
+    """
+    Gửi cùng một thông báo tới nhiều người nhận bằng bulk_create theo lô.
+    - recipients: queryset, danh sách người dùng hoặc danh sách ID.
+    - defer: True để chuyển việc ghi sang worker nền; None để tự quyết định theo
+      NOTIFICATION_DEFER_THRESHOLD (số người nhận vượt ngưỡng thì ghi ở nền).
+    Trả về số người nhận.
+    """
+    if isinstance(recipients, QuerySet):
+        recipient_ids = recipients.values_list('pk', flat=True)
+    else:
+        recipient_ids = [getattr(recipient, 'pk', recipient) for recipient in recipients]
+    # Loại bỏ người nhận trùng lặp (ví dụ do JOIN qua bảng vai trò) nhưng giữ nguyên thứ tự
+    recipient_ids = list(dict.fromkeys(recipient_ids))
+    if not recipient_ids:
+        return 0
+
+    if defer is None:
+        defer = len(recipient_ids) > settings.NOTIFICATION_DEFER_THRESHOLD
+
+    kwargs = {
+        'recipient_ids': recipient_ids,
+        'message': message,
+        'type': type,
+        'sender_id': getattr(sender, 'pk', sender),
+        'related_url': related_url,
+        'batch_size': batch_size,
+    }
+    if defer:
+        enqueue(deliver_notifications, **kwargs)
+    else:
+        deliver_notifications(**kwargs)
+    return len(recipient_ids)
+
+
+def deliver_notifications(recipient_ids, message, type, sender_id=None, related_url=None, batch_size=None):
+    """
+    Ghi thông báo cho danh sách người nhận theo từng lô bulk_create và tăng bộ đếm chưa đọc tương ứng.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    for start in range(0, len(recipient_ids), batch_size):
+        chunk = recipient_ids[start:start + batch_size]
+        with transaction.atomic():
+            Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=recipient_id,
+                    sender_id=sender_id,
+                    message=message,
+                    type=type,
+                    related_url=related_url,
+                    is_read=False,
+                )
+                for recipient_id in chunk
+            ])
+            NotificationCounter.increment(Counter(chunk))
+
+
+def notify_matching_job_seekers(job_posting_id):
+    """
+    Tác vụ nền khi tin được duyệt: gửi thông báo 'NewJob' tới các NTV phù hợp (xem matching_job_seekers).
+    Người nhận được duyệt theo keyset và chia thành các tác vụ ghi NEW_JOB_NOTIFICATION_CHUNK người một,
+    tất cả trong một transaction nên chạy lại sau lỗi không gửi trùng.
+    """
+    job_posting = JobPosting.objects.select_related('recruiter_profile').filter(
+        pk=job_posting_id, status='approved', is_active=True
+    ).first()
+    if job_posting is None:
+        return
+
+    seekers = matching_job_seekers(job_posting).order_by('my_user_id')
+    message = f"Việc làm mới phù hợp với bạn: '{job_posting.title}' tại {job_posting.recruiter_profile.company_name}."
+    chunk_size = settings.NEW_JOB_NOTIFICATION_CHUNK
+    last_id = 0
+    with transaction.atomic():
+        while True:
+            chunk = list(seekers.filter(my_user_id__gt=last_id).values_list('my_user_id', flat=True)[:chunk_size])
+            if not chunk:
+                return
+            notify(chunk, message=message, type='NewJob', related_url=f"/job-postings/{job_posting.slug}",
+                   defer=True)
+            last_id = chunk[-1]
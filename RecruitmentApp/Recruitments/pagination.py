@@ -0,0 +1,144 @@
+from base64 import b64decode, b64encode
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ConversationPagination(CursorPagination):
+    """
+    Phân trang danh sách hội thoại theo thời gian tin nhắn cuối, mới nhất trước.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-last_message_at', '-id')
+
+
+class JobPostingPagination(CursorPagination):
+    """
+    Phân trang con trỏ cho danh sách tin tuyển dụng, mới nhất trước.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
+
+
+class NotificationPagination(CursorPagination):
+    """
+    Phân trang hộp thư thông báo, mới nhất trước.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class SearchResultPagination(LimitOffsetPagination):
+    """
+    Phân trang kết quả tìm kiếm đã xếp hạng theo limit/offset.
+    """
+    default_limit = 20
+    max_limit = 100
+
+
+class MessageThreadPagination(BasePagination):
+    """
+    Phân trang keyset cho một luồng tin nhắn theo cặp (created_at, id).
+    - ?before=<cursor>: lấy các tin nhắn cũ hơn con trỏ.
+    - ?after=<cursor>: lấy các tin nhắn mới hơn con trỏ.
+    - Không có con trỏ: lấy trang mới nhất.
+    Mỗi trang luôn được trả về theo thứ tự thời gian tăng dần.
+    `queryset` có thể là một danh sách truy vấn (ví dụ Message.directions, mỗi chiều gửi một truy vấn):
+    mỗi truy vấn chỉ đọc page_size + 1 dòng theo chỉ mục rồi được trộn lại trong Python, nên chi phí
+    một trang không phụ thuộc độ dài luồng.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    before_query_param = 'before'
+    after_query_param = 'after'
+    invalid_cursor_message = 'Con trỏ phân trang không hợp lệ.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        before = self.decode_cursor(request.query_params.get(self.before_query_param))
+        after = self.decode_cursor(request.query_params.get(self.after_query_param))
+        querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+
+        if after:
+            # Điều kiện keyset viết dạng khoảng trên created_at (không OR) để mỗi truy vấn dò chỉ mục từ con trỏ
+            created_at, pk = after
+            rows = self.merge(
+                [queryset.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=pk)
+                 .order_by('created_at', 'id') for queryset in querysets],
+                descending=False
+            )
+            self.has_older = True
+        else:
+            if before:
+                created_at, pk = before
+                querysets = [
+                    queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=pk)
+                    for queryset in querysets
+                ]
+            rows = self.merge([queryset.order_by('-created_at', '-id') for queryset in querysets], descending=True)
+            self.has_older = len(rows) > self.page_size
+            rows = rows[:self.page_size]
+            rows.reverse()
+
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def merge(self, querysets, descending):
+        """
+        page_size + 1 tin nhắn đầu tiên theo (created_at, id) khi trộn các truy vấn đã sắp xếp.
+        """
+        rows = [row for queryset in querysets for row in queryset[:self.page_size + 1]]
+        rows.sort(key=lambda message: (message.created_at, message.id), reverse=descending)
+        return rows[:self.page_size + 1]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'older': self.get_older_link(),
+            'newer': self.get_newer_link(),
+            'results': data,
+        })
+
+    def get_older_link(self):
+        if not self.page or not self.has_older:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.after_query_param)
+        return replace_query_param(url, self.before_query_param, self.encode_cursor(self.page[0]))
+
+    def get_newer_link(self):
+        # Luôn trả về con trỏ "mới hơn" để client có thể thăm dò tin nhắn mới
+        if not self.page:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.before_query_param)
+        return replace_query_param(url, self.after_query_param, self.encode_cursor(self.page[-1]))
+
+    @staticmethod
+    def encode_cursor(message):
+        raw = f"{message.created_at.isoformat()}|{message.id}"
+        return b64encode(raw.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            created_at, pk = b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
@@ -62,8 +62,11 @@ class IsApprovedUser(permissions.BasePermission):
     Cho phép chỉ người dùng đã được phê duyệt thực hiện hành động.
     """
     def has_permission(self, request, view):
-        user_role = UserRole.objects.filter(my_user=request.user, is_approved=True).first()
-        return bool(user_role)
+        # Người dùng lấy từ cache (caching.get_user) đã mang sẵn danh sách vai trò được duyệt
+        approved_role_names = getattr(request.user, 'approved_role_names', None)
+        if approved_role_names is not None:
+            return bool(approved_role_names)
+        return UserRole.objects.filter(my_user=request.user, is_approved=True).exists()
 
 class IsAdminForUserRoleApproval(permissions.BasePermission):
     """
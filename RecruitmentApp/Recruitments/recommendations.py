@@ -0,0 +1,239 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import bump_version, versioned_key
+from .models import Application, JobPosting, JobSeekerProfile
+
+APPLICANTS_NAMESPACE = 'applicants'
+
+# Tỷ lệ dòng đã bị thay thế (tombstone) tối đa trước khi nén lại các mảng
+COMPACT_RATIO = 0.5
+
+
+class SkillMatrix:
+    """
+    Ma trận thưa kỹ năng x bài đăng ở dạng COO (mỗi phần tử là một cặp dòng bài đăng, kỹ năng),
+    giữ trong bộ nhớ của tiến trình và được làm mới tăng dần theo updated_at của JobPosting.
+    Bài đăng thay đổi được đánh dấu bỏ (tombstone) ở dòng cũ và thêm vào một dòng mới.
+    Mỗi lần làm mới đọc lùi lại RECOMMENDATION_REFRESH_OVERLAP_SECONDS trước mốc để không bỏ sót các
+    transaction commit muộn (updated_at được gán trước khi commit); bản ghi đã nạp đúng phiên bản được bỏ qua.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entry_rows = np.empty(0, dtype=np.int32)  # Dòng bài đăng của từng phần tử
+        self.entry_skills = np.empty(0, dtype=np.int32)  # Kỹ năng của từng phần tử
+        self.row_required = np.empty(0, dtype=np.int32)  # Số kỹ năng yêu cầu của mỗi dòng
+        self.row_alive = np.empty(0, dtype=bool)
+        self.row_expires = np.empty(0, dtype=np.float64)  # Thời điểm hết hạn (epoch), inf nếu không có
+        self.row_ids = []
+        self.id_to_row = {}
+        self.versions = {}  # updated_at đã nạp của từng bài đăng
+        self.watermark = None
+        self.refreshed_at = 0.0
+
+    def refresh(self, force=False):
+        """
+        Nạp các bài đăng có updated_at >= mốc lần trước trừ khoảng chồng lấn (lần đầu: toàn bộ), tối đa
+        một lần mỗi RECOMMENDATION_REFRESH_SECONDS giây.
+        """
+        if not force and time.monotonic() - self.refreshed_at < settings.RECOMMENDATION_REFRESH_SECONDS:
+            return
+        with self.lock:
+            if not force and time.monotonic() - self.refreshed_at < settings.RECOMMENDATION_REFRESH_SECONDS:
+                return
+            queryset = JobPosting.objects.order_by()
+            if self.watermark is not None:
+                overlap = timedelta(seconds=settings.RECOMMENDATION_REFRESH_OVERLAP_SECONDS)
+                queryset = queryset.filter(updated_at__gte=self.watermark - overlap)
+            else:
+                queryset = queryset.filter(status='approved', is_active=True)
+            postings = list(queryset.values_list('id', 'status', 'is_active', 'expiration_date', 'updated_at'))
+            if postings:
+                self.watermark = max([posting[-1] for posting in postings] + [self.watermark or postings[0][-1]])
+                changed = [posting for posting in postings if self.versions.get(posting[0]) != posting[-1]]
+                if changed:
+                    self.apply(changed)
+            elif self.watermark is None:
+                self.watermark = timezone.now()
+            self.refreshed_at = time.monotonic()
+
+    def apply(self, postings):
+        skills = {}
+        through = JobPosting.required_skills.through
+        ids = [posting[0] for posting in postings]
+        for start in range(0, len(ids), 1000):
+            for job_posting_id, skill_id in through.objects.filter(
+                jobposting_id__in=ids[start:start + 1000]
+            ).values_list('jobposting_id', 'skill_id'):
+                skills.setdefault(job_posting_id, []).append(skill_id)
+
+        # Bỏ các dòng cũ của bài đăng đã thay đổi
+        stale = [self.id_to_row.pop(posting[0]) for posting in postings if posting[0] in self.id_to_row]
+        if stale:
+            self.row_alive[stale] = False
+
+        new_rows, new_skills, required, expires = [], [], [], []
+        for job_posting_id, status, is_active, expiration_date, updated_at in postings:
+            self.versions[job_posting_id] = updated_at
+            posting_skills = skills.get(job_posting_id)
+            if status != 'approved' or not is_active or not posting_skills:
+                continue
+            row = len(self.row_ids)
+            self.row_ids.append(job_posting_id)
+            self.id_to_row[job_posting_id] = row
+            new_rows.extend([row] * len(posting_skills))
+            new_skills.extend(posting_skills)
+            required.append(len(posting_skills))
+            expires.append(expiration_date.timestamp() if expiration_date else np.inf)
+
+        self.entry_rows = np.concatenate([self.entry_rows, np.asarray(new_rows, dtype=np.int32)])
+        self.entry_skills = np.concatenate([self.entry_skills, np.asarray(new_skills, dtype=np.int32)])
+        self.row_required = np.concatenate([self.row_required, np.asarray(required, dtype=np.int32)])
+        self.row_expires = np.concatenate([self.row_expires, np.asarray(expires, dtype=np.float64)])
+        self.row_alive = np.concatenate([self.row_alive, np.ones(len(required), dtype=bool)])
+
+        if len(self.row_ids) and (~self.row_alive).sum() > COMPACT_RATIO * len(self.row_ids):
+            self.compact()
+
+    def compact(self):
+        """
+        Loại bỏ các dòng đã bị thay thế và đánh lại số dòng.
+        """
+        alive = np.flatnonzero(self.row_alive)
+        remap = np.full(len(self.row_ids), -1, dtype=np.int32)
+        remap[alive] = np.arange(len(alive), dtype=np.int32)
+        keep = self.row_alive[self.entry_rows]
+        self.entry_rows = remap[self.entry_rows[keep]]
+        self.entry_skills = self.entry_skills[keep]
+        self.row_required = self.row_required[alive]
+        self.row_expires = self.row_expires[alive]
+        self.row_alive = np.ones(len(alive), dtype=bool)
+        self.row_ids = [self.row_ids[row] for row in alive]
+        self.id_to_row = {job_posting_id: row for row, job_posting_id in enumerate(self.row_ids)}
+
+    def score(self, skill_ids):
+        """
+        Chấm điểm mọi bài đăng còn hiệu lực với tập kỹ năng cho trước trong một lượt vector hóa:
+        điểm là tỷ lệ kỹ năng yêu cầu mà người tìm việc có. Chỉ giữ các bài đăng khớp ít nhất một kỹ năng.
+        """
+        with self.lock:
+            if not skill_ids or not len(self.row_ids):
+                return RankedPostings([], np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64))
+            matches = np.isin(self.entry_skills, np.asarray(list(skill_ids), dtype=np.int32))
+            matched = np.bincount(self.entry_rows[matches], minlength=len(self.row_ids))
+            rows = np.flatnonzero(self.row_alive & (self.row_expires > time.time()) & (matched > 0))
+            scores = matched[rows] / self.row_required[rows]
+            # Sắp theo điểm giảm dần, hòa điểm thì ưu tiên bài đăng khớp nhiều kỹ năng hơn
+            order = np.lexsort((-matched[rows], -scores))
+            return RankedPostings(self.row_ids, rows[order], scores[order], matched[rows][order])
+
+
+class RankedPostings:
+    """
+    Kết quả xếp hạng dạng mảng; chỉ tạo dict cho phần được cắt (ví dụ một trang phân trang).
+    """
+
+    def __init__(self, row_ids, rows, scores, matched):
+        self.row_ids = row_ids
+        self.rows = rows
+        self.scores = scores
+        self.matched = matched
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("RankedPostings chỉ hỗ trợ cắt theo slice.")
+        return [
+            {'job_posting_id': self.row_ids[row], 'score': float(score), 'matched': int(matched)}
+            for row, score, matched in zip(self.rows[index], self.scores[index], self.matched[index])
+        ]
+
+
+skill_matrix = SkillMatrix()
+
+
+def recommend_job_postings(skill_ids):
+    skill_matrix.refresh()
+    return skill_matrix.score(skill_ids)
+
+
+def rank_applicants(job_posting):
+    """
+    Xếp hạng toàn bộ đơn ứng tuyển của một tin theo tỷ lệ kỹ năng yêu cầu mà ứng viên có (một lượt
+    vector hóa), hòa điểm thì đơn nộp trước xếp trước. Kết quả được cache theo tin và bị vô hiệu
+    khi có đơn mới hoặc tin thay đổi (xem invalidate_applicant_ranking).
+    Trả về danh sách dict (application_id, score, matched).
+    """
+    key = versioned_key(APPLICANTS_NAMESPACE, job_posting.pk)
+    ranking = cache.get(key)
+    if ranking is not None:
+        return ranking
+
+    applications = list(
+        Application.objects.filter(job_posting=job_posting).order_by('created_at', 'id').values_list('id', 'my_user_id')
+    )
+    required = list(job_posting.required_skills.values_list('id', flat=True))
+    matched = np.zeros(len(applications), dtype=np.int64)
+    if applications and required:
+        position = {user_id: index for index, (_, user_id) in enumerate(applications)}
+        user_ids = list(position)
+        rows, skills = [], []
+        through = JobSeekerProfile.skills.through
+        for start in range(0, len(user_ids), 1000):
+            for profile_id, skill_id in through.objects.filter(
+                jobseekerprofile_id__in=user_ids[start:start + 1000]
+            ).values_list('jobseekerprofile_id', 'skill_id'):
+                rows.append(position[profile_id])
+                skills.append(skill_id)
+        rows = np.asarray(rows, dtype=np.int64)
+        matches = np.isin(np.asarray(skills, dtype=np.int64), np.asarray(required, dtype=np.int64))
+        matched = np.bincount(rows[matches], minlength=len(applications))
+
+    scores = matched / len(required) if required else np.zeros(len(applications))
+    # Sắp ổn định theo điểm giảm dần nên đơn nộp trước vẫn đứng trước khi hòa điểm
+    order = np.argsort(-scores, kind='stable')
+    ranking = [
+        {'application_id': applications[i][0], 'score': float(scores[i]), 'matched': int(matched[i])}
+        for i in order
+    ]
+    cache.set(key, ranking, settings.APPLICANT_RANKING_CACHE_TIMEOUT)
+    return ranking
+
+
+def invalidate_applicant_ranking(job_posting_id):
+    bump_version(APPLICANTS_NAMESPACE, job_posting_id)
+
+
+def matching_job_seekers(job_posting):
+    """
+    Queryset hồ sơ NTV phù hợp với tin: có ít nhất một kỹ năng yêu cầu (tra qua bảng nối kỹ năng x hồ sơ,
+    được đánh chỉ mục theo kỹ năng), đồng thời địa điểm và loại công việc mong muốn khớp hoặc để trống.
+    Địa điểm mong muốn khớp khi nằm trong địa điểm của tin (không dấu), ví dụ "ha noi" với "cau giay, ha noi".
+    """
+    through = JobSeekerProfile.skills.through
+    skill_ids = list(job_posting.required_skills.values_list('id', flat=True))
+    if not skill_ids:
+        return JobSeekerProfile.objects.none()
+
+    # Số địa điểm mong muốn khác nhau nhỏ (tỉnh/thành), nên chọn trước các giá trị khớp để lọc bằng chỉ mục
+    preferred_locations = JobSeekerProfile.objects.exclude(preferred_location_normalized='').order_by().values_list(
+        'preferred_location_normalized', flat=True
+    ).distinct()
+    locations = [location for location in preferred_locations if location in job_posting.location_normalized]
+
+    return JobSeekerProfile.objects.filter(
+        my_user_id__in=through.objects.filter(skill_id__in=skill_ids).values('jobseekerprofile_id'),
+        preferred_location_normalized__in=locations + [''],
+    ).filter(
+        Q(preferred_job_type__isnull=True) | Q(preferred_job_type='') | Q(preferred_job_type=job_posting.job_type)
+    )
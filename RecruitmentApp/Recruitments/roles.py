@@ -0,0 +1,58 @@
+import threading
+
+from .models import Role
+
+
+class RoleRegistry:
+    """
+    Bộ nhớ đệm trong tiến trình cho bảng Role (chỉ vài dòng cố định).
+    Toàn bộ vai trò được tải một lần; bộ nhớ đệm bị xóa qua tín hiệu post_save/post_delete của Role.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name = None
+        self._by_id = None
+
+    def _load(self):
+        with self._lock:
+            if self._by_name is None:
+                roles = list(Role.objects.all())
+                self._by_id = {role.id: role for role in roles}
+                self._by_name = {role.role_name: role for role in roles}
+        return self._by_name
+
+    def get(self, role_name):
+        """
+        Lấy vai trò theo tên; ném Role.DoesNotExist nếu không tồn tại (giống Role.objects.get).
+        """
+        by_name = self._by_name if self._by_name is not None else self._load()
+        try:
+            return by_name[role_name]
+        except KeyError:
+            raise Role.DoesNotExist(f"Vai trò '{role_name}' không tồn tại.")
+
+    def get_by_id(self, role_id):
+        if self._by_id is None:
+            self._load()
+        try:
+            return self._by_id[role_id]
+        except KeyError:
+            raise Role.DoesNotExist(f"Vai trò #{role_id} không tồn tại.")
+
+    def get_or_create(self, role_name):
+        """
+        Lấy vai trò theo tên, tạo mới nếu chưa có. Trả về (role, created) giống get_or_create.
+        """
+        try:
+            return self.get(role_name), False
+        except Role.DoesNotExist:
+            return Role.objects.get_or_create(role_name=role_name)
+
+    def invalidate(self):
+        with self._lock:
+            self._by_name = None
+            self._by_id = None
+
+
+role_registry = RoleRegistry()
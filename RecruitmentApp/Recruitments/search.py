@@ -0,0 +1,483 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import JobPosting, JobPostingSearchTerm, JobPostingText, JobPostingTextWord, JobPostingWordTrigram, Skill, \
+    SkillTrigram
+from .text import WORD_RE, similarity, trigrams, word_similarity, word_trigrams, words
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+DOCUMENT_COUNT_CACHE_KEY = 'search:job_posting_count'
+DOCUMENT_COUNT_CACHE_TIMEOUT = 300
+# Tìm kiếm toàn văn: số bài đăng có trọng số cao nhất được xét cho mỗi từ khóa (top-k theo mức ảnh hưởng)
+TERM_CANDIDATE_LIMIT = 1000
+
+# Tìm kiếm mờ: ngưỡng điểm tối thiểu, số văn bản (tiêu đề/địa điểm phân biệt, tên kỹ năng) giống truy vấn nhất
+# được dùng, số từ trong từ điển được xét cho mỗi từ của truy vấn, số văn bản đọc mỗi lần và tối đa cho mỗi từ
+# của truy vấn, số văn bản của lô lấy tin đầu tiên trong mỗi nhóm và số tin tối đa trong kết quả
+FUZZY_MIN_SIMILARITY = 0.3
+FUZZY_TEXT_CANDIDATES = 100
+FUZZY_WORD_CANDIDATES = 20
+FUZZY_TEXT_CHUNK = 500
+FUZZY_WORD_TEXTS = 5000
+FUZZY_FIRST_BATCH = 4
+FUZZY_RESULT_LIMIT = 1000
+
+# Trọng số của từng trường khi tính điểm một từ khóa trong bài đăng
+FIELD_WEIGHTS = (
+    ('title', 3.0),
+    ('company_name', 2.0),
+    ('location', 2.0),
+    ('description', 1.0),
+)
+
+
+def tokenize(text):
+    """
+    Tách văn bản thành danh sách từ khóa (chữ thường, không dấu, bỏ các từ một ký tự).
+    """
+    return [token[:MAX_TERM_LENGTH] for token in words(text) if len(token) > 1]
+
+
+def job_posting_fields(job_posting):
+    return {
+        'title': job_posting.title,
+        'company_name': job_posting.recruiter_profile.company_name,
+        'location': job_posting.location,
+        'description': job_posting.description,
+    }
+
+
+def build_term_weights(fields):
+    """
+    Tính trọng số từng từ khóa: tổng theo trường của trọng số trường * (1 + log(tần suất)).
+    """
+    weights = defaultdict(float)
+    for field, field_weight in FIELD_WEIGHTS:
+        for term, frequency in Counter(tokenize(fields.get(field))).items():
+            weights[term] += field_weight * (1 + math.log(frequency))
+    return weights
+
+
+def is_live(status, is_active, expiration_date, now=None):
+    """
+    Tin đã duyệt, còn hoạt động và chưa quá hạn (kể cả khi lệnh đóng tin hết hạn chưa chạy tới).
+    """
+    return status == 'approved' and is_active and (
+        expiration_date is None or expiration_date > (now or timezone.now())
+    )
+
+
+def index_job_posting(job_posting):
+    """
+    Cập nhật chỉ mục của một bài đăng: xóa các dòng cũ và ghi lại các từ khóa, trigram hiện tại.
+    Chỉ tin đang hiển thị (is_live) có từ khóa trong chỉ mục, để top-k theo từ khóa của search_job_postings
+    không bị các tin nháp, chờ duyệt hay đã đóng chiếm chỗ.
+    """
+    live = is_live(job_posting.status, job_posting.is_active, job_posting.expiration_date)
+    weights = build_term_weights(job_posting_fields(job_posting)) if live else {}
+    texts = {('title', job_posting.title_normalized), ('location', job_posting.location_normalized)}
+    with transaction.atomic():
+        JobPostingSearchTerm.objects.filter(job_posting=job_posting).delete()
+        JobPostingSearchTerm.objects.bulk_create([
+            JobPostingSearchTerm(term=term, job_posting=job_posting, weight=weight)
+            for term, weight in weights.items()
+        ])
+        # Văn bản cũ (trước khi đổi tiêu đề/địa điểm) có thể vừa mất tin hiển thị cuối cùng
+        sync_texts(texts | getattr(job_posting, '_loaded_texts', set()))
+
+
+def unindex_job_postings(job_posting_ids):
+    """
+    Gỡ các tin vừa bị đóng hàng loạt (không qua save()) khỏi chỉ mục từ khóa và chỉ mục tìm kiếm mờ.
+    """
+    JobPostingSearchTerm.objects.filter(job_posting_id__in=job_posting_ids).delete()
+    texts = set()
+    for title, location in JobPosting.objects.filter(id__in=job_posting_ids).values_list(
+        'title_normalized', 'location_normalized'
+    ):
+        texts |= {('title', title), ('location', location)}
+    sync_texts(texts)
+
+
+def sync_texts(texts):
+    """
+    Đồng bộ chỉ mục tìm kiếm mờ của các văn bản (field, text): văn bản còn tin đã duyệt, còn hoạt động
+    có dòng trong chỉ mục từ -> văn bản; văn bản không còn tin nào bị gỡ khỏi chỉ mục (dòng JobPostingText
+    được giữ lại). Từ mới được thêm vào từ điển trigram. Dòng văn bản được khóa khi đồng bộ nên hai lần lưu
+    đồng thời không ghi trùng.
+    """
+    for field, text in sorted(text for text in texts if text[1]):
+        with transaction.atomic():
+            job_posting_text, _ = JobPostingText.objects.get_or_create(field=field, text=text)
+            job_posting_text = JobPostingText.objects.select_for_update().get(pk=job_posting_text.pk)
+            live = JobPosting.objects.filter(**{f"{field}_normalized": text}, status='approved', is_active=True).exists()
+            if live == job_posting_text.has_live_postings:
+                continue
+            if live:
+                text_words = text_vocabulary(text)
+                JobPostingTextWord.objects.bulk_create([
+                    JobPostingTextWord(word=word, job_posting_text=job_posting_text) for word in text_words
+                ])
+                add_words(text_words)
+            else:
+                job_posting_text.words.all().delete()
+            JobPostingText.objects.filter(pk=job_posting_text.pk).update(has_live_postings=live)
+
+
+def text_vocabulary(text):
+    """
+    Các từ phân biệt của một văn bản tìm kiếm mờ, cắt theo độ dài tối đa của cột.
+    """
+    return {word[:MAX_TERM_LENGTH] for word in words(text)}
+
+
+def add_words(text_words):
+    """
+    Thêm các từ chưa có vào chỉ mục trigram của từ điển. Hai tiến trình cùng thêm một từ không tạo dòng trùng
+    (ràng buộc duy nhất (trigram, word)).
+    """
+    existing = set(JobPostingWordTrigram.objects.filter(word__in=text_words).values_list('word', flat=True))
+    JobPostingWordTrigram.objects.bulk_create([
+        JobPostingWordTrigram(trigram=trigram, word=word, word_size=len(word_trigrams(word)))
+        for word in text_words - existing for trigram in word_trigrams(word)
+    ], ignore_conflicts=True)
+
+
+def index_recruiter_job_postings_task(recruiter_profile_id):
+    """
+    Tác vụ nền: lập lại chỉ mục các tin của nhà tuyển dụng sau khi tên công ty (một trường được lập chỉ mục)
+    thay đổi.
+    """
+    postings = JobPosting.objects.select_related('recruiter_profile').filter(
+        recruiter_profile_id=recruiter_profile_id, status='approved', is_active=True
+    ).order_by()
+    for job_posting in postings.iterator(chunk_size=500):
+        index_job_posting(job_posting)
+
+
+def index_skill(skill):
+    """
+    Cập nhật chỉ mục trigram của một kỹ năng.
+    """
+    with transaction.atomic():
+        SkillTrigram.objects.filter(skill=skill).delete()
+        SkillTrigram.objects.bulk_create([SkillTrigram(trigram=trigram, skill=skill) for trigram in trigrams(skill.name)])
+
+
+def document_count():
+    """
+    Số tin đang hiển thị (cũng là số tin có trong chỉ mục từ khóa), dùng để tính idf.
+    """
+    return cache.get_or_set(
+        DOCUMENT_COUNT_CACHE_KEY, JobPosting.objects.filter(status='approved', is_active=True).count,
+        DOCUMENT_COUNT_CACHE_TIMEOUT
+    )
+
+
+def term_frequencies(terms):
+    """
+    Số bài đăng chứa mỗi từ khóa (df), được cache như document_count vì chỉ dùng để tính idf.
+    Trả về dict chỉ gồm các từ khóa có trong chỉ mục.
+    """
+    keys = {f"search:df:{term}": term for term in terms}
+    cached = cache.get_many(keys)
+    frequencies = {keys[key]: df for key, df in cached.items()}
+    missing = [term for term in terms if f"search:df:{term}" not in cached]
+    if missing:
+        counted = dict(
+            JobPostingSearchTerm.objects.filter(term__in=missing).order_by()
+            .values('term').annotate(df=Count('id')).values_list('term', 'df')
+        )
+        cache.set_many({f"search:df:{term}": counted.get(term, 0) for term in missing}, DOCUMENT_COUNT_CACHE_TIMEOUT)
+        frequencies.update(counted)
+    return {term: df for term, df in frequencies.items() if df}
+
+
+def search_job_postings(query):
+    """
+    Trả về danh sách dict (job_posting_id, score, matched) của những tin đã duyệt và còn hoạt động,
+    xếp theo số từ khóa khớp rồi theo điểm liên quan (trọng số * idf).
+    Ứng viên là TERM_CANDIDATE_LIMIT bài đăng có trọng số cao nhất của mỗi từ khóa (đọc theo chỉ mục
+    (term, -weight)); chỉ mục chỉ chứa tin đang hiển thị nên các ứng viên này không bị tin đã đóng chiếm chỗ. Điểm của từng ứng viên sau đó được tính trên mọi từ khóa của truy vấn. Chi phí vì vậy
+    chỉ phụ thuộc số từ khóa, không phụ thuộc số bài đăng chứa một từ khóa phổ biến; đổi lại, với từ khóa
+    phổ biến kết quả chỉ gồm các ứng viên này (không đếm toàn bộ các tin khớp).
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    frequencies = term_frequencies(terms)
+    if not frequencies:
+        return []
+
+    total = max(document_count(), 1)
+    idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+
+    candidates = set()
+    for term in idf:
+        candidates.update(
+            JobPostingSearchTerm.objects.filter(term=term).order_by('-weight')
+            .values_list('job_posting_id', flat=True)[:TERM_CANDIDATE_LIMIT]
+        )
+
+    live = [row[0] for row in live_job_postings(list(candidates))]
+    results = {}
+    for start in range(0, len(live), 1000):
+        rows = JobPostingSearchTerm.objects.filter(
+            term__in=list(idf), job_posting_id__in=live[start:start + 1000]
+        ).values_list('job_posting_id', 'term', 'weight')
+        for job_posting_id, term, weight in rows:
+            row = results.setdefault(job_posting_id, {'job_posting_id': job_posting_id, 'score': 0.0, 'matched': 0})
+            row['score'] += weight * idf[term]
+            row['matched'] += 1
+
+    return sorted(results.values(), key=lambda row: (-row['matched'], -row['score'], row['job_posting_id']))
+
+
+def live_job_postings(ids, *fields):
+    """
+    Các dòng (id, *fields) của những tin đang hiển thị (is_live) trong `ids` (danh sách hoặc truy vấn con),
+    tra cứu theo khóa chính. Trạng thái được lọc trong Python: điều kiện status trong SQL khiến CSDL có thể
+    chọn chỉ mục status và duyệt mọi tin đã duyệt thay vì chỉ các id cho trước.
+    """
+    now = timezone.now()
+    batches = [ids[start:start + 1000] for start in range(0, len(ids), 1000)] if isinstance(ids, list) else [ids]
+    for batch in batches:
+        rows = JobPosting.objects.filter(id__in=batch).order_by().values_list(
+            'id', 'status', 'is_active', 'expiration_date', *fields
+        )
+        for job_posting_id, status, is_active, expiration_date, *values in rows:
+            if is_live(status, is_active, expiration_date, now):
+                yield job_posting_id, *values
+
+
+def similar_words(query_words):
+    """
+    Với mỗi từ của truy vấn: tối đa FUZZY_WORD_CANDIDATES từ trong từ điển có độ tương đồng trigram
+    (word_similarity, Jaccard) từ FUZZY_MIN_SIMILARITY trở lên, dạng dict {từ: độ tương đồng} xếp giảm dần.
+    Mỗi từ là một câu GROUP BY trên chỉ mục bao phủ (trigram, word, word_size); kết quả được cache như
+    term_frequencies (từ điển chỉ thay đổi khi có từ mới).
+    """
+    keys = {f"search:fuzzy_words:{word}": word for word in query_words}
+    cached = cache.get_many(keys)
+    matches = {keys[key]: word_matches for key, word_matches in cached.items()}
+    missing = {}
+    for word in query_words:
+        if word in matches:
+            continue
+        query_trigrams = word_trigrams(word)
+        score = ExpressionWrapper(
+            Cast(F('shared'), FloatField()) / (len(query_trigrams) + F('word_size') - F('shared')),
+            output_field=FloatField()
+        )
+        missing[word] = dict(
+            JobPostingWordTrigram.objects.filter(trigram__in=query_trigrams).order_by()
+            .values('word', 'word_size').annotate(shared=Count('id')).annotate(score=score)
+            .filter(score__gte=FUZZY_MIN_SIMILARITY).order_by('-score', 'word')
+            .values_list('word', 'score')[:FUZZY_WORD_CANDIDATES]
+        )
+    if missing:
+        cache.set_many({f"search:fuzzy_words:{word}": word_matches for word, word_matches in missing.items()},
+                       DOCUMENT_COUNT_CACHE_TIMEOUT)
+        matches.update(missing)
+    return matches
+
+
+def word_frequencies(text_words):
+    """
+    Số văn bản đang được tin hiển thị sử dụng chứa mỗi từ, được cache như term_frequencies vì chỉ dùng để
+    chọn thứ tự xét các từ của truy vấn.
+    """
+    keys = {f"search:fuzzy_df:{word}": word for word in text_words}
+    cached = cache.get_many(keys)
+    frequencies = {keys[key]: df for key, df in cached.items()}
+    missing = [word for word in text_words if f"search:fuzzy_df:{word}" not in cached]
+    if missing:
+        counted = dict(
+            JobPostingTextWord.objects.filter(word__in=missing).order_by()
+            .values('word').annotate(df=Count('id')).values_list('word', 'df')
+        )
+        cache.set_many({f"search:fuzzy_df:{word}": counted.get(word, 0) for word in missing},
+                       DOCUMENT_COUNT_CACHE_TIMEOUT)
+        frequencies.update(counted)
+    return frequencies
+
+
+class WordScores(dict):
+    """
+    Độ tương đồng của mỗi từ với từng từ của truy vấn, tính khi từ được tra lần đầu.
+    """
+
+    def __init__(self, query_words):
+        super().__init__()
+        self.query_words = query_words
+
+    def __missing__(self, text_word):
+        scores = self[text_word] = tuple(word_similarity(query_word, text_word) for query_word in self.query_words)
+        return scores
+
+
+def similar_texts(query):
+    """
+    Các văn bản tìm kiếm mờ có similarity(query, văn bản) từ FUZZY_MIN_SIMILARITY trở lên, dạng (score, field, text)
+    xếp theo điểm giảm dần, sinh theo từng nhóm: một nhóm gồm các văn bản đã chắc chắn thứ tự với dữ liệu đã
+    đọc, nhóm sau chỉ được tính (đọc thêm chỉ mục) khi cần.
+
+    similarity là trung bình, trên từng từ của truy vấn, độ tương đồng cao nhất với một từ của văn bản. Với mỗi
+    từ của truy vấn (từ có ít văn bản khớp nhất trước), các từ gần giống trong từ điển (similar_words, giống
+    hơn trước) cho biết những văn bản cần đọc qua chỉ mục từ -> văn bản; mỗi văn bản đọc được chấm điểm đầy đủ.
+    Văn bản chưa đọc không chứa các từ đã đọc hết nên điểm của nó bị chặn trên; văn bản đã chấm được sinh ra
+    khi điểm của nó không thấp hơn mức chặn đó. Thứ tự vì vậy đúng như chấm điểm mọi văn bản, trừ khi một từ
+    của truy vấn khớp quá FUZZY_WORD_TEXTS văn bản (chỉ đọc ngần ấy văn bản) hoặc có hơn FUZZY_WORD_CANDIDATES
+    từ gần giống.
+    """
+    query_words = words(query)
+    if not query_words:
+        return
+    matches = similar_words(list(dict.fromkeys(query_words)))
+    frequencies = word_frequencies({match for word_matches in matches.values() for match in word_matches})
+    word_counts = {word: sum(frequencies.get(match, 0) for match in matches[word]) for word in matches}
+
+    # Độ tương đồng của một từ (trong văn bản) với từng từ của truy vấn; từ điển nhỏ nên mỗi từ chỉ tính một lần
+    word_scores = WordScores(query_words)
+
+    def score(text):
+        # Bằng similarity(query, text); văn bản đã được chuẩn hóa nên chỉ cần tách từ
+        return sum(map(max, zip(*map(word_scores.__getitem__, WORD_RE.findall(text))))) / len(query_words)
+
+    # Mức chặn trên độ tương đồng của một văn bản chưa đọc với từng từ của truy vấn
+    ceilings = dict.fromkeys(matches, 1.0)
+    seen = set()
+    pending = []
+
+    def ready():
+        bound = max(sum(ceilings[word] for word in query_words) / len(query_words), FUZZY_MIN_SIMILARITY)
+        group = []
+        while pending and -pending[0][0] >= bound:
+            negative_score, field, text = heapq.heappop(pending)
+            group.append((-negative_score, field, text))
+        if group:
+            yield group
+
+    for query_word in sorted(matches, key=lambda word: (word_counts[word], word)):
+        read = 0
+        for match, match_score in matches[query_word].items():
+            ceilings[query_word] = match_score
+            yield from ready()
+            last_pk = 0
+            while read < FUZZY_WORD_TEXTS:
+                rows = list(
+                    JobPostingTextWord.objects.filter(word=match, job_posting_text_id__gt=last_pk)
+                    .order_by('job_posting_text_id')
+                    .values_list('job_posting_text_id', 'job_posting_text__field', 'job_posting_text__text')
+                    [:min(FUZZY_TEXT_CHUNK, FUZZY_WORD_TEXTS - read)]
+                )
+                for pk, field, text in rows:
+                    if pk not in seen:
+                        seen.add(pk)
+                        text_score = score(text)
+                        if text_score >= FUZZY_MIN_SIMILARITY:
+                            heapq.heappush(pending, (-text_score, field, text))
+                read += len(rows)
+                if len(rows) < FUZZY_TEXT_CHUNK:
+                    break
+                last_pk = rows[-1][0]
+                yield from ready()
+            else:
+                # Đã đọc đủ FUZZY_WORD_TEXTS văn bản: mức chặn của từ này giữ nguyên
+                break
+        else:
+            word_matches = matches[query_word]
+            ceilings[query_word] = (
+                min(word_matches.values()) if len(word_matches) >= FUZZY_WORD_CANDIDATES else FUZZY_MIN_SIMILARITY
+            )
+        yield from ready()
+
+    ceilings = dict.fromkeys(matches, 0.0)
+    yield from ready()
+
+
+def fuzzy_search_job_postings(query):
+    """
+    Tìm kiếm mờ trên tiêu đề và địa điểm của tin đang hiển thị. Trả về danh sách (job_posting_id, score)
+    xếp theo độ tương đồng giảm dần, tối đa FUZZY_RESULT_LIMIT tin.
+    Tin của tối đa FUZZY_TEXT_CANDIDATES văn bản giống truy vấn nhất (similar_texts) được lấy theo từng lô văn
+    bản, điểm cao trước, qua chỉ mục (<field>_normalized, status); lô đầu của mỗi nhóm có FUZZY_FIRST_BATCH văn
+    bản, lô sau gấp đôi lô trước. Việc đọc dừng khi đủ FUZZY_RESULT_LIMIT tin.
+    Điểm của một tin là điểm cao nhất giữa tiêu đề và địa điểm, nên tin chỉ khớp theo địa điểm vẫn được tìm thấy.
+    """
+    now = timezone.now()
+    scores = {}
+    taken = 0
+    for group in similar_texts(query):
+        group = group[:FUZZY_TEXT_CANDIDATES - taken]
+        taken += len(group)
+        start, batch_size = 0, FUZZY_FIRST_BATCH
+        while start < len(group) and len(scores) < FUZZY_RESULT_LIMIT:
+            batch = group[start:start + batch_size]
+            start, batch_size = start + len(batch), batch_size * 2
+            remaining = FUZZY_RESULT_LIMIT - len(scores)
+            rows = posting_rows(batch, remaining + 1)
+            if len(rows) > remaining and len(batch) > 1:
+                # Lô có nhiều tin hơn chỗ còn lại: lấy theo từng văn bản để văn bản điểm cao được ưu tiên
+                rows = []
+                for item in batch:
+                    rows.extend(posting_rows([item], remaining - len(rows)))
+                    if len(rows) >= remaining:
+                        break
+            for job_posting_id, expiration_date, score in rows:
+                if expiration_date is None or expiration_date > now:
+                    scores[job_posting_id] = max(score, scores.get(job_posting_id, 0.0))
+        if taken >= FUZZY_TEXT_CANDIDATES or len(scores) >= FUZZY_RESULT_LIMIT:
+            break
+    # id là UUID: so sánh theo giá trị số nhanh hơn nhiều so với so sánh đối tượng UUID
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0].int))[:FUZZY_RESULT_LIMIT]
+
+
+def posting_rows(texts, limit):
+    """
+    Tối đa `limit` dòng (id, expiration_date, score) của các tin đã duyệt, còn hoạt động dùng một trong các
+    văn bản (score, field, text); một truy vấn cho mỗi trường.
+    """
+    rows = []
+    for field in ('title', 'location'):
+        text_scores = {text: score for score, text_field, text in texts if text_field == field}
+        if not text_scores or len(rows) >= limit:
+            continue
+        column = f"{field}_normalized"
+        for job_posting_id, expiration_date, text in JobPosting.objects.filter(
+            **{f"{column}__in": list(text_scores)}, status='approved', is_active=True
+        ).order_by().values_list('id', 'expiration_date', column)[:limit - len(rows)]:
+            rows.append((job_posting_id, expiration_date, text_scores[text]))
+    return rows
+
+
+def fuzzy_search_skills(query):
+    """
+    Tìm kỹ năng theo tên, không phân biệt dấu và chịu lỗi chính tả.
+    Trả về danh sách (skill, score) xếp theo độ tương đồng giảm dần.
+    Tên kỹ năng là duy nhất nên chỉ mục trigram của kỹ năng đã là chỉ mục theo văn bản: chỉ
+    FUZZY_TEXT_CANDIDATES kỹ năng chung nhiều trigram với truy vấn nhất được chấm điểm lại.
+    """
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return []
+    skill_ids = (
+        SkillTrigram.objects.filter(trigram__in=query_trigrams).order_by().values('skill_id')
+        .annotate(shared=Count('id')).order_by('-shared', 'skill_id')
+        .values_list('skill_id', flat=True)[:FUZZY_TEXT_CANDIDATES]
+    )
+    ranked = []
+    for skill in Skill.objects.filter(id__in=list(skill_ids)).order_by():
+        score = similarity(query, skill.name_normalized)
+        if score >= FUZZY_MIN_SIMILARITY:
+            ranked.append((skill, score))
+    return sorted(ranked, key=lambda item: (-item[1], item[0].id))
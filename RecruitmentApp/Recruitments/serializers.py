@@ -8,7 +8,9 @@ from django.core import validators
 
 from .models import RecruiterProfile, JobSeekerProfile, UserRole, Notification, Role, CV, JobPosting, Application, \
     Interview, \
-    Message, MyUser
+    Message, MyUser, Conversation, Skill
+from .media import media_url
+from .roles import role_registry
 
 
 class MyUserSerializer(serializers.ModelSerializer):
@@ -23,7 +25,7 @@ class MyUserSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        rep['avatar'] = instance.avatar.url if instance.avatar else None
+        rep['avatar'] = media_url(instance.avatar)
         return rep
 
 
@@ -103,7 +105,8 @@ class JobSeekerProfileSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = JobSeekerProfile
-        fields = ['summary', 'experience', 'education', 'skills', 'phone_number', 'date_of_birth', 'gender']
+        fields = ['summary', 'experience', 'education', 'skills', 'phone_number', 'date_of_birth', 'gender',
+                  'preferred_location', 'preferred_job_type']
 
     def update(self, instance, validated_data):
         for attr, value in validated_data.items():
@@ -131,7 +134,7 @@ class RecruiterProfileSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        rep['company_logo_url'] = instance.company_logo.url if instance.company_logo else None
+        rep['company_logo_url'] = media_url(instance.company_logo)
         return rep
     
 
@@ -141,7 +144,7 @@ class UserRoleSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = UserRole
-        fields = ['user', 'role', 'is_approved', 'approved_at', 'approved_by']
+        fields = ['my_user', 'role', 'is_approved', 'approved_at', 'approved_by']
 
     @staticmethod
     def update_user_role(instance, validated_data):
@@ -158,13 +161,20 @@ class NotificationSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Notification
-        fields = ['recipient', 'sender', 'message', 'type', 'related_url', 'is_read', 'read_at']
+        fields = ['id', 'recipient', 'sender', 'message', 'type', 'related_url', 'is_read', 'read_at', 'created_at']
 
     def create(self, validated_data):
         notification = Notification.objects.create(**validated_data)
         return notification
 
 
+class NotificationMarkReadSerializer(serializers.Serializer):
+    """
+    Serializer cho yêu cầu đánh dấu đã đọc hàng loạt; bỏ trống "ids" để đánh dấu tất cả.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
 class BecomeAdminSerializer(serializers.ModelSerializer):
     """
     Serializer cho yêu cầu thay đổi vai trò người dùng thành admin.
@@ -174,7 +184,7 @@ class BecomeAdminSerializer(serializers.ModelSerializer):
         fields = ['my_user', 'role']
 
     def create(self, validated_data):
-        role = Role.objects.get(role_name=Role.Admin)
+        role = role_registry.get(Role.Admin)
         user = validated_data['my_user']
         user_role = UserRole.objects.create(
             user=user,
@@ -210,16 +220,17 @@ class CVSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        rep['file_path'] = instance.file_path.url if instance.file_path else None
+        rep['file_path'] = media_url(instance.file_path)
         return rep
 
 
 class JobPostingSerializer(serializers.ModelSerializer):
     recruiter_profile = serializers.PrimaryKeyRelatedField(queryset=RecruiterProfile.objects.all(), required=False)
+    required_skills = serializers.PrimaryKeyRelatedField(queryset=Skill.objects.all(), many=True, required=False)
 
     class Meta:
         model = JobPosting
-        fields = ['id', 'recruiter_profile', 'title', 'slug', 'description', 'location', 'salary_min', 'salary_max', 'experience_required', 'job_type', 'status', 'expiration_date']
+        fields = ['id', 'recruiter_profile', 'title', 'slug', 'description', 'location', 'salary_min', 'salary_max', 'experience_required', 'required_skills', 'job_type', 'status', 'expiration_date']
 
     def validate(self, data):
         # Nếu người dùng không phải là admin và không có recruiter_profile, trả về lỗi
@@ -270,24 +281,32 @@ class MessageSerializer(serializers.ModelSerializer):
         return data
 
 
-class ConversationSerializer(serializers.Serializer):
-    participant = serializers.SerializerMethodField()  # Người đối diện
-    messages = MessageSerializer(many=True)  # Danh sách các tin nhắn trong cuộc hội thoại
+class ParticipantSerializer(serializers.ModelSerializer):
+    """
+    Serializer rút gọn cho người đối diện trong cuộc hội thoại.
+    """
+    avatar = serializers.CharField(source='avatar_url', read_only=True)
+    active_role = serializers.SlugRelatedField(slug_field='role_name', read_only=True)
 
-    def get_participant(self, obj):
-        """
-        Lấy thông tin về người tham gia cuộc hội thoại (người đối diện).
-        """
-        user = self.context['request'].user  # Người dùng hiện tại
+    class Meta:
+        model = MyUser
+        fields = ['id', 'username', 'avatar', 'active_role']
 
-        # Nếu người gửi là người dùng hiện tại, trả về recipient là người đối diện, ngược lại trả về sender
-        if obj['sender'] == user:
-            return obj['recipient']  # Trả về người nhận (participant)
-        return obj['sender']  # Trả về người gửi (participant)
 
-    def to_representation(self, instance):
-        # Trả về thông tin người tham gia (participant)
-        representation = super().to_representation(instance)
-        participant = self.get_participant(instance)  # Lấy thông tin người tham gia
-        representation['participant'] = participant.username  # Trả về username của participant
-        return representation
\ No newline at end of file
+class ConversationSerializer(serializers.ModelSerializer):
+    """
+    Serializer cho bản tóm tắt cuộc hội thoại (người đối diện, tin nhắn cuối, số tin chưa đọc).
+    Thông tin người đối diện được lấy từ context['participants'] (đã tải sẵn theo lô).
+    """
+    participant = serializers.SerializerMethodField()
+    last_message = MessageSerializer(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['participant', 'last_message', 'last_message_at', 'unread_count']
+
+    def get_participant(self, obj):
+        participant = self.context.get('participants', {}).get(obj.participant_id)
+        if participant is None:
+            return {'id': obj.participant_id}
+        return ParticipantSerializer(participant).data
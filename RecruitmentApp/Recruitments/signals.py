@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model
+
+from .authentication import oauth2_cache_key
+from .caching import invalidate_user
+from .models import Application, JobPosting, MyUser, Role, UserRole
+from .recommendations import invalidate_applicant_ranking
+from .roles import role_registry
+
+AccessToken = get_access_token_model()
+
+
+@receiver([post_save, post_delete], sender=Role)
+def invalidate_role_registry(sender, **kwargs):
+    role_registry.invalidate()
+
+
+@receiver([post_save, post_delete], sender=AccessToken)
+def invalidate_cached_access_token(sender, instance, **kwargs):
+    cache.delete(oauth2_cache_key(instance.token))
+
+
+@receiver(post_save, sender=MyUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserRole)
+def invalidate_cached_user_roles(sender, instance, **kwargs):
+    # Danh sách vai trò đã duyệt nằm trong cache người dùng
+    invalidate_user(instance.my_user_id)
+
+
+@receiver(m2m_changed, sender=JobPosting.required_skills.through)
+def touch_job_posting_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    # Cập nhật updated_at để ma trận gợi ý việc làm (làm mới theo updated_at) nhận thay đổi kỹ năng
+    if reverse and action == 'pre_clear':
+        # Sau khi xóa hết sẽ không còn biết các tin liên quan, nên ghi nhớ trước
+        instance._cleared_job_posting_ids = list(instance.job_postings.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        job_posting_ids = [instance.pk]
+    elif action == 'post_clear':
+        job_posting_ids = getattr(instance, '_cleared_job_posting_ids', [])
+    else:
+        job_posting_ids = pk_set
+    JobPosting.objects.filter(pk__in=job_posting_ids).update(updated_at=timezone.now())
+    for job_posting_id in job_posting_ids:
+        invalidate_applicant_ranking(job_posting_id)
+
+
+@receiver([post_save, post_delete], sender=JobPosting)
+def invalidate_posting_applicants(sender, instance, **kwargs):
+    invalidate_applicant_ranking(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Application)
+def invalidate_applicants(sender, instance, **kwargs):
+    # Đơn ứng tuyển mới/thay đổi làm bảng xếp hạng ứng viên của tin bị cũ
+    invalidate_applicant_ranking(instance.job_posting_id)
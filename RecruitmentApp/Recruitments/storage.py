@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import uuid
+
+import cloudinary
+import requests
+from cloudinary import CloudinaryResource
+from cloudinary.utils import api_sign_request, verify_api_response_signature
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .media import media_url
+
+UPLOAD_TICKET_SALT = 'Recruitments.storage.cv-upload'
+CV_FOLDER = 'cvs'
+DOWNLOAD_TIMEOUT = 30
+
+
+class CloudinaryUploadBackend:
+    """
+    Tải CV trực tiếp từ client lên Cloudinary bằng tham số đã ký; khi hoàn tất, client gửi lại
+    version và signature trong phản hồi của Cloudinary để server xác minh mà không cần gọi API.
+    """
+    resource_type = 'raw'
+
+    def create_upload(self, public_id):
+        config = cloudinary.config()
+        params = {'public_id': public_id, 'timestamp': int(time.time())}
+        return {
+            'url': f"https://api.cloudinary.com/v1_1/{config.cloud_name}/{self.resource_type}/upload",
+            'fields': {
+                **params,
+                'api_key': config.api_key,
+                'signature': api_sign_request(params, config.api_secret),
+            },
+        }
+
+    def verify_upload(self, public_id, data):
+        """
+        Trả về CloudinaryResource của tệp đã tải lên, hoặc None nếu không xác minh được.
+        """
+        version = str(data.get('version') or '')
+        signature = data.get('signature')
+        if not version.isdigit() or not signature:
+            return None
+        if not verify_api_response_signature(public_id, version, signature):
+            return None
+        return CloudinaryResource(public_id=public_id, version=version, format=data.get('format') or None,
+                                  type='upload', resource_type=self.resource_type)
+
+    def read(self, resource):
+        """
+        Tải nội dung tệp (dùng ở worker nền, ví dụ để trích xuất văn bản CV).
+        """
+        response = requests.get(media_url(resource), timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+
+class LocalFileSystemUploadBackend:
+    """
+    Bản thay thế chạy offline: client tải tệp lên LocalCVUploadView, tệp được lưu dưới CV_UPLOAD_ROOT.
+    Dùng cho kiểm thử và môi trường phát triển.
+    """
+    resource_type = 'raw'
+
+    def create_upload(self, public_id):
+        return {
+            'url': reverse('cv-local-upload'),
+            'fields': {'public_id': public_id},
+        }
+
+    def path(self, public_id):
+        return os.path.join(settings.CV_UPLOAD_ROOT, *public_id.split('/'))
+
+    def save(self, public_id, uploaded_file):
+        path = self.path(public_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as destination:
+            for chunk in uploaded_file.chunks():
+                destination.write(chunk)
+        return int(os.path.getmtime(path))
+
+    def verify_upload(self, public_id, data):
+        path = self.path(public_id)
+        if not os.path.isfile(path):
+            return None
+        return CloudinaryResource(public_id=public_id, version=str(int(os.path.getmtime(path))),
+                                  type='upload', resource_type=self.resource_type)
+
+    def read(self, resource):
+        # Khi tải từ DB, phần mở rộng của tài nguyên được tách sang thuộc tính format
+        public_id = resource.public_id + (f".{resource.format}" if resource.format else '')
+        with open(self.path(public_id), 'rb') as source:
+            return source.read()
+
+
+_backends = {}
+
+
+def get_upload_backend():
+    """
+    Backend tải CV được cấu hình bởi CV_UPLOAD_BACKEND (mỗi lớp chỉ khởi tạo một lần).
+    """
+    path = settings.CV_UPLOAD_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def new_public_id(file_name):
+    """
+    Tạo public_id duy nhất trong thư mục CV, giữ phần mở rộng của tệp gốc (tài nguyên raw).
+    """
+    extension = os.path.splitext(file_name or '')[1].lower()
+    if not re.fullmatch(r'\.[a-z0-9]{1,8}', extension):
+        extension = ''
+    return f"{CV_FOLDER}/{uuid.uuid4().hex}{extension}"
+
+
+def issue_upload_ticket(user, file_name):
+    """
+    Cấp vé tải lên: public_id được ký cùng id người dùng để bước hoàn tất không thể bị giả mạo.
+    """
+    public_id = new_public_id(file_name)
+    ticket = signing.dumps({'user': user.id, 'public_id': public_id}, salt=UPLOAD_TICKET_SALT)
+    return {
+        'ticket': ticket,
+        'public_id': public_id,
+        'upload': get_upload_backend().create_upload(public_id),
+        'expires_in': settings.CV_UPLOAD_TICKET_MAX_AGE,
+    }
+
+
+def read_upload_ticket(ticket, user):
+    """
+    Trả về public_id trong vé nếu vé hợp lệ, chưa hết hạn và thuộc về người dùng; ngược lại trả về None.
+    """
+    try:
+        data = signing.loads(ticket, salt=UPLOAD_TICKET_SALT, max_age=settings.CV_UPLOAD_TICKET_MAX_AGE)
+    except (signing.BadSignature, TypeError):
+        return None
+    if data.get('user') != user.id:
+        return None
+    return data.get('public_id')
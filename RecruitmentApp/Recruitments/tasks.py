@@ -0,0 +1,120 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+
+
+def task_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, **payload):
+    """
+    Đưa một lời gọi hàm vào hàng đợi tác vụ nền. Payload phải tuần tự hóa được thành JSON.
+    Tác vụ được ghi trong cùng transaction với thao tác hiện tại.
+    """
+    return BackgroundTask.objects.create(name=task_name(func), payload=payload)
+
+
+def claim_tasks(limit):
+    """
+    Nhận tối đa `limit` tác vụ đến hạn, đánh dấu 'running' để các worker khác không xử lý trùng.
+    Tác vụ 'running' đã quá BACKGROUND_TASK_LEASE_SECONDS (worker nhận nó đã dừng giữa chừng) được
+    nhận lại và lần chạy bị mất tính là một lần thử; quá MAX_ATTEMPTS lần thì chuyển sang 'failed'.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.BACKGROUND_TASK_LEASE_SECONDS)
+    with transaction.atomic():
+        tasks = list(
+            BackgroundTask.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending', run_after__lte=now) | Q(status='running', claimed_at__lt=stale_before))
+            .order_by('id')[:limit]
+        )
+        lost = [task for task in tasks if task.status == 'running']
+        for task in lost:
+            logger.warning("Tác vụ nền %s (#%s) hết hạn thuê khi đang chạy, nhận lại", task.name, task.id)
+            task.attempts += 1
+            if task.attempts >= MAX_ATTEMPTS:
+                task.status = 'failed'
+                task.last_error = "Hết hạn thuê khi đang chạy."
+        if lost:
+            BackgroundTask.objects.bulk_update(lost, ['status', 'attempts', 'last_error'])
+
+        tasks = [task for task in tasks if task.status != 'failed']
+        if tasks:
+            BackgroundTask.objects.filter(id__in=[task.id for task in tasks]).update(
+                status='running', claimed_at=now, updated_at=now
+            )
+            for task in tasks:
+                task.status = 'running'
+                task.claimed_at = now
+    return tasks
+
+
+def renew_lease(task):
+    """
+    Gia hạn thuê ngay trước khi chạy tác vụ, để tác vụ ở cuối một lô chạy lâu không bị worker khác nhận lại.
+    Chỉ gia hạn khi tác vụ vẫn do lần nhận này giữ (claimed_at không đổi); trả về False nếu thuê đã hết
+    và tác vụ đã bị nhận lại.
+    """
+    now = timezone.now()
+    renewed = BackgroundTask.objects.filter(id=task.id, status='running', claimed_at=task.claimed_at).update(
+        claimed_at=now, updated_at=now
+    )
+    if renewed:
+        task.claimed_at = now
+    return bool(renewed)
+
+
+def run_task(task):
+    """
+    Thực thi một tác vụ trong một transaction cùng với việc đánh dấu 'done': tác vụ lỗi giữa chừng không để
+    lại thay đổi dở dang (ví dụ một phần các lô thông báo), nên chạy lại không ghi trùng. Nếu lỗi, đặt lịch
+    thử lại với thời gian chờ tăng dần cho tới MAX_ATTEMPTS lần.
+    """
+    task.attempts += 1
+    try:
+        with transaction.atomic():
+            import_string(task.name)(**task.payload)
+            task.status = 'done'
+            task.last_error = None
+            task.save(update_fields=['status', 'attempts', 'run_after', 'last_error', 'updated_at'])
+    except Exception:
+        logger.exception("Tác vụ nền %s (#%s) thất bại", task.name, task.id)
+        task.last_error = traceback.format_exc()
+        if task.attempts >= MAX_ATTEMPTS:
+            task.status = 'failed'
+        else:
+            task.status = 'pending'
+            task.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (task.attempts - 1))
+        task.save(update_fields=['status', 'attempts', 'run_after', 'last_error', 'updated_at'])
+    return task
+
+
+def run_pending_tasks(limit=10):
+    """
+    Nhận và thực thi lần lượt các tác vụ đến hạn. Trả về số tác vụ đã xử lý.
+    Lô nhận nhỏ và thuê được gia hạn trước mỗi tác vụ, nên chỉ một tác vụ chạy quá
+    BACKGROUND_TASK_LEASE_SECONDS mới có thể bị nhận lại.
+    """
+    tasks = claim_tasks(limit)
+    processed = 0
+    for task in tasks:
+        if not renew_lease(task):
+            logger.warning("Tác vụ nền %s (#%s) đã bị worker khác nhận lại, bỏ qua", task.name, task.id)
+            continue
+        run_task(task)
+        processed += 1
+    return processed
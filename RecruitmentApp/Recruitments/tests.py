@@ -1,3 +1,1463 @@
-from django.test import TestCase
+import copy
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_application_model
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import search
+from .authentication import CachedOAuth2Authentication, oauth2_cache_key
+from .candidates import extract_pdf_strings, extract_text
+from .firebase_sync import MAX_ATTEMPTS as OUTBOX_MAX_ATTEMPTS, InMemoryFirebaseBackend, claim_events, \
+    conversation_key, drain_outbox, fold_updates, message_data, message_path, record
+from .management.commands.migrate_firebase_layout import CHECKPOINT_PATH
+from .models import CV, Application, BackgroundTask, Conversation, FirebaseOutbox, JobPosting, JobPostingSlugCounter, \
+    JobPostingText, JobSeekerProfile, Message, MyUser, Notification, NotificationCounter, RecruiterProfile, Role, Skill, UserRole
+from .notifications import deliver_notifications
+from .pagination import MessageThreadPagination
+from .recommendations import SkillMatrix, rank_applicants
+from .roles import role_registry
+from .storage import LocalFileSystemUploadBackend
+from .tasks import MAX_ATTEMPTS as TASK_MAX_ATTEMPTS, claim_tasks, enqueue, run_pending_tasks
+from .text import normalize_text, similarity
+
+calls = []
+
+
+def record_call(**payload):
+    calls.append(payload)
+
+
+class FirebaseOutboxLeaseTests(TestCase):
+    """
+    Sự kiện outbox bị nhận bởi một worker dừng giữa chừng không được chặn hội thoại mãi mãi.
+    """
+
+    def setUp(self):
+        self.first = record('1_2', {'conversations/1_2/messages/1': {'content': 'a'}})
+        self.second = record('1_2', {'conversations/1_2/messages/2': {'content': 'b'}})
+
+    def crash_after_claim(self):
+        # Worker nhận sự kiện đầu tiên rồi dừng mà không gửi
+        self.assertEqual([event.id for event in claim_events(1)], [self.first.id])
+
+    def expire_lease(self):
+        FirebaseOutbox.objects.filter(status='running').update(
+            claimed_at=timezone.now() - timedelta(seconds=settings.FIREBASE_OUTBOX_LEASE_SECONDS + 1)
+        )
+
+    def test_running_event_blocks_conversation_within_lease(self):
+        self.crash_after_claim()
+        self.assertEqual(drain_outbox(backend=InMemoryFirebaseBackend()), 0)
+
+    def test_outbox_drains_after_lease_expires(self):
+        self.crash_after_claim()
+        self.expire_lease()
+
+        backend = InMemoryFirebaseBackend()
+        self.assertEqual(drain_outbox(backend=backend), 2)
+        self.assertFalse(FirebaseOutbox.objects.exists())
+        self.assertEqual(backend.get('conversations/1_2/messages'), {'1': {'content': 'a'}, '2': {'content': 'b'}})
+        # Một lần gửi duy nhất, theo đúng thứ tự của hội thoại
+        self.assertEqual(len(backend.calls), 1)
+
+    def test_reclaim_counts_as_attempt(self):
+        self.crash_after_claim()
+        self.expire_lease()
+
+        events = claim_events(10)
+        self.assertEqual([event.id for event in events], [self.first.id, self.second.id])
+        self.assertEqual(FirebaseOutbox.objects.get(id=self.first.id).attempts, 1)
+        self.assertEqual(FirebaseOutbox.objects.get(id=self.second.id).attempts, 0)
+
+    def test_event_fails_after_too_many_lost_claims(self):
+        FirebaseOutbox.objects.filter(id=self.first.id).update(attempts=OUTBOX_MAX_ATTEMPTS - 1)
+        self.crash_after_claim()
+        self.expire_lease()
+
+        self.assertEqual([event.id for event in claim_events(10)], [self.second.id])
+        self.assertEqual(FirebaseOutbox.objects.get(id=self.first.id).status, 'failed')
+
+
+class BackgroundTaskLeaseTests(TestCase):
+    """
+    Tác vụ nền bị nhận bởi một worker dừng giữa chừng được nhận lại sau khi hết hạn thuê.
+    """
+
+    def setUp(self):
+        calls.clear()
+        self.task = enqueue(record_call, value=1)
+        # Worker nhận tác vụ rồi dừng mà không chạy
+        self.assertEqual([task.id for task in claim_tasks(10)], [self.task.id])
+
+    def expire_lease(self):
+        BackgroundTask.objects.filter(id=self.task.id).update(
+            claimed_at=timezone.now() - timedelta(seconds=settings.BACKGROUND_TASK_LEASE_SECONDS + 1)
+        )
+
+    def test_running_task_is_not_reclaimed_within_lease(self):
+        self.assertEqual(run_pending_tasks(), 0)
+        self.assertEqual(calls, [])
+
+    def test_task_is_retried_after_lease_expires(self):
+        self.expire_lease()
+
+        self.assertEqual(run_pending_tasks(), 1)
+        self.assertEqual(calls, [{'value': 1}])
+        task = BackgroundTask.objects.get(id=self.task.id)
+        self.assertEqual(task.status, 'done')
+        # Lần chạy bị mất và lần chạy lại đều được tính
+        self.assertEqual(task.attempts, 2)
+
+    def test_task_fails_after_too_many_lost_claims(self):
+        BackgroundTask.objects.filter(id=self.task.id).update(attempts=TASK_MAX_ATTEMPTS - 1)
+        self.expire_lease()
+
+        self.assertEqual(run_pending_tasks(), 0)
+        self.assertEqual(calls, [])
+        self.assertEqual(BackgroundTask.objects.get(id=self.task.id).status, 'failed')
+
+
+def reclaim_running_tasks():
+    # Tác vụ chạy lâu: thuê của cả lô hết hạn và một worker khác nhận lại các tác vụ còn lại
+    BackgroundTask.objects.filter(status='running').update(
+        claimed_at=timezone.now() - timedelta(seconds=settings.BACKGROUND_TASK_LEASE_SECONDS + 1)
+    )
+    claim_tasks(10)
+
+
+class BackgroundTaskBatchTests(TestCase):
+    """
+    Tác vụ được chạy trong một transaction và chỉ khi worker còn giữ thuê.
+    """
+
+    def setUp(self):
+        calls.clear()
+        self.user = MyUser.objects.create(username='inbox', email='inbox@example.com')
+
+    def test_task_in_reclaimed_batch_is_skipped(self):
+        slow = enqueue(reclaim_running_tasks)
+        task = enqueue(record_call, value=1)
+
+        self.assertEqual(run_pending_tasks(), 1)
+        self.assertEqual(BackgroundTask.objects.get(id=slow.id).status, 'done')
+        # Tác vụ thứ hai thuộc về worker đã nhận lại nó, không chạy hai lần
+        self.assertEqual(calls, [])
+        self.assertEqual(BackgroundTask.objects.get(id=task.id).status, 'running')
+
+    def test_failed_delivery_leaves_no_partial_batches(self):
+        recipients = [self.user.id] + [
+            MyUser.objects.create(username=f'inbox{index}', email=f'inbox{index}@example.com').id for index in range(3)
+        ]
+        task = enqueue(deliver_notifications, recipient_ids=recipients, message='Thông báo', type='System',
+                       batch_size=2)
+        increment = NotificationCounter.increment
+
+        def fail_on_second_batch(counts):
+            if Notification.objects.count() > 2:
+                raise RuntimeError("Mất kết nối")
+            increment(counts)
+
+        with mock.patch.object(NotificationCounter, 'increment', side_effect=fail_on_second_batch):
+            run_pending_tasks()
+        self.assertEqual(BackgroundTask.objects.get(id=task.id).status, 'pending')
+        self.assertFalse(Notification.objects.exists())
+
+        BackgroundTask.objects.filter(id=task.id).update(run_after=timezone.now())
+        self.assertEqual(run_pending_tasks(), 1)
+        self.assertEqual(Notification.objects.count(), len(recipients))
+        self.assertEqual(NotificationCounter.unread_for(self.user.id), 1)
+
+
+class ConversationSummaryTests(TestCase):
+    """
+    Bản tóm tắt hội thoại của hai phía theo dõi tin nhắn cuối và số tin chưa đọc khi gửi, đọc và xóa.
+    """
+
+    def setUp(self):
+        self.sender = MyUser.objects.create(username='sender', email='sender@example.com')
+        self.recipient = MyUser.objects.create(username='recipient', email='recipient@example.com')
+
+    def send(self, content, sender=None, recipient=None):
+        message = Message.objects.create(sender=sender or self.sender, recipient=recipient or self.recipient,
+                                         content=content)
+        Conversation.record_message(message)
+        return message
+
+    def side(self, my_user, participant):
+        return Conversation.objects.get(my_user=my_user, participant=participant)
+
+    def test_record_message_updates_both_sides(self):
+        self.send('Tin 1')
+        last = self.send('Tin 2')
+        for my_user, participant, unread_count in ((self.sender, self.recipient, 0),
+                                                   (self.recipient, self.sender, 2)):
+            conversation = self.side(my_user, participant)
+            self.assertEqual(conversation.last_message_id, last.id)
+            self.assertEqual(conversation.last_message_at, last.created_at)
+            self.assertEqual(conversation.unread_count, unread_count)
+
+        self.send('Trả lời', sender=self.recipient, recipient=self.sender)
+        self.assertEqual(self.side(self.sender, self.recipient).unread_count, 1)
+        self.assertEqual(self.side(self.recipient, self.sender).unread_count, 2)
+
+    def test_record_read_does_not_go_below_zero(self):
+        self.send('Tin 1')
+        self.send('Tin 2')
+        Conversation.record_read(self.recipient.id, self.sender.id)
+        self.assertEqual(self.side(self.recipient, self.sender).unread_count, 1)
+        Conversation.record_read(self.recipient.id, self.sender.id, count=5)
+        self.assertEqual(self.side(self.recipient, self.sender).unread_count, 0)
+        self.assertEqual(self.side(self.sender, self.recipient).unread_count, 0)
+
+    def test_record_delete_recomputes_last_message(self):
+        first = self.send('Tin 1')
+        last = self.send('Tin 2')
+        last.delete()
+        Conversation.record_delete(last, was_unread=True)
+        for my_user, participant in ((self.sender, self.recipient), (self.recipient, self.sender)):
+            self.assertEqual(self.side(my_user, participant).last_message_id, first.id)
+        self.assertEqual(self.side(self.recipient, self.sender).unread_count, 1)
+
+        first.delete()
+        Conversation.record_delete(first, was_unread=True)
+        self.assertFalse(Conversation.objects.exists())
+
+
+class AllConversationsQueryCountTests(TestCase):
+    """
+    Danh sách hội thoại lấy người đối diện của cả trang trong một truy vấn (không N+1).
+    """
+
+    def setUp(self):
+        role = Role.objects.create(role_name='JobSeeker')
+        self.user = MyUser.objects.create(username='owner', email='owner@example.com', active_role=role)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_conversations(self, count):
+        for _ in range(count):
+            index = MyUser.objects.count()
+            participant = MyUser.objects.create(username=f'participant{index}', email=f'participant{index}@example.com')
+            message = Message.objects.create(sender=participant, recipient=self.user, content='Xin chào')
+            Conversation.record_message(message)
+
+    def list_conversations(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('all_conversations'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_conversations(self):
+        self.add_conversations(1)
+        response, single = self.list_conversations()
+        self.assertEqual(len(response.data['results']), 1)
+
+        self.add_conversations(9)
+        response, many = self.list_conversations()
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(many, single)
+
+        # Trang hội thoại, người đối diện (kèm vai trò) và không gì khác
+        with self.assertNumQueries(2):
+            self.client.get(reverse('all_conversations'))
+
+    def test_participant_details(self):
+        self.add_conversations(1)
+        response, _ = self.list_conversations()
+        participant = response.data['results'][0]['participant']
+        self.assertEqual(participant['username'], 'participant1')
+
+
+class MessageThreadPaginationTests(TestCase):
+    """
+    Phân trang keyset của luồng tin nhắn trộn đúng hai chiều gửi qua ranh giới các trang.
+    """
+
+    def setUp(self):
+        self.user = MyUser.objects.create(username='reader', email='reader@example.com')
+        self.other = MyUser.objects.create(username='writer', email='writer@example.com')
+        stranger = MyUser.objects.create(username='stranger', email='stranger@example.com')
+        start = timezone.now() - timedelta(hours=1)
+        self.messages = []
+        for index in range(7):
+            sender, recipient = (self.user, self.other) if index % 3 else (self.other, self.user)
+            message = Message.objects.create(sender=sender, recipient=recipient, content=f'Tin {index}')
+            # Hai tin cùng thời điểm để kiểm tra thứ tự phụ theo id
+            Message.objects.filter(pk=message.pk).update(created_at=start + timedelta(minutes=index // 2 * 2))
+            self.messages.append(message.pk)
+        Message.objects.create(sender=stranger, recipient=self.user, content='Không thuộc luồng')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_older_pages_cover_thread(self):
+        page = self.get_page(f'/api/messages/thread/{self.other.id}/?page_size=3')
+        self.assertEqual([message['id'] for message in page['results']], self.messages[4:])
+
+        seen = []
+        while page['older']:
+            seen = [message['id'] for message in page['results']] + seen
+            page = self.get_page(page['older'])
+        seen = [message['id'] for message in page['results']] + seen
+        self.assertEqual(seen, self.messages)
+
+    def test_newer_pages_from_cursor(self):
+        first = Message.objects.get(pk=self.messages[0])
+        cursor = MessageThreadPagination.encode_cursor(first)
+        page = self.get_page(f'/api/messages/thread/{self.other.id}/?page_size=2&after={cursor}')
+        self.assertEqual([message['id'] for message in page['results']], self.messages[1:3])
+
+        page = self.get_page(page['newer'])
+        self.assertEqual([message['id'] for message in page['results']], self.messages[3:5])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/messages/thread/{self.other.id}/?before=khong-hop-le')
+        self.assertEqual(response.status_code, 404)
+
+
+class MessageThreadReadTests(TestCase):
+    """
+    Đánh dấu đã đọc cả luồng bằng một câu UPDATE, giảm đúng số tin chưa đọc và ghi một sự kiện Firebase.
+    """
+
+    def setUp(self):
+        self.user = MyUser.objects.create(username='reader', email='reader@example.com')
+        self.other = MyUser.objects.create(username='writer', email='writer@example.com')
+        self.unread = []
+        for index in range(4):
+            message = Message.objects.create(sender=self.other, recipient=self.user, content=f'Tin {index}')
+            Conversation.record_message(message)
+            self.unread.append(message.pk)
+        reply = Message.objects.create(sender=self.user, recipient=self.other, content='Trả lời')
+        Conversation.record_message(reply)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def read_thread(self, data):
+        return self.client.post(f'/api/messages/thread/{self.other.id}/read/', data, format='json')
+
+    def unread_count(self):
+        return Conversation.objects.get(my_user=self.user, participant=self.other).unread_count
+
+    def test_marks_messages_up_to_cursor(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.read_thread({'up_to': self.unread[2]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'marked_read': 3})
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "Recruitments_message"')]
+        self.assertEqual(len(updates), 1)
+
+        self.assertEqual(set(Message.objects.filter(is_read=True).values_list('id', flat=True)), set(self.unread[:3]))
+        self.assertEqual(self.unread_count(), 1)
+        event = FirebaseOutbox.objects.get()
+        read_paths = {path for path in event.updates if path.endswith('/is_read')}
+        self.assertEqual(read_paths, {
+            f"conversations/{self.user.id}_{self.other.id}/messages/{message_id}/is_read"
+            for message_id in self.unread[:3]
+        })
+
+    def test_read_everything_once(self):
+        self.assertEqual(self.read_thread({}).data, {'marked_read': 4})
+        self.assertEqual(self.unread_count(), 0)
+        self.assertEqual(self.read_thread({}).data, {'marked_read': 0})
+        self.assertEqual(FirebaseOutbox.objects.count(), 1)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.read_thread({'up_to': 'abc'}).status_code, 400)
+        self.assertEqual(self.unread_count(), 4)
+
+
+class MigrateFirebaseLayoutTests(TestCase):
+    """
+    Chuyển node 'messages' phẳng sang cấu trúc theo hội thoại theo từng trang, có điểm dừng để chạy tiếp.
+    """
+
+    def setUp(self):
+        self.first, self.second, self.third = MyUser.objects.bulk_create([
+            MyUser(username=f'layout{index}', email=f'layout{index}@example.com') for index in range(3)
+        ])
+        self.messages = []
+        for sender, recipient in ((self.first, self.second), (self.third, self.first), (self.second, self.first)):
+            message = Message.objects.create(sender=sender, recipient=recipient, content='Xin chào')
+            Conversation.record_message(message)
+            self.messages.append(message)
+        self.backend = InMemoryFirebaseBackend()
+        self.backend.update({f'messages/{message.id}': message_data(message) for message in self.messages})
+        self.backend.calls.clear()
+
+    def migrate(self, *args):
+        stdout = StringIO()
+        with mock.patch('Recruitments.management.commands.migrate_firebase_layout.get_backend',
+                        return_value=self.backend):
+            call_command('migrate_firebase_layout', '--batch-size', '2', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def migrated(self, message):
+        return self.backend.get(message_path(message.id, message.sender_id, message.recipient_id))
+
+    def test_migrates_pages_with_checkpoint(self):
+        self.assertIn('Hoàn tất, đã chuyển 3 tin nhắn', self.migrate())
+        # Mỗi trang một lần update, kèm điểm dừng
+        self.assertEqual(len(self.backend.calls), 2)
+        self.assertEqual(self.backend.get(CHECKPOINT_PATH), str(self.messages[-1].id))
+        for message in self.messages:
+            self.assertEqual(self.migrated(message), message_data(message))
+
+        summaries = self.backend.get(f'user_conversations/{self.first.id}')
+        self.assertEqual(set(summaries), {conversation_key(self.first.id, self.second.id),
+                                          conversation_key(self.first.id, self.third.id)})
+        self.assertEqual(summaries[conversation_key(self.first.id, self.second.id)]['last_message_id'],
+                         self.messages[2].id)
+        self.assertIn('thiếu 0, khác 0', self.migrate('--check'))
+
+    def test_resumes_after_checkpoint(self):
+        self.backend.update({CHECKPOINT_PATH: str(self.messages[0].id)})
+        self.assertIn('Tiếp tục sau khóa', self.migrate())
+        self.assertIsNone(self.migrated(self.messages[0]))
+        self.assertIsNotNone(self.migrated(self.messages[1]))
+        self.assertIn('thiếu 1, khác 0', self.migrate('--check'))
+
+        self.migrate('--restart')
+        self.assertEqual(self.migrated(self.messages[0]), message_data(self.messages[0]))
+
+    def test_dry_run_writes_nothing(self):
+        self.assertIn('Sẽ chuyển 3 tin nhắn', self.migrate('--dry-run'))
+        self.assertEqual(self.backend.calls, [])
+
+
+class ReconcileFirebaseTests(TestCase):
+    """
+    Đối soát sửa tin nhắn thiếu, thừa, khác nội dung và dọn các hội thoại chỉ còn trên Firebase.
+    """
+
+    def setUp(self):
+        self.user, self.other, self.gone, self.gone_other = MyUser.objects.bulk_create([
+            MyUser(username=f'reconcile{index}', email=f'reconcile{index}@example.com') for index in range(4)
+        ])
+        self.messages = []
+        for index in range(3):
+            message = Message.objects.create(sender=self.user, recipient=self.other, content=f'Tin {index}')
+            Conversation.record_message(message)
+            self.messages.append(message)
+
+        self.backend = InMemoryFirebaseBackend()
+        pair = conversation_key(self.user.id, self.other.id)
+        orphan = conversation_key(self.gone.id, self.gone_other.id)
+        self.backend.update({
+            message_path(self.messages[0].id, self.user.id, self.other.id): message_data(self.messages[0]),
+            message_path(self.messages[1].id, self.user.id, self.other.id): {
+                **message_data(self.messages[1]), 'content': 'Đã sửa'
+            },
+            f'conversations/{pair}/messages/999999': {'content': 'Không có trong DB'},
+            f'conversations/{orphan}/messages/5': {'content': 'Hội thoại đã xóa'},
+            f'user_conversations/{self.gone.id}/{orphan}': {'participant': self.gone_other.id},
+            f'user_conversations/{self.gone_other.id}/{orphan}': {'participant': self.gone.id},
+        })
+
+    def reconcile(self, *args):
+        stdout = StringIO()
+        with mock.patch('Recruitments.management.commands.reconcile_firebase.get_backend',
+                        return_value=self.backend):
+            call_command('reconcile_firebase', '--batch-size', '2', *args, stdout=stdout, stderr=StringIO())
+        while drain_outbox(backend=self.backend):
+            pass
+        return stdout.getvalue()
+
+    def test_repairs_messages_and_orphans(self):
+        output = self.reconcile()
+        self.assertIn('thiếu trên Firebase 1, thừa trên Firebase 2, khác nội dung 1', output)
+        self.assertIn('hội thoại chỉ có trên Firebase 1', output)
+
+        messages = self.backend.get(f'conversations/{conversation_key(self.user.id, self.other.id)}/messages')
+        self.assertEqual(messages, {str(message.id): message_data(message) for message in self.messages})
+        self.assertIsNone(self.backend.get(f'conversations/{conversation_key(self.gone.id, self.gone_other.id)}'))
+        self.assertIsNone(self.backend.get(f'user_conversations/{self.gone.id}'))
+        self.assertIsNone(self.backend.get(f'user_conversations/{self.gone_other.id}'))
+
+        self.assertIn('thiếu trên Firebase 0, thừa trên Firebase 0, khác nội dung 0', self.reconcile())
+
+    def test_dry_run_only_reports(self):
+        before = copy.deepcopy(self.backend.data)
+        output = self.reconcile('--dry-run')
+        self.assertIn('hội thoại chỉ có trên Firebase 1', output)
+        self.assertFalse(FirebaseOutbox.objects.exists())
+        self.assertEqual(self.backend.data, before)
+
+
+class FoldUpdatesTests(TestCase):
+    """
+    Gộp cập nhật Firebase theo thứ tự: ghi đè node cha bỏ các cập nhật con trước đó, cập nhật con sau đó
+    được gộp vào giá trị của node cha.
+    """
+
+    def test_parent_and_child_paths(self):
+        merged = fold_updates([
+            {'a/b': 1, 'a/c': {'x': 1}},
+            {'a': {'z': 2}},
+            {'a/q/r': 3, 'd': None},
+            {'/a/z/': None},
+        ])
+        self.assertEqual(merged, {'a': {'q': {'r': 3}}, 'd': None})
+
+    def test_values_are_copied(self):
+        value = {'x': 1}
+        merged = fold_updates([{'a': value}, {'a/y': 2}])
+        self.assertEqual(merged, {'a': {'x': 1, 'y': 2}})
+        self.assertEqual(value, {'x': 1})
+
+    def test_many_message_paths(self):
+        update_list = [
+            {f"conversations/1_2/messages/{index}/is_read": True, 'user_conversations/1/1_2': {'unread_count': 0}}
+            for index in range(5000)
+        ]
+        merged = fold_updates(update_list + [{'conversations/1_2/messages/7': None}])
+        self.assertEqual(len(merged), 5001)
+        self.assertIsNone(merged['conversations/1_2/messages/7'])
+        self.assertIs(merged['conversations/1_2/messages/8/is_read'], True)
+
+
+class CachedOAuth2AuthenticationTests(TestCase):
+    """
+    Cache token OAuth2 chỉ giữ định danh của token; người dùng luôn lấy qua cache người dùng có phiên bản.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.role = Role.objects.create(role_name='JobSeeker')
+        self.user = MyUser.objects.create(
+            username='oauth', email='oauth@example.com', password='pbkdf2_sha256$secret', active_role=self.role
+        )
+        application = get_application_model().objects.create(
+            name='mobile', client_type='confidential', authorization_grant_type='password'
+        )
+        self.access_token = get_access_token_model().objects.create(
+            user=self.user, application=application, token='opaque-token', scope='read',
+            expires=timezone.now() + timedelta(hours=1)
+        )
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='Bearer opaque-token')
+        return CachedOAuth2Authentication().authenticate(Request(request))
+
+    def test_cache_holds_only_token_identity(self):
+        user, access_token = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        cached = cache.get(oauth2_cache_key('opaque-token'))
+        self.assertEqual(set(cached), {'id', 'user_id', 'application_id', 'expires', 'scope'})
+        self.assertNotIn('pbkdf2_sha256$secret', repr(cached))
+
+        with self.assertNumQueries(0):
+            user, access_token = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(access_token.pk, self.access_token.pk)
+        self.assertTrue(access_token.is_valid(['read']))
+
+    def test_role_changes_are_visible_to_cached_tokens(self):
+        user, _ = self.authenticate()
+        self.assertEqual(user.approved_role_names, frozenset())
+
+        UserRole.objects.create(my_user=self.user, role=self.role, is_approved=True)
+        user, _ = self.authenticate()
+        self.assertEqual(user.approved_role_names, frozenset({'JobSeeker'}))
+
+    def test_revoked_token_is_rejected(self):
+        self.authenticate()
+        self.access_token.delete()
+        self.assertIsNone(self.authenticate())
+
+    def test_inactive_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+def query_plan(sql, params=()):
+    """
+    Kế hoạch thực thi của câu lệnh, mỗi bước một dòng (SQLite: EXPLAIN QUERY PLAN; MySQL: EXPLAIN).
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f"EXPLAIN {sql}", params)
+        columns = [column[0].lower() for column in cursor.description]
+        return [
+            "{table} type={type} key={key} {extra}".format(**dict(zip(columns, values)))
+            for values in cursor.fetchall()
+        ]
+
+
+def full_scans(plan):
+    """
+    Các bước quét toàn bộ bảng hoặc toàn bộ chỉ mục (SQLite: SCAN; MySQL: type ALL/index).
+    """
+    if connection.vendor == 'sqlite':
+        return [step for step in plan if step.startswith('SCAN ') and step != 'SCAN CONSTANT ROW']
+    return [step for step in plan if ' type=ALL ' in step or ' type=index ' in step]
+
+
+def sorts_all_rows(plan):
+    """
+    Kế hoạch có phải sắp xếp toàn bộ kết quả (chỉ mục không phục vụ được ORDER BY) hay không.
+    """
+    if connection.vendor == 'sqlite':
+        return 'USE TEMP B-TREE FOR ORDER BY' in plan
+    return any('Using filesort' in step for step in plan)
+
+
+# Django viết điều kiện trên cột boolean (is_read=False, is_active=True, ...) thành NOT "is_read" / "is_active" trên
+# SQLite (không phải phép so sánh bằng) nên SQLite không dùng được cột boolean đứng trước cột sắp xếp trong chỉ mục
+# và phải sắp xếp lại; trên MySQL điều kiện là "is_read = false" và danh sách được đọc theo thứ tự chỉ mục. Thứ tự
+# của các danh sách lọc theo cột boolean vì vậy chỉ được kiểm tra khi chạy trên MySQL; trên SQLite chỉ kiểm tra
+# được là không có bảng nào bị quét toàn bộ.
+BOOLEAN_FILTER_ORDER_CHECKED = connection.vendor != 'sqlite'
+
+
+class QueryPlanTests(TestCase):
+    """
+    Ghi lại EXPLAIN của mọi truy vấn do các endpoint danh sách sinh ra trên một bộ dữ liệu nhiều người dùng
+    và thất bại nếu có bảng nào bị quét toàn bộ (thiếu chỉ mục phù hợp với dạng truy vấn), hoặc nếu danh sách
+    được phân trang theo thứ tự có chỉ mục lại phải sắp xếp toàn bộ kết quả.
+    """
+    USERS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        roles = {name: Role.objects.create(role_name=name) for name in (Role.JobSeeker, Role.Recruiter, Role.Admin)}
+        cls.seekers = MyUser.objects.bulk_create([
+            MyUser(username=f'seeker{index}', email=f'seeker{index}@example.com', active_role=roles[Role.JobSeeker])
+            for index in range(cls.USERS)
+        ])
+        cls.recruiters = MyUser.objects.bulk_create([
+            MyUser(username=f'recruiter{index}', email=f'recruiter{index}@example.com',
+                   active_role=roles[Role.Recruiter])
+            for index in range(cls.USERS)
+        ])
+        # Người dùng không liên quan, để mỗi người chỉ chiếm một phần nhỏ của các bảng như trên thực tế
+        MyUser.objects.bulk_create([
+            MyUser(username=f'other{index}', email=f'other{index}@example.com') for index in range(cls.USERS * 25)
+        ])
+        UserRole.objects.bulk_create(
+            [UserRole(my_user=user, role=roles[Role.JobSeeker], is_approved=True) for user in cls.seekers]
+            + [UserRole(my_user=user, role=roles[Role.Recruiter], is_approved=index % 2 == 0)
+               for index, user in enumerate(cls.recruiters)]
+        )
+        profiles = JobSeekerProfile.objects.bulk_create([JobSeekerProfile(my_user=user) for user in cls.seekers])
+        recruiter_profiles = RecruiterProfile.objects.bulk_create([
+            RecruiterProfile(my_user=user, company_name=f'Công ty {index}') for index, user in enumerate(cls.recruiters)
+        ])
+        cls.job_postings = JobPosting.objects.bulk_create([
+            JobPosting(recruiter_profile=recruiter_profiles[index % cls.USERS], title=f'Tin {index}', slug=f'tin-{index}',
+                       description='Mô tả', location='Hà Nội', job_type='Full-time',
+                       status='approved' if index % 2 else 'draft')
+            for index in range(cls.USERS * 20)
+        ])
+        Application.objects.bulk_create([
+            Application(my_user=seeker, job_posting=cls.job_postings[(index * 7 + offset) % len(cls.job_postings)])
+            for index, seeker in enumerate(cls.seekers) for offset in range(20)
+        ])
+        CV.objects.bulk_create([
+            CV(job_seeker_profile=profile, file_name=f'cv-{index}.pdf')
+            for profile in profiles for index in range(5)
+        ])
+        messages = Message.objects.bulk_create([
+            Message(sender=seeker, recipient=recruiter, content='Xin chào', is_read=bool(index % 3))
+            for seeker in cls.seekers for index, recruiter in enumerate(cls.recruiters)
+        ])
+        Conversation.objects.bulk_create(
+            [Conversation(my_user=message.sender, participant=message.recipient, last_message=message,
+                          last_message_at=message.created_at) for message in messages]
+            + [Conversation(my_user=message.recipient, participant=message.sender, last_message=message,
+                            last_message_at=message.created_at) for message in messages]
+        )
+        Notification.objects.bulk_create([
+            Notification(recipient=user, message='Thông báo', type='System', is_read=bool(index % 2))
+            for user in cls.seekers + cls.recruiters for index in range(20)
+        ])
+        with connection.cursor() as cursor:
+            # Thống kê cho bộ tối ưu hóa như trên một CSDL đang chạy
+            cursor.execute('ANALYZE')
+
+    def explain(self, user, url):
+        """
+        Gọi endpoint và trả về kế hoạch thực thi của từng câu SELECT mà nó sinh ra.
+        """
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return [
+            (query['sql'], query_plan(query['sql']))
+            for query in queries.captured_queries if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def assert_index_backed(self, user, url, sorted_list=True):
+        plans = self.explain(user, url)
+        for sql, plan in plans:
+            self.assertEqual(full_scans(plan), [], f"{url}: {sql}\n{plan}")
+        if sorted_list:
+            # Câu đầu tiên là truy vấn trang của danh sách
+            sql, plan = plans[0]
+            self.assertFalse(sorts_all_rows(plan), f"{url}: {sql}\n{plan}")
+
+    def test_job_seeker_list_endpoints(self):
+        seeker, recruiter = self.seekers[3], self.recruiters[5]
+        for url, sorted_list in [
+            ('/api/job-postings/', BOOLEAN_FILTER_ORDER_CHECKED),
+            ('/api/applications/', True),
+            ('/api/cvs/', True),
+            # Chỉ mục (recipient, is_read, created_at) phục vụ hộp thư lọc theo is_read; hộp thư đầy đủ sắp xếp
+            # các thông báo của một người dùng
+            ('/api/notifications/', False),
+            ('/api/notifications/?is_read=false', BOOLEAN_FILTER_ORDER_CHECKED),
+            ('/api/conversations/', True),
+            ('/api/user/roles/', True),
+            # Hai nhánh OR (gửi/nhận) được trộn lại nên vẫn phải sắp xếp, nhưng mỗi nhánh đi qua chỉ mục
+            ('/api/messages/', False),
+        ]:
+            with self.subTest(url=url):
+                self.assert_index_backed(seeker, url, sorted_list)
+
+    def test_message_thread_pages(self):
+        seeker, recruiter = self.seekers[3], self.recruiters[5]
+        message = Message.objects.filter(sender=seeker, recipient=recruiter).get()
+        cursor = MessageThreadPagination.encode_cursor(message)
+        for url in [
+            f'/api/messages/thread/{recruiter.id}/',
+            f'/api/messages/thread/{recruiter.id}/?before={cursor}',
+            f'/api/messages/thread/{recruiter.id}/?after={cursor}',
+        ]:
+            with self.subTest(url=url):
+                plans = self.explain(seeker, url)
+                # Mỗi chiều gửi một truy vấn, cả hai đọc theo thứ tự chỉ mục
+                self.assertEqual(len(plans), 2)
+                for sql, plan in plans:
+                    self.assertEqual(full_scans(plan), [], f"{url}: {sql}\n{plan}")
+                    self.assertFalse(sorts_all_rows(plan), f"{url}: {sql}\n{plan}")
+
+    def test_recruiter_list_endpoints(self):
+        recruiter = self.recruiters[5]
+        job_posting = JobPosting.objects.filter(recruiter_profile_id=recruiter.id).first()
+        for url, sorted_list in [
+            ('/api/job-postings/', True),
+            ('/api/notifications/?is_read=false', BOOLEAN_FILTER_ORDER_CHECKED),
+            ('/api/conversations/', True),
+        ]:
+            with self.subTest(url=url):
+                self.assert_index_backed(recruiter, url, sorted_list)
+
+        # Truy vấn đầu tiên tìm tin theo slug, truy vấn danh sách đơn ứng tuyển đứng sau
+        plans = self.explain(recruiter, f'/api/job-postings/{job_posting.slug}/applicants/')
+        for sql, plan in plans:
+            self.assertEqual(full_scans(plan), [], sql)
+        self.assertFalse(any(sorts_all_rows(plan) for _, plan in plans), plans)
+
+    def test_role_approval_queue(self):
+        queryset = UserRole.objects.filter(role__role_name=Role.Recruiter, is_approved=False)
+        if BOOLEAN_FILTER_ORDER_CHECKED:
+            plan = query_plan(*queryset.query.sql_with_params())
+            self.assertEqual(full_scans(plan), [])
+            self.assertFalse(sorts_all_rows(plan), plan)
+        else:
+            # SQLite thà đọc theo chỉ mục my_user (thứ tự mặc định) còn hơn sắp xếp lại; chỉ kiểm tra được việc lọc
+            self.assertEqual(full_scans(query_plan(*queryset.order_by().query.sql_with_params())), [])
+
+
+class SkillMatrixRefreshTests(TestCase):
+    """
+    Làm mới tăng dần ma trận gợi ý không bỏ sót transaction commit muộn và không nạp lại bài đăng không đổi.
+    """
+
+    def setUp(self):
+        user = MyUser.objects.create(username='matrix', email='matrix@example.com')
+        self.recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty')
+        self.skill = Skill.objects.create(name='Python')
+        self.matrix = SkillMatrix()
+
+    def create_posting(self, title):
+        job_posting = JobPosting.objects.create(
+            recruiter_profile=self.recruiter, title=title, description='Mô tả', location='Hà Nội',
+            job_type='Full-time', status='approved'
+        )
+        job_posting.required_skills.add(self.skill)
+        return job_posting
+
+    def test_late_commit_inside_overlap_is_loaded(self):
+        self.create_posting('Tin đầu')
+        self.matrix.refresh(force=True)
+
+        # updated_at được gán trước mốc nhưng commit sau lần làm mới trước
+        late = self.create_posting('Tin commit muộn')
+        JobPosting.objects.filter(pk=late.pk).update(updated_at=self.matrix.watermark - timedelta(seconds=1))
+        self.matrix.refresh(force=True)
+        self.assertIn(late.pk, self.matrix.id_to_row)
+
+    def test_unchanged_postings_are_not_reapplied(self):
+        self.create_posting('Tin đầu')
+        self.matrix.refresh(force=True)
+        rows = len(self.matrix.row_ids)
+
+        self.matrix.refresh(force=True)
+        self.assertEqual(len(self.matrix.row_ids), rows)
+        self.assertEqual(len(self.matrix.score({self.skill.id})), 1)
+
+
+class ApplicantRankingTests(TestCase):
+    """
+    Xếp hạng ứng viên theo tỷ lệ kỹ năng yêu cầu được cache theo tin và bị vô hiệu khi đơn hoặc tin thay đổi.
+    """
+
+    def setUp(self):
+        cache.clear()
+        user = MyUser.objects.create(username='ranking', email='ranking@example.com')
+        recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty')
+        self.python, self.django = Skill.objects.create(name='Python'), Skill.objects.create(name='Django')
+        self.job_posting = JobPosting.objects.create(
+            recruiter_profile=recruiter, title='Lập trình viên Python', description='Mô tả', location='Hà Nội',
+            job_type='Full-time', status='approved'
+        )
+        self.job_posting.required_skills.add(self.python, self.django)
+        self.applications = {}
+        for name, skills in [('half', [self.python]), ('full', [self.python, self.django]), ('none', [])]:
+            self.applications[name] = self.apply(name, skills)
+
+    def apply(self, name, skills):
+        seeker = MyUser.objects.create(username=f'applicant-{name}', email=f'applicant-{name}@example.com')
+        JobSeekerProfile.objects.create(my_user=seeker).skills.add(*skills)
+        return Application.objects.create(my_user=seeker, job_posting=self.job_posting)
+
+    def ranking(self):
+        return [(row['application_id'], row['score'], row['matched']) for row in rank_applicants(self.job_posting)]
+
+    def test_ranking_is_cached(self):
+        expected = [(self.applications['full'].id, 1.0, 2), (self.applications['half'].id, 0.5, 1),
+                    (self.applications['none'].id, 0.0, 0)]
+        self.assertEqual(self.ranking(), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ranking(), expected)
+
+    def test_new_application_invalidates_ranking(self):
+        self.ranking()
+        late = self.apply('late', [self.python, self.django])
+        # Hòa điểm: đơn nộp trước đứng trước
+        self.assertEqual([row[0] for row in self.ranking()][:2], [self.applications['full'].id, late.id])
+
+        self.applications['full'].delete()
+        self.assertEqual(self.ranking()[0][0], late.id)
+
+    def test_required_skills_change_invalidates_ranking(self):
+        self.ranking()
+        self.job_posting.required_skills.remove(self.django)
+        self.assertEqual(self.ranking(), [
+            (self.applications['half'].id, 1.0, 1), (self.applications['full'].id, 1.0, 1),
+            (self.applications['none'].id, 0.0, 0),
+        ])
+
+
+class JobPostingApprovalFanOutTests(TestCase):
+    """
+    Duyệt tin chỉ ghi một tác vụ nền trong cùng transaction; worker gửi thông báo tới các NTV phù hợp.
+    """
+
+    def setUp(self):
+        roles = {name: Role.objects.create(role_name=name) for name in (Role.JobSeeker, Role.Admin)}
+        self.admin = MyUser.objects.create(username='approver', email='approver@example.com',
+                                           active_role=roles[Role.Admin])
+        user = MyUser.objects.create(username='fanout', email='fanout@example.com')
+        recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty')
+        python = Skill.objects.create(name='Python')
+        self.job_posting = JobPosting.objects.create(
+            recruiter_profile=recruiter, title='Lập trình viên Python', description='Mô tả',
+            location='Cầu Giấy, Hà Nội', job_type='Full-time', status='pending_approval'
+        )
+        self.job_posting.required_skills.add(python)
+
+        self.matching = []
+        for index, (location, job_type, skills) in enumerate([
+            ('Hà Nội', 'Full-time', [python]),
+            ('', None, [python]),
+            ('ha noi', '', [python]),
+            ('Đà Nẵng', 'Full-time', [python]),
+            ('Hà Nội', 'Part-time', [python]),
+            ('Hà Nội', 'Full-time', []),
+        ]):
+            seeker = MyUser.objects.create(username=f'seeker-{index}', email=f'seeker-{index}@example.com',
+                                           active_role=roles[Role.JobSeeker])
+            profile = JobSeekerProfile.objects.create(my_user=seeker, preferred_location=location,
+                                                      preferred_job_type=job_type)
+            profile.skills.add(*skills)
+            if index < 3:
+                self.matching.append(seeker.id)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def approve(self):
+        return self.client.post(f'/api/job-postings/{self.job_posting.slug}/approve/')
+
+    def new_job_recipients(self):
+        return sorted(Notification.objects.filter(type='NewJob').values_list('recipient_id', flat=True))
+
+    @override_settings(NEW_JOB_NOTIFICATION_CHUNK=2)
+    def test_approval_fans_out_in_background(self):
+        self.assertEqual(self.approve().status_code, 200)
+        # Yêu cầu duyệt chỉ ghi tác vụ tìm người nhận, chưa gửi thông báo nào
+        self.assertEqual(list(BackgroundTask.objects.values_list('name', flat=True)),
+                         ['Recruitments.notifications.notify_matching_job_seekers'])
+        self.assertEqual(self.new_job_recipients(), [])
+
+        run_pending_tasks()
+        # Người nhận được chia thành các tác vụ ghi NEW_JOB_NOTIFICATION_CHUNK người một
+        self.assertEqual(BackgroundTask.objects.filter(name__endswith='deliver_notifications').count(), 2)
+        while run_pending_tasks():
+            pass
+        self.assertEqual(self.new_job_recipients(), sorted(self.matching))
+
+    def test_task_is_enqueued_only_if_approval_commits(self):
+        def enqueue_then_fail(func, **payload):
+            enqueue(func, **payload)
+            raise RuntimeError("Mất kết nối")
+
+        with mock.patch('Recruitments.views.enqueue', side_effect=enqueue_then_fail):
+            with self.assertRaises(RuntimeError):
+                self.approve()
+        self.assertEqual(JobPosting.objects.get(pk=self.job_posting.pk).status, 'pending_approval')
+        self.assertFalse(BackgroundTask.objects.exists())
+
+    def test_task_skips_posting_no_longer_approved(self):
+        self.approve()
+        JobPosting.objects.filter(pk=self.job_posting.pk).update(status='closed', is_active=False)
+        while run_pending_tasks():
+            pass
+        self.assertEqual(self.new_job_recipients(), [])
+
+
+class RecommendedJobPostingsPermissionTests(TestCase):
+    """
+    Chỉ người tìm việc được xem gợi ý việc làm.
+    """
+
+    def get_recommended(self, role_name):
+        role = Role.objects.create(role_name=role_name)
+        user = MyUser.objects.create(username=role_name, email=f'{role_name}@example.com', active_role=role)
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/job-postings/recommended/')
+
+    def test_recruiter_is_forbidden(self):
+        self.assertEqual(self.get_recommended(Role.Recruiter).status_code, 403)
+
+    def test_job_seeker_is_allowed(self):
+        self.assertEqual(self.get_recommended(Role.JobSeeker).status_code, 200)
+
+
+class JobPostingSlugTests(TestCase):
+    """
+    Slug được cấp từ bộ đếm hậu tố theo base, khởi tạo từ slug hiện có và né slug của base khác.
+    """
+
+    def setUp(self):
+        user = MyUser.objects.create(username='slug', email='slug@example.com')
+        self.recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty')
+
+    def create_posting(self, title):
+        return JobPosting.objects.create(
+            recruiter_profile=self.recruiter, title=title, description='Mô tả', location='Hà Nội', job_type='Full-time'
+        )
+
+    def test_suffixes_follow_counter(self):
+        slugs = [self.create_posting('Kỹ sư phần mềm').slug for _ in range(3)]
+        self.assertEqual(slugs, ['ky-su-phan-mem', 'ky-su-phan-mem-1', 'ky-su-phan-mem-2'])
+        self.assertEqual(JobPostingSlugCounter.objects.get(base='ky-su-phan-mem').next_suffix, 3)
+
+    def test_counter_starts_after_existing_slugs(self):
+        JobPosting.objects.bulk_create([
+            JobPosting(recruiter_profile=self.recruiter, title='Kế toán', slug=slug, description='Mô tả',
+                       location='Hà Nội', job_type='Full-time')
+            for slug in ['ke-toan', 'ke-toan-9', 'ke-toan-10', 'ke-toan-truong']
+        ])
+        self.assertEqual(self.create_posting('Kế toán').slug, 'ke-toan-11')
+
+    def test_slug_of_another_base_is_skipped(self):
+        self.assertEqual(self.create_posting('Tester').slug, 'tester')
+        self.assertEqual(self.create_posting('Tester 1').slug, 'tester-1')
+        # Hậu tố 1 của base 'tester' đã bị base 'tester-1' dùng
+        self.assertEqual(self.create_posting('Tester').slug, 'tester-2')
+
+
+class CloseExpiredJobPostingsTests(TestCase):
+    """
+    Đóng tin hết hạn theo lô: mỗi lô một câu UPDATE, chỉ đụng tới tin còn hoạt động đã quá hạn.
+    """
+
+    def setUp(self):
+        user = MyUser.objects.create(username='expiry', email='expiry@example.com')
+        recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty')
+        now = timezone.now()
+
+        def create(index, expiration_date, is_active=True):
+            job_posting = JobPosting.objects.create(
+                recruiter_profile=recruiter, title=f'Tin {index}', description='Mô tả', location='Hà Nội',
+                job_type='Full-time', status='approved'
+            )
+            # save() tự đóng tin đã quá hạn: đặt hạn bằng update() như khi thời gian trôi qua
+            JobPosting.objects.filter(pk=job_posting.pk).update(expiration_date=expiration_date, is_active=is_active)
+            return job_posting
+
+        self.expired = [create(index, now - timedelta(days=index + 1)) for index in range(5)]
+        self.open = [create(5, now + timedelta(days=1)), create(6, None)]
+        self.inactive = create(7, now - timedelta(days=1), is_active=False)
+
+    def test_closes_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(JobPosting.close_expired(batch_size=2), 5)
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "Recruitments_jobposting"')]
+        self.assertEqual(len(updates), 3)
+
+        self.assertEqual(
+            set(JobPosting.objects.filter(status='closed', is_active=False).values_list('pk', flat=True)),
+            {job_posting.pk for job_posting in self.expired}
+        )
+        self.assertEqual(JobPosting.objects.filter(pk__in=[job_posting.pk for job_posting in self.open],
+                                                   status='approved', is_active=True).count(), 2)
+        self.assertEqual(JobPosting.objects.get(pk=self.inactive.pk).status, 'approved')
+        self.assertEqual(JobPosting.close_expired(batch_size=2), 0)
+
+    def test_command_reports_count(self):
+        stdout = StringIO()
+        call_command('close_expired_job_postings', '--batch-size', '3', stdout=stdout)
+        self.assertIn('job_postings.expired_closed count=5', stdout.getvalue())
+
+
+class RoleRegistryTests(TestCase):
+    """
+    Bộ nhớ đệm vai trò chỉ truy vấn một lần và được xóa khi một Role được lưu hoặc xóa.
+    """
+
+    def setUp(self):
+        # Rollback của TestCase không phát tín hiệu: xóa bộ nhớ đệm trước và sau mỗi test
+        role_registry.invalidate()
+        self.addCleanup(role_registry.invalidate)
+        self.role = Role.objects.create(role_name=Role.JobSeeker)
+
+    def test_roles_are_loaded_once(self):
+        self.assertEqual(role_registry.get(Role.JobSeeker), self.role)
+        with self.assertNumQueries(0):
+            self.assertEqual(role_registry.get(Role.JobSeeker), self.role)
+            self.assertEqual(role_registry.get_by_id(self.role.id), self.role)
+            with self.assertRaises(Role.DoesNotExist):
+                role_registry.get(Role.Admin)
+
+    def test_role_save_invalidates_registry(self):
+        with self.assertRaises(Role.DoesNotExist):
+            role_registry.get(Role.Recruiter)
+        recruiter = Role.objects.create(role_name=Role.Recruiter)
+        self.assertEqual(role_registry.get(Role.Recruiter), recruiter)
+
+        self.role.role_name = Role.Admin
+        self.role.save()
+        self.assertEqual(role_registry.get_by_id(self.role.id).role_name, Role.Admin)
+        with self.assertRaises(Role.DoesNotExist):
+            role_registry.get(Role.JobSeeker)
+
+    def test_role_delete_invalidates_registry(self):
+        role_registry.get(Role.JobSeeker)
+        role_id = self.role.id
+        self.role.delete()
+        with self.assertRaises(Role.DoesNotExist):
+            role_registry.get_by_id(role_id)
+        role, created = role_registry.get_or_create(Role.JobSeeker)
+        self.assertTrue(created)
+        self.assertEqual(role_registry.get(Role.JobSeeker), role)
+
+
+class NotificationCounterRaceTests(TestCase):
+    """
+    Bộ đếm do tiến trình khác tạo giữa lúc kiểm tra và lúc tạo không làm mất lượt tăng.
+    """
+
+    def setUp(self):
+        self.user = MyUser.objects.create(username='counter', email='counter@example.com')
+
+    def created_concurrently(self, unread_count, counted):
+        def count_unread(user_ids):
+            NotificationCounter.objects.create(my_user=self.user, unread_count=unread_count)
+            return {self.user.id: counted}
+        return mock.patch.object(NotificationCounter, 'count_unread', side_effect=count_unread)
+
+    def test_increment_falls_back_to_update(self):
+        with self.created_concurrently(unread_count=5, counted=6):
+            NotificationCounter.increment({self.user.id: 1})
+        self.assertEqual(NotificationCounter.objects.get(my_user=self.user).unread_count, 6)
+
+    def test_unread_for_returns_stored_value(self):
+        with self.created_concurrently(unread_count=3, counted=2):
+            self.assertEqual(NotificationCounter.unread_for(self.user.id), 3)
+
+
+class NotificationMarkReadTests(TestCase):
+    """
+    Đánh dấu đã đọc hàng loạt kiểm tra "ids" và giữ bộ đếm khớp với số thông báo chưa đọc.
+    """
+
+    def setUp(self):
+        self.user = MyUser.objects.create(username='reader', email='reader@example.com')
+        self.notifications = Notification.objects.bulk_create([
+            Notification(recipient=self.user, message=f'Thông báo {index}', type='System') for index in range(3)
+        ])
+        NotificationCounter.objects.create(my_user=self.user, unread_count=3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def mark_read(self, data):
+        return self.client.post('/api/notifications/mark_read/', data, format='json')
+
+    def test_invalid_ids_are_rejected(self):
+        for data in ({'ids': ['abc']}, {'ids': 'abc'}):
+            response = self.mark_read(data)
+            self.assertEqual(response.status_code, 400, data)
+        self.assertFalse(Notification.objects.filter(is_read=True).exists())
+
+    def test_selected_ids_decrement_counter(self):
+        response = self.mark_read({'ids': [self.notifications[0].id, self.notifications[1].id]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'marked_read': 2, 'unread_count': 1})
+
+        response = self.mark_read({})
+        self.assertEqual(response.data, {'marked_read': 1, 'unread_count': 0})
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+
+    def test_update_is_rolled_back_with_counter(self):
+        with mock.patch.object(NotificationCounter, 'decrement', side_effect=RuntimeError("Mất kết nối")):
+            with self.assertRaises(RuntimeError):
+                self.mark_read({})
+        self.assertFalse(Notification.objects.filter(is_read=True).exists())
+        self.assertEqual(NotificationCounter.unread_for(self.user.id), 3)
+
+
+@override_settings(CV_UPLOAD_BACKEND='Recruitments.storage.LocalFileSystemUploadBackend',
+                   CV_UPLOAD_ROOT=tempfile.mkdtemp())
+class CVFinalizeTests(TestCase):
+    """
+    Mỗi vé tải lên chỉ tạo được một CV, kể cả khi hai yêu cầu hoàn tất chạy đồng thời.
+    """
+
+    def setUp(self):
+        role = Role.objects.create(role_name=Role.JobSeeker)
+        self.user = MyUser.objects.create(username='uploader', email='uploader@example.com', active_role=role)
+        JobSeekerProfile.objects.create(my_user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.ticket = self.client.post('/api/cvs/upload-ticket/', {'file_name': 'cv.pdf'}).data['ticket']
+        response = self.client.post(reverse('cv-local-upload'), {
+            'ticket': self.ticket, 'file': SimpleUploadedFile('cv.pdf', b'%PDF-1.4'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+    def finalize(self):
+        return self.client.post('/api/cvs/finalize/', {'ticket': self.ticket, 'file_name': 'cv.pdf'})
+
+    def test_ticket_is_single_use(self):
+        self.assertEqual(self.finalize().status_code, 201)
+        self.assertEqual(self.finalize().status_code, 409)
+        self.assertEqual(CV.objects.count(), 1)
+
+    def test_concurrent_finalize_is_rejected(self):
+        verify_upload = LocalFileSystemUploadBackend.verify_upload
+
+        def finalized_concurrently(backend, public_id, data):
+            # Yêu cầu khác hoàn tất cùng vé sau bước kiểm tra vé đã dùng
+            resource = verify_upload(backend, public_id, data)
+            CV.objects.create(job_seeker_profile_id=self.user.id, file_path=resource, upload_key=public_id)
+            return resource
+
+        with mock.patch.object(LocalFileSystemUploadBackend, 'verify_upload', finalized_concurrently):
+            self.assertEqual(self.finalize().status_code, 409)
+        self.assertEqual(CV.objects.count(), 1)
+
+
+class JobPostingFilterTests(TestCase):
+    """
+    Bộ lọc danh sách tin tuyển dụng lọc trong SQL, kiểm tra tham số và giữ điều kiện lọc qua các trang con trỏ.
+    """
+
+    def setUp(self):
+        role = Role.objects.create(role_name=Role.JobSeeker)
+        self.seeker = MyUser.objects.create(username='filter-seeker', email='filter-seeker@example.com',
+                                            active_role=role)
+        user = MyUser.objects.create(username='filter-recruiter', email='filter-recruiter@example.com')
+        self.recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty')
+        now = timezone.now()
+        for index, (title, job_type, location, salary_min, salary_max, expiration_date) in enumerate([
+            ('Python', 'Full-time', 'Hà Nội', 10, 20, None),
+            ('Java', 'Full-time', 'Hồ Chí Minh', 25, 40, now + timedelta(days=30)),
+            ('Kế toán', 'Part-time', 'Hà Nội', None, 8, now + timedelta(days=5)),
+            ('Thực tập sinh', 'Internship', 'Đà Nẵng', 3, None, now + timedelta(days=60)),
+            ('Thỏa thuận', 'Full-time', 'hà nội', None, None, None),
+        ]):
+            job_posting = JobPosting.objects.create(
+                recruiter_profile=self.recruiter, title=title, description='Mô tả', job_type=job_type,
+                location=location, salary_min=salary_min, salary_max=salary_max, expiration_date=expiration_date,
+                status='approved'
+            )
+            JobPosting.objects.filter(pk=job_posting.pk).update(created_at=now - timedelta(hours=index))
+        self.now = now
+        self.client = APIClient()
+        self.client.force_authenticate(self.seeker)
+
+    def titles(self, query):
+        response = self.client.get(f'/api/job-postings/?{query}')
+        self.assertEqual(response.status_code, 200, query)
+        return [job_posting['title'] for job_posting in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.titles('job_type=Full-time'), ['Python', 'Java', 'Thỏa thuận'])
+        self.assertEqual(self.titles('location=H%C3%A0%20N%E1%BB%99i'), ['Python', 'Kế toán', 'Thỏa thuận'])
+        # Khoảng lương giao với [15, 30]; tin không ghi lương không khớp
+        self.assertEqual(self.titles('salary_min=15&salary_max=30'), ['Python', 'Java', 'Thực tập sinh'])
+        self.assertEqual(self.titles('salary_max=5'), ['Kế toán', 'Thực tập sinh'])
+        before = (self.now + timedelta(days=40)).isoformat().replace('+', '%2B')
+        after = (self.now + timedelta(days=10)).isoformat().replace('+', '%2B')
+        self.assertEqual(self.titles(f'expiration_date_before={before}'), ['Java', 'Kế toán'])
+        self.assertEqual(self.titles(f'expiration_date_after={after}'),
+                         ['Python', 'Java', 'Thực tập sinh', 'Thỏa thuận'])
+
+    def test_invalid_parameters(self):
+        for query in ('job_type=Remote', 'salary_min=abc', 'expiration_date_after=hom-qua'):
+            response = self.client.get(f'/api/job-postings/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_cursor_pages_keep_filters(self):
+        response = self.client.get('/api/job-postings/?job_type=Full-time&page_size=2')
+        titles = [job_posting['title'] for job_posting in response.data['results']]
+        self.assertEqual(titles, ['Python', 'Java'])
+        self.assertIn('job_type=Full-time', response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([job_posting['title'] for job_posting in response.data['results']], ['Thỏa thuận'])
+        self.assertIsNone(response.data['next'])
+
+
+def docx_bytes(*paragraphs):
+    body = ''.join(f'<w:p><w:r><w:t>{paragraph}</w:t></w:r></w:p>' for paragraph in paragraphs)
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'
+        ))
+    return buffer.getvalue()
+
+
+class CandidateSearchTests(TestCase):
+    """
+    Nội dung CV được trích xuất và lập chỉ mục ở tác vụ nền; NTD tìm ứng viên theo số từ khóa khớp rồi theo điểm.
+    """
+
+    def setUp(self):
+        roles = {name: Role.objects.create(role_name=name) for name in (Role.JobSeeker, Role.Recruiter)}
+        self.files = {}
+        self.profiles = {}
+        for username, content in [('python-dev', 'Python Django Python'), ('python-junior', 'Python'),
+                                  ('java-dev', 'Java Spring')]:
+            user = MyUser.objects.create(username=username, email=f'{username}@example.com',
+                                         active_role=roles[Role.JobSeeker])
+            self.profiles[username] = JobSeekerProfile.objects.create(my_user=user)
+            self.files[f'cvs/{username}.docx'] = docx_bytes('Kinh nghiệm', content)
+            CV.objects.create(job_seeker_profile=self.profiles[username], file_name=f'{username}.docx',
+                              file_path=f'cvs/{username}.docx')
+        self.run_tasks()
+
+        self.recruiter = MyUser.objects.create(username='hr', email='hr@example.com',
+                                               active_role=roles[Role.Recruiter])
+        self.client = APIClient()
+        self.client.force_authenticate(self.recruiter)
+
+    def run_tasks(self):
+        backend = mock.Mock()
+        # Tài nguyên tải từ DB tách phần mở rộng sang thuộc tính format (như LocalFileSystemUploadBackend.read)
+        backend.read.side_effect = lambda resource: self.files[f'{resource.public_id}.{resource.format}']
+        with mock.patch('Recruitments.candidates.get_upload_backend', return_value=backend):
+            while run_pending_tasks():
+                pass
+
+    def search(self, query):
+        response = self.client.get('/api/candidates/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(row['username'], row['matched']) for row in response.data['results']]
+
+    def test_extracts_docx_and_pdf_text(self):
+        self.assertEqual(extract_text(docx_bytes('Dòng 1', 'Dòng 2'), 'cv.docx'), 'Dòng 1\nDòng 2')
+        pdf = b'%PDF-1.4\nstream\nBT (Python \\(Django\\)) Tj ET\nendstream\n'
+        self.assertEqual(extract_pdf_strings(pdf), 'Python (Django)')
+
+    def test_ranks_by_matched_terms_then_score(self):
+        self.assertEqual(self.search('python django'), [('python-dev', 2), ('python-junior', 1)])
+        self.assertEqual(self.search('spring'), [('java-dev', 1)])
+        self.assertEqual(self.search('golang'), [])
+
+    def test_only_recruiters_can_search(self):
+        self.assertEqual(self.client.get('/api/candidates/search/').status_code, 400)
+        self.client.force_authenticate(self.profiles['java-dev'].my_user)
+        self.assertEqual(self.client.get('/api/candidates/search/', {'q': 'java'}).status_code, 403)
+
+    def test_deleted_cv_leaves_index(self):
+        CV.objects.get(job_seeker_profile=self.profiles['java-dev']).delete()
+        self.run_tasks()
+        self.assertEqual(self.search('spring'), [])
+        # Lưu lại CV không đổi tệp không đưa tác vụ lập chỉ mục mới vào hàng đợi
+        CV.objects.get(job_seeker_profile=self.profiles['python-dev']).save()
+        self.assertFalse(BackgroundTask.objects.filter(status='pending').exists())
+
+
+class JobPostingSearchTests(TestCase):
+    """
+    Tìm kiếm toàn văn chỉ xét các bài đăng có trọng số cao nhất của mỗi từ khóa, trong số các tin đang hiển thị.
+    """
+
+    def setUp(self):
+        cache.clear()
+        user = MyUser.objects.create(username='search', email='search@example.com')
+        self.recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty')
+
+        self.in_title = self.create('Lập trình viên Python', location='Hà Nội')
+        self.in_description = self.create('Kế toán', description='Biết Python là lợi thế')
+        self.draft = self.create('Python Python', status='draft')
+
+    def create(self, title, location='Đà Nẵng', description='Mô tả', status='approved', **kwargs):
+        return JobPosting.objects.create(
+            recruiter_profile=self.recruiter, title=title, location=location, description=description,
+            job_type='Full-time', status=status, **kwargs
+        )
+
+    def search(self, query):
+        return [row['job_posting_id'] for row in search.search_job_postings(query)]
+
+    def test_ranks_approved_postings(self):
+        self.assertEqual(self.search('python'), [self.in_title.pk, self.in_description.pk])
+        self.assertEqual(self.search('python ha noi')[0], self.in_title.pk)
+        self.assertEqual(self.search('khong co'), [])
+
+    def test_candidates_are_bounded_per_term(self):
+        # Các tin đã đóng có trọng số cao hơn không chiếm chỗ của tin đang hiển thị
+        for _ in range(3):
+            self.create('Python Python Python', status='closed')
+        with mock.patch.object(search, 'TERM_CANDIDATE_LIMIT', 1):
+            self.assertEqual(self.search('python'), [self.in_title.pk])
+            self.assertEqual(self.search('python ke toan'), [self.in_description.pk, self.in_title.pk])
+
+    def test_closed_postings_leave_index(self):
+        self.in_title.close_job()
+        self.assertEqual(self.search('python'), [self.in_description.pk])
+
+        expired = self.create('Kỹ sư Python', expiration_date=timezone.now() + timedelta(days=1))
+        JobPosting.objects.filter(pk=expired.pk).update(expiration_date=timezone.now() - timedelta(days=1))
+        # Tin đã hết hạn nhưng lệnh đóng tin chưa chạy không được trả về
+        self.assertEqual(self.search('ky su'), [])
+        self.assertEqual(JobPosting.close_expired(), 1)
+        self.assertFalse(expired.search_terms.exists())
+
+    def test_company_rename_reindexes_postings(self):
+        self.recruiter.company_name = 'Tập đoàn Sao Mai'
+        self.recruiter.save()
+        run_pending_tasks()
+        self.assertEqual(set(self.search('sao mai')), {self.in_title.pk, self.in_description.pk})
+
+
+class FuzzySearchTests(TestCase):
+    """
+    Tìm kiếm mờ chấm điểm theo các tiêu đề/địa điểm phân biệt và chỉ trả về tin đang hiển thị.
+    """
+
+    def setUp(self):
+        cache.clear()
+        user = MyUser.objects.create(username='fuzzy', email='fuzzy@example.com')
+        self.recruiter = RecruiterProfile.objects.create(my_user=user, company_name='Công ty')
+        for index, (title, location) in enumerate(
+            [('Lập trình viên Python', 'Hà Nội')] * 5 + [('Kế toán', 'Hà Nội')] * 40 + [('Kế toán', 'Đà Nẵng')] * 3
+        ):
+            self.create(title, location, slug=f'fuzzy-{index}')
+        self.python_ids = set(JobPosting.objects.filter(title='Lập trình viên Python').values_list('id', flat=True))
+
+    def create(self, title, location, status='approved', **kwargs):
+        return JobPosting.objects.create(
+            recruiter_profile=self.recruiter, title=title, location=location, description='Mô tả',
+            job_type='Full-time', status=status, **kwargs
+        )
+
+    def search(self, query):
+        return {job_posting_id for job_posting_id, _ in search.fuzzy_search_job_postings(query)}
+
+    def test_typo_matches_every_posting(self):
+        self.assertEqual(self.search('pyton'), self.python_ids)
+        self.assertEqual(self.search('xyzxyz'), set())
+
+    def test_location_only_match(self):
+        self.assertEqual(
+            self.search('da nang'), set(JobPosting.objects.filter(location='Đà Nẵng').values_list('id', flat=True))
+        )
+        # Các trigram của 'ha noi' có ở gần như mọi tin nhưng tin chỉ khớp địa điểm vẫn có trong kết quả
+        self.assertEqual(
+            self.search('python ha noi'), set(JobPosting.objects.filter(location='Hà Nội').values_list('id', flat=True))
+        )
+
+    def test_index_follows_posting_changes(self):
+        job_posting = self.create('Kiến trúc sư Golang', 'Huế')
+        self.assertEqual(self.search('golang'), {job_posting.pk})
+
+        job_posting.title = 'Kiến trúc sư Rust'
+        job_posting.save()
+        self.assertEqual(self.search('golang'), set())
+        self.assertEqual(self.search('rust'), {job_posting.pk})
+        self.assertFalse(JobPostingText.objects.get(field='title', text='kien truc su golang').words.exists())
+
+        job_posting.close_job()
+        self.assertEqual(self.search('rust'), set())
+        self.create('Kiến trúc sư Rust', 'Huế', status='draft')
+        self.assertEqual(self.search('rust'), set())
+
+    def test_results_are_capped_by_best_texts(self):
+        with mock.patch.object(search, 'FUZZY_RESULT_LIMIT', 5):
+            self.assertEqual(self.search('lap trinh vien python'), self.python_ids)
+
+    def test_scores_match_similarity(self):
+        self.create('Kế toán trưởng', 'Hồ Chí Minh')
+        expected = {
+            job_posting.pk: max(similarity('ke toan truong', job_posting.title_normalized),
+                                similarity('ke toan truong', job_posting.location_normalized))
+            for job_posting in JobPosting.objects.all()
+        }
+        results = search.fuzzy_search_job_postings('ke toan truong')
+        self.assertEqual(
+            results, sorted([(pk, score) for pk, score in expected.items() if score >= search.FUZZY_MIN_SIMILARITY],
+                            key=lambda item: (-item[1], item[0].int))
+        )
+
+    def test_similar_words_are_cached(self):
+        search.fuzzy_search_job_postings('ke toan')
+        with CaptureQueriesContext(connection) as queries:
+            search.fuzzy_search_job_postings('ke toan')
+        # Từ gần giống và số văn bản của từng từ được lấy từ cache: chỉ còn đọc chỉ mục từ -> văn bản và tin
+        self.assertFalse([query for query in queries if 'GROUP BY' in query['sql']])
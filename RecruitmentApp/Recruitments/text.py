@@ -0,0 +1,61 @@
+import re
+import unicodedata
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """
+    Chuẩn hóa văn bản để so khớp không dấu: chữ thường, bỏ dấu tiếng Việt, 'đ' -> 'd'.
+    Ví dụ: "Kỹ sư phần mềm" -> "ky su phan mem".
+    """
+    if not text:
+        return ''
+    text = text.lower().replace('đ', 'd')
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def words(text):
+    """
+    Tách văn bản đã chuẩn hóa thành các từ.
+    """
+    return WORD_RE.findall(normalize_text(text))
+
+
+def word_trigrams(word):
+    """
+    Tập trigram của một từ, đệm hai khoảng trắng ở đầu và một ở cuối (giống pg_trgm).
+    """
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigrams(text):
+    """
+    Tập trigram của toàn bộ văn bản (hợp các trigram của từng từ).
+    """
+    result = set()
+    for word in words(text):
+        result |= word_trigrams(word)
+    return result
+
+
+def word_similarity(first, second):
+    """
+    Độ tương đồng Jaccard giữa tập trigram của hai từ.
+    """
+    first, second = word_trigrams(first), word_trigrams(second)
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+def similarity(query, text):
+    """
+    Độ tương đồng mờ giữa truy vấn và văn bản: trung bình, trên từng từ của truy vấn,
+    độ tương đồng cao nhất với một từ trong văn bản. Chịu được lỗi chính tả và thiếu dấu.
+    """
+    query_words, text_words = words(query), words(text)
+    if not query_words or not text_words:
+        return 0.0
+    return sum(max(word_similarity(q, t) for t in text_words) for q in query_words) / len(query_words)
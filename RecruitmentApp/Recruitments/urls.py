@@ -4,7 +4,8 @@ from rest_framework.routers import DefaultRouter
 from .views import RegistrationView, LoginView, CVViewSet, ApplicationViewSet, JobPostingViewSet, InterviewViewSet, \
     MessageViewSet, AllConversationsView, UpdateJobSeekerProfileView, CreateRecruiterProfileView, \
     AdminApproveRecruiterProfileView, AdminAssignAdminRoleView, UserRolesView, ChangeRoleView, CurrentUserView, \
-    UpdateUserProfileView
+    UpdateUserProfileView, SkillSearchView, NotificationViewSet, LocalCVUploadView, \
+    CandidateSearchView
 
 router = DefaultRouter()
 router.register(r'cvs', CVViewSet, basename='cv')
@@ -12,6 +13,7 @@ router.register(r'job-postings', JobPostingViewSet, basename='job-posting')
 router.register(r'applications', ApplicationViewSet, basename='application')
 router.register(r'interviews', InterviewViewSet, basename='interview')
 router.register(r'messages', MessageViewSet, basename='message')
+router.register(r'notifications', NotificationViewSet, basename='notification')
 
 
 
@@ -29,6 +31,7 @@ urlpatterns = [
 
     # CV
     path('cvs/<int:pk>/set_default/', CVViewSet.as_view({'post': 'set_default'}), name='cv-set-default'),
+    path('cv-uploads/', LocalCVUploadView.as_view(), name='cv-local-upload'),
 
     # Applications
     path('applications/', ApplicationViewSet.as_view({'get': 'list', 'post': 'create'}),
@@ -37,6 +40,8 @@ urlpatterns = [
          ApplicationViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}),
          name='application-detail'),
     path('conversations/', AllConversationsView.as_view(), name='all_conversations'),
+    path('skills/search/', SkillSearchView.as_view(), name='skill-search'),
+    path('candidates/search/', CandidateSearchView.as_view(), name='candidate-search'),
 
     # Other User Management APIs
     path('register/', RegistrationView.as_view(), name='register'),
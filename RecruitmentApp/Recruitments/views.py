@@ -1,21 +1,34 @@
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
 from django.utils import timezone
-from firebase_admin import db
 from rest_framework import status, generics, viewsets, serializers
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 import uuid
 
-from .models import JobSeekerProfile, Role, UserRole, Notification, RecruiterProfile, MyUser, CV, JobPosting, Application, Interview, \
-    Message
+from .models import JobSeekerProfile, Role, UserRole, Notification, NotificationCounter, RecruiterProfile, MyUser, CV, JobPosting, Application, Interview, \
+    Message, Conversation
+from .authentication import get_tokens_for_user
+from .candidates import search_candidates
+from .filters import JobPostingFilterBackend
+from .firebase_sync import record_message_deleted, record_message_read, record_message_saved, record_thread_read
+from .notifications import notify, notify_matching_job_seekers
+from .pagination import ConversationPagination, JobPostingPagination, MessageThreadPagination, \
+    NotificationPagination, SearchResultPagination
 from .permissions import IsAuthenticated, IsCreateOnly, IsAdminForUserRoleApproval, IsAdmin, IsJobSeeker, IsUserOwnerCV, \
     IsEmployer
+from .recommendations import rank_applicants, recommend_job_postings
+from .roles import role_registry
+from .search import search_job_postings, fuzzy_search_job_postings, fuzzy_search_skills
 from .serializers import RegistrationSerializer, LoginSerializer, JobSeekerProfileSerializer, \
     RecruiterProfileSerializer, MyUserSerializer, UserRoleSerializer, CVSerializer, JobPostingSerializer, \
-    ApplicationSerializer, InterviewSerializer, MessageSerializer
+    ApplicationSerializer, InterviewSerializer, MessageSerializer, ConversationSerializer, NotificationSerializer, \
+    NotificationMarkReadSerializer
+from .storage import LocalFileSystemUploadBackend, get_upload_backend, issue_upload_ticket, read_upload_ticket
+from .tasks import enqueue
 
 
 class RegistrationView(generics.CreateAPIView):
@@ -55,10 +68,7 @@ class LoginView(generics.GenericAPIView):
         if not user:
             return Response({"detail": "Thông tin đăng nhập không hợp lệ."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        refresh = RefreshToken.for_user(user)
-        access_token = refresh.access_token
-
-        return Response({'access': str(access_token), 'refresh': str(refresh)}, status=status.HTTP_200_OK)
+        return Response(get_tokens_for_user(user), status=status.HTTP_200_OK)
 
 
 class UpdateJobSeekerProfileView(generics.GenericAPIView):
@@ -82,7 +92,7 @@ class UpdateJobSeekerProfileView(generics.GenericAPIView):
         serializer.save()
 
         if job_seeker_profile.summary and job_seeker_profile.experience and job_seeker_profile.education:
-            role, created = Role.objects.get_or_create(role_name=Role.JobSeeker)
+            role, created = role_registry.get_or_create(Role.JobSeeker)
             user = request.user
             if user.active_role is None or user.active_role != role:
                 user.active_role = role
@@ -141,30 +151,26 @@ class CreateRecruiterProfileView(generics.GenericAPIView):
             recruiter_profile = serializer.save(user=request.user)
             message = "Thông tin nhà tuyển dụng đã được nhập. Yêu cầu phê duyệt đã được gửi đến Admin."
 
-        notification_to_user = Notification.objects.create(
-            recipient=request.user,
-            sender=request.user,
+        notify(
+            [request.user],
             message=f"{message} Yêu cầu của bạn đang chờ xác thực từ hệ thống.",
             type="System",
+            sender=request.user,
             related_url="/user/dashboard",
-            is_read=False
         )
 
         Admin_users = MyUser.objects.filter(user_roles__role__role_name=Role.Admin)
-        if not Admin_users:
+        sent = notify(
+            Admin_users,
+            message=f"Yêu cầu phê duyệt vai trò 'Nhà tuyển dụng' cho {request.user.username}",
+            type="System",
+            sender=request.user,
+            related_url=f"/Admin/approval/",
+        )
+        if not sent:
             return Response({"detail": "Không tìm thấy Admin để gửi thông báo."}, status=status.HTTP_400_BAD_REQUEST)
 
-        for Admin_user in Admin_users:
-            Notification.objects.create(
-                recipient=Admin_user,
-                sender=request.user,
-                message=f"Yêu cầu phê duyệt vai trò 'Nhà tuyển dụng' cho {request.user.username}",
-                type="System",
-                related_url=f"/Admin/approval/",
-                is_read=False
-            )
-
-        role = Role.objects.get(role_name=Role.Recruiter)
+        role = role_registry.get(Role.Recruiter)
         user_role, created = UserRole.objects.get_or_create(
             user=request.user,
             role=role,
@@ -203,7 +209,7 @@ class AdminApproveRecruiterProfileView(generics.GenericAPIView):
         recruiter_profile.is_approved = True
         recruiter_profile.save()
 
-        role, created = Role.objects.get_or_create(role_name=Role.Recruiter)
+        role, created = role_registry.get_or_create(Role.Recruiter)
         user = recruiter_profile.my_user
         user_role, created = UserRole.objects.get_or_create(
             user=user,
@@ -221,22 +227,20 @@ class AdminApproveRecruiterProfileView(generics.GenericAPIView):
         user.active_role = role
         user.save()
 
-        Notification.objects.create(
-            recipient=user,
-            sender=request.user,
+        notify(
+            [user],
             message=f"Chúc mừng! Bạn đã được phê duyệt trở thành Nhà tuyển dụng.",
             type="System",
+            sender=request.user,
             related_url="/user/dashboard",
-            is_read=False
         )
 
-        Notification.objects.create(
-            recipient=request.user,
-            sender=request.user,
+        notify(
+            [request.user],
             message=f"Bạn đã phê duyệt yêu cầu trở thành Nhà tuyển dụng của {user.username}.",
             type="System",
+            sender=request.user,
             related_url=f"/Admin/recruiter-profile/",
-            is_read=False
         )
 
         return Response({
@@ -263,7 +267,7 @@ class AdminAssignAdminRoleView(generics.GenericAPIView):
         if user.active_role and user.active_role.role_name == Role.Admin:
             return Response({"detail": "Người dùng đã có vai trò Quản trị viên."}, status=status.HTTP_400_BAD_REQUEST)
 
-        role = Role.objects.get(role_name=Role.Admin)
+        role = role_registry.get(Role.Admin)
 
         user_role, created = UserRole.objects.get_or_create(
             user=user,
@@ -296,7 +300,7 @@ class UserRolesView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return UserRole.objects.filter(user=self.request.user)
+        return UserRole.objects.filter(my_user=self.request.user)
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -323,25 +327,22 @@ class ChangeRoleView(generics.UpdateAPIView):
         new_role_name = request.data.get('role_name')
 
         try:
-            new_role = Role.objects.get(role_name=new_role_name)
+            new_role = role_registry.get(new_role_name)
         except Role.DoesNotExist:
             return Response({"detail": "Vai trò không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not UserRole.objects.filter(user=user, role=new_role).exists():
+        if not UserRole.objects.filter(my_user=user, role=new_role).exists():
             return Response({"detail": "Bạn không có quyền thay đổi sang vai trò này."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        user_role, created = UserRole.objects.get_or_create(user=user, role=new_role)
-
-        if not created:
-            user_role.role = new_role
-            user_role.save()
+        user.active_role = new_role
+        user.save(update_fields=['active_role'])
 
         return Response({
             "message": f"Vai trò của bạn đã được thay đổi thành {new_role.role_name}.",
             "user": {
                 "username": user.username,
-                "role": user_role.role.role_name
+                "role": new_role.role_name
             }
         }, status=status.HTTP_200_OK)
 
@@ -398,7 +399,7 @@ class CVViewSet(viewsets.ModelViewSet):
         if IsAdmin().has_permission(self.request, self):
             return CV.objects.all()  # Admin có thể xem tất cả CV
         else:
-            return CV.objects.filter(job_seeker_profile__user=user)  # Người tìm việc chỉ xem CV của mình
+            return CV.objects.filter(job_seeker_profile_id=user.id)  # Người tìm việc chỉ xem CV của mình
 
     def perform_create(self, serializer):
         """
@@ -481,6 +482,74 @@ class CVViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 
+    @action(detail=False, methods=['post'], url_path='upload-ticket', permission_classes=[IsJobSeeker])
+    def upload_ticket(self, request):
+        """
+        Bước 1 của tải CV trực tiếp: cấp vé và tham số đã ký để client tải tệp thẳng lên kho lưu trữ.
+        """
+        if not JobSeekerProfile.objects.filter(pk=request.user.id).exists():
+            return Response({"detail": "Bạn chưa có hồ sơ NTV. Vui lòng tạo hồ sơ trước khi tạo CV."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(issue_upload_ticket(request.user, request.data.get('file_name')),
+                        status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsJobSeeker])
+    def finalize(self, request):
+        """
+        Bước 2: sau khi client tải tệp xong, xác minh tệp theo vé rồi ghi bản ghi CV.
+        """
+        public_id = read_upload_ticket(request.data.get('ticket'), request.user)
+        if not public_id:
+            return Response({"detail": "Vé tải lên không hợp lệ hoặc đã hết hạn."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if CV.objects.filter(upload_key=public_id).exists():
+            return Response({"detail": "Vé tải lên đã được sử dụng."}, status=status.HTTP_409_CONFLICT)
+
+        resource = get_upload_backend().verify_upload(public_id, request.data)
+        if resource is None:
+            return Response({"detail": "Không xác minh được tệp đã tải lên."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Hai yêu cầu hoàn tất đồng thời cùng qua bước kiểm tra trên: ràng buộc unique của upload_key chặn bản thứ hai
+        try:
+            with transaction.atomic():
+                cv = CV.objects.create(
+                    job_seeker_profile_id=request.user.id,
+                    file_path=resource,
+                    upload_key=public_id,
+                    file_name=request.data.get('file_name'),
+                    version_name=request.data.get('version_name'),
+                )
+        except IntegrityError:
+            return Response({"detail": "Vé tải lên đã được sử dụng."}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            "message": "Tạo CV thành công!",
+            "cv": CVSerializer(cv).data
+        }, status=status.HTTP_201_CREATED)
+
+
+class LocalCVUploadView(APIView):
+    """
+    Điểm nhận tệp của LocalFileSystemUploadBackend (chỉ dùng khi chạy offline/kiểm thử).
+    Nhận multipart gồm "ticket" và "file".
+    """
+    permission_classes = [IsJobSeeker]
+
+    def post(self, request):
+        backend = get_upload_backend()
+        if not isinstance(backend, LocalFileSystemUploadBackend):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        public_id = read_upload_ticket(request.data.get('ticket'), request.user)
+        if not public_id:
+            return Response({"detail": "Vé tải lên không hợp lệ hoặc đã hết hạn."}, status=status.HTTP_400_BAD_REQUEST)
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file is None:
+            return Response({"detail": "Thiếu tệp tải lên."}, status=status.HTTP_400_BAD_REQUEST)
+
+        version = backend.save(public_id, uploaded_file)
+        return Response({"public_id": public_id, "version": version}, status=status.HTTP_201_CREATED)
+
+
 class JobPostingViewSet(viewsets.ModelViewSet):
     """
     API để tạo, xem, sửa, xóa và phê duyệt tin tuyển dụng.
@@ -490,6 +559,8 @@ class JobPostingViewSet(viewsets.ModelViewSet):
     queryset = JobPosting.objects.all()
     serializer_class = JobPostingSerializer
     lookup_field = 'slug'
+    pagination_class = JobPostingPagination
+    filter_backends = [JobPostingFilterBackend]
 
     def get_permissions(self):
         """
@@ -509,6 +580,10 @@ class JobPostingViewSet(viewsets.ModelViewSet):
             permission_classes = [IsEmployer]  # Nhà tuyển dụng gửi yêu cầu phê duyệt
         elif self.action == 'retrieve_by_slug_or_uuid':
             permission_classes = [IsAuthenticated]  # Chỉ cho phép người dùng đã đăng nhập xem tin
+        elif self.action == 'recommended':
+            permission_classes = [IsJobSeeker]  # Gợi ý việc làm dựa trên hồ sơ NTV
+        elif self.action == 'applicants':
+            permission_classes = [IsEmployer]  # Nhà tuyển dụng xem ứng viên của tin mình
 
         else:
             permission_classes = [IsAuthenticated]  # Mặc định: Chỉ cho phép người đã đăng nhập
@@ -535,14 +610,18 @@ class JobPostingViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
 
+        # Tải trước kỹ năng yêu cầu để serializer không truy vấn theo từng tin
+        job_postings = JobPosting.objects.prefetch_related('required_skills')
         if IsAdmin().has_permission(self.request, self):
-            return JobPosting.objects.all()  # Admin có thể xem tất cả tin tuyển dụng
+            return job_postings.all()  # Admin có thể xem tất cả tin tuyển dụng
         elif IsEmployer().has_permission(self.request, self):
             # 6 chỉ xem tin tuyển dụng của chính mình
-            return JobPosting.objects.filter(recruiter_profile__user=user)
+            return job_postings.filter(recruiter_profile_id=user.id)
         elif IsJobSeeker().has_permission(self.request, self):
-            # NTV chỉ xem các tin đã duyệt và active
-            return JobPosting.objects.filter(status='approved', is_active=True)
+            # NTV chỉ xem các tin đã duyệt, active và chưa hết hạn (kể cả khi tác vụ đóng tin chưa chạy tới)
+            return job_postings.filter(status='approved', is_active=True).filter(
+                Q(expiration_date__isnull=True) | Q(expiration_date__gt=timezone.now())
+            )
         return JobPosting.objects.none()  # Trả về queryset trống nếu không có quyền
 
     def perform_create(self, serializer):
@@ -609,18 +688,19 @@ class JobPostingViewSet(viewsets.ModelViewSet):
         if job_posting.status != 'pending_approval':
             return Response({"detail": "Tin tuyển dụng không cần phê duyệt."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Cập nhật trạng thái của tin tuyển dụng thành 'approved'
-        job_posting.status = 'approved'
-        job_posting.save()
+        # Cập nhật trạng thái của tin tuyển dụng thành 'approved'; việc tìm và thông báo NTV phù hợp chạy ở nền
+        with transaction.atomic():
+            job_posting.status = 'approved'
+            job_posting.save()
+            enqueue(notify_matching_job_seekers, job_posting_id=str(job_posting.id))
 
         # Tạo thông báo cho Admin khi yêu cầu phê duyệt đã được gửi
-        Notification.objects.create(
-            recipient=request.user,
-            sender=request.user,
+        notify(
+            [request.user],
             message=f"Yêu cầu phê duyệt tin tuyển dụng '{job_posting.title}' của {job_posting.recruiter_profile.company_name} đã được phê duyệt.",
             type="System",
+            sender=request.user,
             related_url=f"/Admin/job-posting/{job_posting.id}",
-            is_read=False
         )
 
         return Response({
@@ -652,18 +732,113 @@ class JobPostingViewSet(viewsets.ModelViewSet):
 
         # Tạo thông báo cho Admin
         Admin_users = MyUser.objects.filter(active_role__role_name='Admin')
-        for Admin in Admin_users:
-            Notification.objects.create(
-                recipient=Admin,
-                sender=request.user,
-                message=f"Yêu cầu phê duyệt tin tuyển dụng '{job_posting.title}' của {job_posting.recruiter_profile.company_name}.",
-                type="System",
-                related_url=f"/Admin/job-posting/{job_posting.id}",
-                is_read=False
-            )
+        notify(
+            Admin_users,
+            message=f"Yêu cầu phê duyệt tin tuyển dụng '{job_posting.title}' của {job_posting.recruiter_profile.company_name}.",
+            type="System",
+            sender=request.user,
+            related_url=f"/Admin/job-posting/{job_posting.id}",
+        )
 
         return Response({"message": "Yêu cầu phê duyệt đã được gửi."}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Tìm kiếm tin tuyển dụng đã duyệt theo từ khóa (?q=), không phân biệt dấu.
+        - Mặc định: xếp hạng theo mức độ liên quan trên tiêu đề, mô tả, địa điểm và tên công ty.
+        - ?mode=fuzzy: tìm kiếm mờ trên tiêu đề và địa điểm, xếp hạng theo độ tương đồng trigram.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "Vui lòng nhập từ khóa tìm kiếm (q)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchResultPagination()
+        if request.query_params.get('mode') == 'fuzzy':
+            ranked = [{'job_posting_id': pk, 'score': score} for pk, score in fuzzy_search_job_postings(query)]
+        else:
+            ranked = search_job_postings(query)
+        page = paginator.paginate_queryset(ranked, request, view=self)
+        job_postings = JobPosting.objects.select_related('recruiter_profile').prefetch_related(
+            'required_skills'
+        ).in_bulk([row['job_posting_id'] for row in page])
+
+        results = []
+        for row in page:
+            job_posting = job_postings.get(row['job_posting_id'])
+            if job_posting:
+                data = JobPostingSerializer(job_posting).data
+                data['score'] = round(row['score'], 4)
+                results.append(data)
+        return paginator.get_paginated_response(results)
+
+    @action(detail=False, methods=['get'])
+    def recommended(self, request):
+        """
+        Gợi ý tin tuyển dụng cho NTV theo mức độ khớp giữa kỹ năng trong hồ sơ và kỹ năng yêu cầu của tin.
+        """
+        skill_ids = JobSeekerProfile.skills.through.objects.filter(
+            jobseekerprofile_id=request.user.id
+        ).values_list('skill_id', flat=True)
+        paginator = SearchResultPagination()
+        page = paginator.paginate_queryset(recommend_job_postings(set(skill_ids)), request, view=self)
+
+        # Lọc lại theo DB để bỏ các tin đã bị xóa/đóng sau lần làm mới ma trận gần nhất
+        job_postings = JobPosting.objects.select_related('recruiter_profile').prefetch_related(
+            'required_skills'
+        ).filter(status='approved', is_active=True).in_bulk([row['job_posting_id'] for row in page])
+
+        results = []
+        for row in page:
+            job_posting = job_postings.get(row['job_posting_id'])
+            if job_posting:
+                data = JobPostingSerializer(job_posting).data
+                data['score'] = round(row['score'], 4)
+                data['matched_skills'] = row['matched']
+                results.append(data)
+        return paginator.get_paginated_response(results)
+
+    @action(detail=True, methods=['get'])
+    def applicants(self, request, slug=None):
+        """
+        Danh sách đơn ứng tuyển của một tin (theo slug hoặc uuid) của chính nhà tuyển dụng.
+        - Mặc định: đơn mới nhất trước.
+        - ?rank=skills: xếp theo tỷ lệ kỹ năng yêu cầu của tin mà ứng viên có.
+        """
+        try:
+            job_posting = JobPosting.objects.filter(id=uuid.UUID(slug)).first()
+        except ValueError:
+            job_posting = JobPosting.objects.filter(slug=slug).first()
+        if not job_posting:
+            return Response({"detail": "Tin tuyển dụng không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+        if job_posting.recruiter_profile_id != request.user.id:
+            return Response({"detail": "Bạn không có quyền xem ứng viên của tin này."},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        paginator = SearchResultPagination()
+        rank = request.query_params.get('rank')
+        if rank == 'skills':
+            ranked = rank_applicants(job_posting)
+        elif rank:
+            return Response({"detail": "Chỉ hỗ trợ rank=skills."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            ranked = Application.objects.filter(job_posting=job_posting).order_by('-created_at').values(
+                application_id=F('id'))
+        page = paginator.paginate_queryset(ranked, request, view=self)
+        applications = Application.objects.in_bulk([row['application_id'] for row in page])
+
+        results = []
+        for row in page:
+            application = applications.get(row['application_id'])
+            if application:
+                data = ApplicationSerializer(application).data
+                data['id'] = application.id
+                if rank:
+                    data['score'] = round(row['score'], 4)
+                    data['matched_skills'] = row['matched']
+                results.append(data)
+        return paginator.get_paginated_response(results)
+
     @action(detail=True, methods=['get'])
     def retrieve_by_slug_or_uuid(self, request, *args, **kwargs):
         """
@@ -697,6 +872,53 @@ class JobPostingViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 
+class SkillSearchView(APIView):
+    """
+    API tìm kỹ năng theo tên (?q=), không phân biệt dấu và chịu lỗi chính tả.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "Vui lòng nhập từ khóa tìm kiếm (q)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchResultPagination()
+        page = paginator.paginate_queryset(fuzzy_search_skills(query), request, view=self)
+        return paginator.get_paginated_response([
+            {'id': skill.id, 'name': skill.name, 'score': round(score, 4)} for skill, score in page
+        ])
+
+
+class CandidateSearchView(APIView):
+    """
+    API tìm ứng viên theo nội dung CV (?q=), chỉ dành cho Nhà tuyển dụng.
+    """
+    permission_classes = [IsEmployer]
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "Vui lòng nhập từ khóa tìm kiếm (q)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchResultPagination()
+        page = paginator.paginate_queryset(search_candidates(query), request, view=self)
+        profiles = JobSeekerProfile.objects.select_related('my_user').in_bulk(
+            [row['job_seeker_profile_id'] for row in page]
+        )
+        return paginator.get_paginated_response([
+            {
+                'id': row['job_seeker_profile_id'],
+                'username': profiles[row['job_seeker_profile_id']].my_user.username,
+                'avatar': profiles[row['job_seeker_profile_id']].my_user.avatar_url,
+                'summary': profiles[row['job_seeker_profile_id']].summary,
+                'matched': row['matched'],
+                'score': round(row['score'], 4),
+            }
+            for row in page if row['job_seeker_profile_id'] in profiles
+        ])
+
+
 class ApplicationViewSet(viewsets.ModelViewSet):
     queryset = Application.objects.all()
     serializer_class = ApplicationSerializer
@@ -721,7 +943,7 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         """
         Lấy danh sách các ứng tuyển của người dùng đã đăng nhập.
         """
-        return Application.objects.filter(user=self.request.user)
+        return Application.objects.filter(my_user=self.request.user)
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -792,13 +1014,12 @@ class InterviewViewSet(viewsets.ModelViewSet):
         )
 
         # Gửi thông báo đến người tìm việc về lịch phỏng vấn
-        Notification.objects.create(
-            recipient=application.my_user,
-            sender=request.user,
+        notify(
+            [application.my_user],
             message=f"Cuộc phỏng vấn cho công việc '{application.job_posting.title}' đã được lên lịch vào {scheduled_time}.",
             type="InterviewReminder",
+            sender=request.user,
             related_url=f"/interviews/{interview.id}/",
-            is_read=False
         )
 
         return Response({
@@ -833,13 +1054,12 @@ class InterviewViewSet(viewsets.ModelViewSet):
             interview.notes_recruiter = notes_recruiter
         interview.save()
 
-        Notification.objects.create(
-            recipient=interview.application.user,
-            sender=request.user,
+        notify(
+            [interview.application.my_user],
             message=f"Phỏng vấn cho công việc '{interview.application.job_posting.title}' đã được chấm điểm. Kết quả: {result}.",
             type="StatusUpdate",
+            sender=request.user,
             related_url=f"/interviews/{interview.id}/",
-            is_read=False
         )
 
         return Response({
@@ -848,7 +1068,6 @@ class InterviewViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 
-
 class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
@@ -864,7 +1083,7 @@ class MessageViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """
         Tạo một tin nhắn mới, tự động gán người gửi từ request.user và đảm bảo recipient tồn tại.
-        Gửi tin nhắn lên Firebase Realtime Database với ID từ DB.
+        Tin nhắn được ghi vào outbox trong cùng transaction và gửi lên Firebase bởi worker nền.
         """
         recipient = self.request.data.get('recipient')
 
@@ -875,22 +1094,15 @@ class MessageViewSet(viewsets.ModelViewSet):
         if recipient == self.request.user.id:
             raise ValidationError("Sender and recipient cannot be the same.")
 
-        # Gán người gửi là người dùng hiện tại
-        message = serializer.save(sender=self.request.user)
-        print(message.sender.id, message.recipient.id)
-        # Dữ liệu tin nhắn cần lưu vào Firebase
-        message_data = {
-            "sender": message.sender.id,
-            "recipient": message.recipient.id,
-            "content": message.content,
-            "created_at": message.created_at.isoformat(),
-            "is_read": message.is_read,
-            "read_at": message.read_at.isoformat() if message.read_at else None,  # Thêm trường 'read_at'
-        }
-
-        # Lưu tin nhắn vào Firebase (dưới node 'messages') với ID từ DB
-        ref = db.reference(f'messages/{message.id}')  # Sử dụng ID tin nhắn từ DB
-        ref.set(message_data)  # Lưu tin nhắn vào Firebase với ID từ DB
+        with transaction.atomic():
+            # Gán người gửi là người dùng hiện tại
+            message = serializer.save(sender=self.request.user)
+
+            # Cập nhật bản tóm tắt hội thoại của cả hai phía
+            Conversation.record_message(message)
+
+            # Ghi sự kiện đồng bộ Firebase (với ID từ DB) vào outbox
+            record_message_saved(message)
 
     def update(self, request, *args, **kwargs):
         """
@@ -903,16 +1115,17 @@ class MessageViewSet(viewsets.ModelViewSet):
             return Response({"detail": "You cannot update this message."}, status=status.HTTP_403_FORBIDDEN)
 
         # Đánh dấu tin nhắn là đã đọc
+        was_unread = not message.is_read
         message.is_read = True
         message.read_at = timezone.now()  # Cập nhật 'read_at' với thời gian hiện tại
-        message.save()
+        with transaction.atomic():
+            message.save()
 
-        # Cập nhật trạng thái tin nhắn trong Firebase
-        message_ref = db.reference(f'messages/{message.id}')
-        message_ref.update({
-            "is_read": True,
-            "read_at": message.read_at.isoformat()  # Cập nhật 'read_at' trong Firebase
-        })
+            if was_unread:
+                Conversation.record_read(message.recipient_id, message.sender_id)
+
+            # Cập nhật trạng thái tin nhắn trên Firebase qua outbox
+            record_message_read(message)
 
         return Response(MessageSerializer(message).data)
 
@@ -926,66 +1139,127 @@ class MessageViewSet(viewsets.ModelViewSet):
         if message.sender != request.user and message.recipient != request.user:
             return Response({"detail": "You cannot delete this message."}, status=status.HTTP_403_FORBIDDEN)
 
-        # Xóa tin nhắn trong cơ sở dữ liệu
-        message.delete()
+        # Xóa tin nhắn trong cơ sở dữ liệu (giữ lại ID vì delete() đặt pk về None)
+        message_id = message.id
+        with transaction.atomic():
+            message.delete()
+            Conversation.record_delete(message, was_unread=not message.is_read)
 
-        # Xóa tin nhắn từ Firebase
-        message_ref = db.reference(f'messages/{message.id}')
-        message_ref.delete()
+            # Xóa tin nhắn trên Firebase qua outbox
+            record_message_deleted(message_id, message.sender_id, message.recipient_id)
 
         return Response({"detail": "Message deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
-class AllConversationsView(APIView):
+    @action(detail=False, methods=['get'], url_path=r'thread/(?P<user_id>\d+)')
+    def thread(self, request, user_id=None):
+        """
+        Lấy tin nhắn giữa người dùng hiện tại và user_id, phân trang keyset theo (created_at, id)
+        trên từng chiều gửi rồi trộn lại.
+        """
+        paginator = MessageThreadPagination()
+        page = paginator.paginate_queryset(list(Message.directions(request.user.id, user_id)), request, view=self)
+        serializer = MessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path=r'thread/(?P<user_id>\d+)/read')
+    def read_thread(self, request, user_id=None):
+        """
+        Đánh dấu đã đọc mọi tin nhắn chưa đọc mà user_id gửi cho người dùng hiện tại, có id <= "up_to"
+        (bỏ trống để đánh dấu tất cả), bằng một câu UPDATE và một sự kiện đồng bộ Firebase.
+        """
+        up_to = request.data.get('up_to')
+        queryset = Message.objects.filter(sender_id=user_id, recipient=request.user, is_read=False)
+        if up_to is not None:
+            try:
+                queryset = queryset.filter(id__lte=int(up_to))
+            except (TypeError, ValueError):
+                return Response({"detail": "up_to phải là id tin nhắn."}, status=status.HTTP_400_BAD_REQUEST)
+
+        read_at = timezone.now()
+        with transaction.atomic():
+            updated = queryset.update(is_read=True, read_at=read_at, updated_at=read_at)
+            if updated:
+                Conversation.record_read(request.user.id, int(user_id), count=updated)
+                # Các tin vừa cập nhật mang đúng read_at của lần đánh dấu này (và bị khóa tới hết transaction);
+                # Firebase lưu trạng thái đọc theo từng tin nên cần id của chúng
+                message_ids = list(
+                    Message.objects.filter(sender_id=user_id, recipient=request.user, read_at=read_at)
+                    .values_list('id', flat=True)
+                )
+                record_thread_read(int(user_id), request.user.id, message_ids, read_at)
+
+        return Response({"marked_read": updated}, status=status.HTTP_200_OK)
+
+
+class AllConversationsView(generics.ListAPIView):
+    """
+    API liệt kê các cuộc hội thoại của người dùng hiện tại, mới nhất trước.
+    Đọc từ bảng tóm tắt hội thoại thay vì tải toàn bộ node 'messages' trên Firebase.
+    """
+    serializer_class = ConversationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ConversationPagination
 
-    def get(self, request, *args, **kwargs):
-        user = request.user
-
-        # Truy xuất tất cả các tin nhắn từ Firebase
-        ref = db.reference('messages')  # Truy xuất đến node 'messages'
-        messages_data = ref.order_by_child('created_at').get()  # Lấy tin nhắn sắp xếp theo thời gian
-
-        # Lọc các cuộc hội thoại theo người dùng hiện tại
-        conversations = {}
-        for message_id, message in messages_data.items():
-            sender_id = message['sender']
-            recipient_id = message['recipient']
-
-            # Chỉ lấy tin nhắn có liên quan đến người dùng hiện tại (người gửi hoặc người nhận)
-            if sender_id == user.id or recipient_id == user.id:
-                # Tạo một khóa cuộc hội thoại duy nhất dựa trên cặp người gửi và người nhận
-                participant_id = recipient_id if sender_id == user.id else sender_id
-
-                # Nếu cuộc hội thoại chưa tồn tại, tạo mới
-                if participant_id not in conversations:
-                    conversations[participant_id] = {
-                        'participant': participant_id,
-                        'messages': []
-                    }
-
-                # Kiểm tra sự tồn tại của trường 'read_at', nếu không có thì gán là null
-                read_at = message.get('read_at', None)  # Sử dụng `.get()` để tránh KeyError
-
-                # Thêm tin nhắn vào cuộc hội thoại
-                conversations[participant_id]['messages'].append({
-                    'id': message_id,
-                    'sender': sender_id,
-                    'recipient': recipient_id,
-                    'content': message['content'],
-                    'created_at': message['created_at'],
-                    'is_read': message['is_read'],
-                    'read_at': read_at  # Trường 'read_at' có thể là None nếu chưa được gán
-                })
-
-        # Chuyển dữ liệu cuộc hội thoại thành dạng chuẩn để trả về
-        conversation_list = []
-        for participant_id, conversation in conversations.items():
-            participant = MyUser.objects.get(id=participant_id)  # Lấy thông tin người tham gia (người đối diện)
-            conversation_data = {
-                'participant': participant.username,  # Hoặc bạn có thể trả về thông tin khác của người tham gia
-                'messages': conversation['messages'],
-            }
-            conversation_list.append(conversation_data)
+    def get_queryset(self):
+        return Conversation.objects.filter(my_user=self.request.user).select_related('last_message')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
 
-        return Response(conversation_list)
+        # Lấy toàn bộ người đối diện của trang hiện tại trong một truy vấn duy nhất
+        participant_ids = {conversation.participant_id for conversation in page}
+        participants = MyUser.objects.select_related('active_role').order_by().in_bulk(participant_ids)
 
+        serializer = self.get_serializer(page, many=True, context={
+            **self.get_serializer_context(),
+            'participants': participants,
+        })
+        return self.get_paginated_response(serializer.data)
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Hộp thư thông báo của người dùng hiện tại (mới nhất trước).
+    Lọc theo trạng thái đọc bằng ?is_read=true/false.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NotificationPagination
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(recipient=self.request.user)
+        is_read = self.request.query_params.get('is_read')
+        if is_read in ('true', 'false'):
+            queryset = queryset.filter(is_read=is_read == 'true')
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """
+        Số thông báo chưa đọc, đọc từ bộ đếm thay vì COUNT(*).
+        """
+        return Response({"unread_count": NotificationCounter.unread_for(request.user.id)})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """
+        Đánh dấu đã đọc hàng loạt bằng một câu UPDATE.
+        Truyền "ids" để chọn thông báo cụ thể; bỏ trống để đánh dấu tất cả.
+        """
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get('ids')
+        queryset = Notification.objects.filter(recipient=request.user, is_read=False)
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+
+        # Cập nhật và giảm bộ đếm trong cùng một transaction để bộ đếm không lệch nếu một bước lỗi
+        with transaction.atomic():
+            updated = queryset.update(is_read=True, read_at=timezone.now(), updated_at=timezone.now())
+            if updated:
+                NotificationCounter.decrement(request.user.id, updated)
+
+        return Response({
+            "marked_read": updated,
+            "unread_count": NotificationCounter.unread_for(request.user.id)
+        }, status=status.HTTP_200_OK)